@@ -0,0 +1,78 @@
+# automation/benchmarks/bench_excel_flags.py
+# Сравнява старата (apply/for) и векторната нормализация на флаговете и ЕГН
+# проверката от io/excel_reader върху синтетичен лист.
+#   python -m automation.benchmarks.bench_excel_flags --rows 100000 [--out flags.json]
+from __future__ import annotations
+import argparse, random
+
+import pandas as pd
+
+from automation.benchmarks import harness
+from automation.io.excel_reader import FLAGS, TEXT_TRUE, is_valid_egn, normalize_flags, bad_egn_rows
+
+def synthetic_sheet(rows: int, seed: int = 42) -> pd.DataFrame:
+    """Редове като в Reports_Order: ЕГН (част с грешна чексума/ЕИК/празни) + смесени флагове."""
+    rnd = random.Random(seed)
+    flag_values = ["1", "да", "x", "", None, 0, 1, 1.0, "не", "✓", "Yes"]
+    egns = []
+    for _ in range(rows):
+        r = rnd.random()
+        if r < 0.7:
+            egns.append("".join(rnd.choice("0123456789") for _ in range(10)))
+        elif r < 0.9:
+            egns.append("".join(rnd.choice("0123456789") for _ in range(9)))   # ЕИК
+        else:
+            egns.append(None)
+    data = {"egn_or_eik": egns, "case_no": [f"2024-{i}" for i in range(rows)]}
+    for f in FLAGS:
+        data[f] = [rnd.choice(flag_values) for _ in range(rows)]
+    return pd.DataFrame(data)
+
+# --- старата реализация (за сравнение) ---
+def legacy_flags(df: pd.DataFrame) -> pd.DataFrame:
+    for f in FLAGS:
+        df[f] = df[f].apply(lambda v: 1 if str(v).strip().lower() in TEXT_TRUE else v)
+    df[FLAGS] = df[FLAGS].apply(pd.to_numeric, errors="coerce").fillna(0).astype(int)
+    return df
+
+def legacy_bad_rows(col: pd.Series) -> list[int]:
+    bad_rows = []
+    # fillna("nan") = str(NaN) при pandas < 3 (там astype(str) не пазеше NaN)
+    for i, v in col.astype(str).fillna("nan").items():
+        t = v.strip()
+        if t.isdigit() and len(t) == 10 and not is_valid_egn(t):
+            bad_rows.append(i + 2)
+    return bad_rows
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark: флагове + ЕГН чексума (loop vs vectorized)")
+    ap.add_argument("--rows", type=int, default=100_000)
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--out", default=None, help="JSON с резултатите (harness.save)")
+    args = ap.parse_args()
+
+    df = synthetic_sheet(args.rows)
+    # първо съвпадението на резултатите, после времената през harness.measure
+    new_e = bad_egn_rows(df["egn_or_eik"])
+    assert legacy_flags(df.copy())[FLAGS].equals(normalize_flags(df.copy())[FLAGS]), "флаговете се различават"
+    assert legacy_bad_rows(df["egn_or_eik"]) == new_e, "списъкът с невалидни ЕГН се различава"
+
+    kw = dict(repeat=args.repeat, items=args.rows)
+    results = {
+        "flags/loop": harness.measure(lambda: legacy_flags(df.copy()), **kw),
+        "flags/vectorized": harness.measure(lambda: normalize_flags(df.copy()), **kw),
+        "egn/loop": harness.measure(lambda: legacy_bad_rows(df["egn_or_eik"]), **kw),
+        "egn/vectorized": harness.measure(lambda: bad_egn_rows(df["egn_or_eik"]), **kw),
+    }
+
+    print(f"rows={args.rows}")
+    for what in ("flags", "egn"):
+        old, new = results[f"{what}/loop"]["p50_ms"], results[f"{what}/vectorized"]["p50_ms"]
+        print(f"{what:<6}: loop {old:8.1f} ms | vectorized {new:8.1f} ms | x{old / new:.1f}   (p50)")
+    print(f"bad egn rows: {len(new_e)}")
+    if args.out:
+        harness.save(args.out, results)
+        print(f"Резултати → {args.out}")
+
+if __name__ == "__main__":
+    main()
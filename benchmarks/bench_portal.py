@@ -0,0 +1,106 @@
+# automation/benchmarks/bench_portal.py
+# Пропускателна способност на справките в портала срещу локалния stand-in (web/standin.py):
+# синхронно една по една (web.proparty + пула) срещу web.async_engine при различна паралелност.
+#   python -m automation.benchmarks.bench_portal --cases 200 --delay 0.05 --concurrency 1,4,8
+from __future__ import annotations
+import argparse, asyncio, random, time
+from urllib.parse import urlencode, urljoin
+
+from automation.benchmarks.harness import _percentile
+from automation.web.standin import StandIn
+
+def _cases(n: int, seed: int = 7) -> list:
+    from automation.io.cases import Cases
+    rnd = random.Random(seed)
+    recs = [{"case_no": f"2024-{i:05d}", "egn_or_eik": "".join(rnd.choice("0123456789") for _ in range(10)),
+             "do_ikar": 1, "do_dvijemi": int(rnd.random() < 0.3)} for i in range(n)]
+    return Cases.from_records(recs)
+
+def _sync_lookup(page, job, base_url):
+    url = urljoin(base_url, "search?" + urlencode({"q": job["egn_or_eik"], "kind": job["kind"]}))
+    for _ in range(3):                 # 503 от stand-in-а → веднага пак (без backoff)
+        resp = page.goto(url)
+        if resp is None or resp.status < 500:
+            break
+    return page.locator("#result").inner_text()
+
+def _bench_sync(jobs, base_url, launch) -> dict:
+    from automation.web import proparty
+    from automation.web.pool import BrowserPool
+    with BrowserPool(1, launch=launch) as pool:
+        t0 = time.perf_counter()
+        proparty.run_many(jobs, lambda page, job: _sync_lookup(page, job, base_url), base_url=base_url, pool=pool)
+        return {"seconds": time.perf_counter() - t0, "failed": 0, "retries": 0, "ms": []}
+
+def _bench_login(base_url, launch, repeat: int = 5) -> None:
+    """
+    Време до първата полезна страница: пълен вход vs запазена сесия (web.session),
+    без прихващане, с блокиране (web.routing по подразбиране) и с кеш на статичните файлове.
+    """
+    from automation.web import proparty
+    from automation.web.pool import BrowserPool
+    from automation.web.session import SessionStore
+    store = SessionStore.for_url(base_url)
+    variants = [("без routes", False), ("блокиране", None), ("блокиране+кеш", {"cache": True})]
+    with BrowserPool(1, launch=launch) as pool:
+        for rname, routes in variants:
+            for label, clear in (("пълен вход", True), ("запазена сесия", False)):
+                times = []
+                for _ in range(repeat):
+                    if clear:
+                        store.clear()
+                    t0 = time.perf_counter()
+                    proparty.run(base_url=base_url, pool=pool, routes=routes)
+                    times.append((time.perf_counter() - t0) * 1000)
+                print(f"{rname:<14} {label:<16} p50 {_percentile(sorted(times), 0.5):7.1f} ms")
+    store.clear()
+
+def _bench_async(jobs, base_url, concurrency, rate, launch) -> dict:
+    from automation.web.async_engine import AsyncEngine, search_lookup
+
+    async def main():
+        async with AsyncEngine(base_url=base_url, concurrency=concurrency, rate_per_host=rate,
+                               backoff_s=0.05, launch=launch,
+                               lookups={j["kind"]: search_lookup for j in jobs}) as eng:
+            t0 = time.perf_counter()
+            res = await eng.run(jobs)
+            return time.perf_counter() - t0, res
+
+    seconds, res = asyncio.run(main())
+    return {"seconds": seconds, "failed": sum(1 for r in res if not r["ok"]),
+            "retries": sum(r["attempts"] - 1 for r in res), "ms": sorted(r["ms"] for r in res)}
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark: справки в портала – sync vs async двигател")
+    ap.add_argument("--cases", type=int, default=200)
+    ap.add_argument("--delay", type=float, default=0.05, help="Латентност на stand-in-а за отговор (s)")
+    ap.add_argument("--fail-rate", type=float, default=0.02, help="Дял 503 отговори (проверка на повторенията)")
+    ap.add_argument("--concurrency", default="1,2,4,8")
+    ap.add_argument("--rate", type=float, default=0.0, help="Заявки/s към хоста (0 = без лимит)")
+    ap.add_argument("--no-sync", action="store_true", help="Без синхронния baseline")
+    ap.add_argument("--login", action="store_true",
+                    help="Само време за вход: пълен vs запазена сесия, с/без web.routing")
+    ap.add_argument("--browser", default=None, help="executable_path на Chromium (ако не е от playwright install)")
+    args = ap.parse_args()
+
+    from automation.web.async_engine import jobs_from_cases
+    jobs = jobs_from_cases(_cases(args.cases))
+    launch = {"executable_path": args.browser} if args.browser else None
+    print(f"{len(jobs)} справки за {args.cases} дела, латентност {args.delay * 1000:.0f} ms, 503: {args.fail_rate:.0%}")
+    with StandIn(delay_s=args.delay, fail_rate=args.fail_rate) as site:
+        if args.login:
+            return _bench_login(site.url, launch)
+        rows = []
+        if not args.no_sync:
+            rows.append(("sync x1", _bench_sync(jobs, site.url, launch)))
+        for c in (int(x) for x in args.concurrency.split(",") if x):
+            rows.append((f"async x{c}", _bench_async(jobs, site.url, c, args.rate, launch)))
+    base = rows[0][1]["seconds"]
+    for name, r in rows:
+        ms = r["ms"]
+        lat = f"p50 {_percentile(ms, 0.5):7.1f} ms  p95 {_percentile(ms, 0.95):7.1f} ms" if ms else " " * 30
+        print(f"{name:<10} {len(jobs) / r['seconds']:8.1f} справки/s  {lat}  "
+              f"повторения {r['retries']:>3}  неуспешни {r['failed']:>3}  x{base / r['seconds']:.1f}")
+
+if __name__ == "__main__":
+    main()
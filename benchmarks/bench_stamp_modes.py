@@ -0,0 +1,65 @@
+# automation/benchmarks/bench_stamp_modes.py
+# Сравнява печата като PNG (as_image=True) и векторния печат: време на файл,
+# размер на изхода и визуална разлика (растеризирана кутия, средна абсолютна разлика).
+#   python -m automation.benchmarks.bench_stamp_modes --files 50
+from __future__ import annotations
+import argparse, tempfile, time
+from pathlib import Path
+
+from automation.benchmarks import synthetic
+from automation.benchmarks.run import _stamp_job
+from automation.tasks.stamp import render_cache_clear, stamp_one
+
+def _stamp_box(pdf: Path):
+    """Правоъгълникът на печата – рамката е първата рисунка на страницата."""
+    import fitz
+    with fitz.open(pdf) as doc:
+        return doc[0].get_drawings()[0]["rect"]
+
+def _pixels(pdf: Path, clip, zoom: float = 4.0) -> bytes:
+    import fitz
+    with fitz.open(pdf) as doc:
+        return doc[0].get_pixmap(matrix=fitz.Matrix(zoom, zoom), clip=clip, colorspace=fitz.csGRAY).samples
+
+def _run(pdfs: list[Path], out_dir: Path, as_image: bool) -> tuple[float, int]:
+    render_cache_clear()
+    t0 = time.perf_counter()
+    size = 0
+    for p in pdfs:
+        out = out_dir / f"{p.stem}_{'img' if as_image else 'vec'}.pdf"
+        stamp_one(**_stamp_job(p, out, as_image))
+        size += out.stat().st_size
+    return time.perf_counter() - t0, size
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark: печат като PNG vs векторен текст")
+    ap.add_argument("--files", type=int, default=50)
+    ap.add_argument("--pages", type=int, default=1)
+    ap.add_argument("--workdir", default=str(Path(tempfile.gettempdir()) / "automation-bench"))
+    args = ap.parse_args()
+
+    work = Path(args.workdir)
+    src = synthetic.make_pdf_dir(work / "pdf" / f"modes{args.files}x{args.pages}p", args.files, pages=args.pages)
+    pdfs = sorted(src.glob("*.pdf"))
+    out_dir = work / "out" / "modes"
+    out_dir.mkdir(parents=True, exist_ok=True)
+    src_size = sum(p.stat().st_size for p in pdfs)
+
+    t_img, s_img = _run(pdfs, out_dir, True)
+    t_vec, s_vec = _run(pdfs, out_dir, False)
+
+    img, vec = out_dir / f"{pdfs[0].stem}_img.pdf", out_dir / f"{pdfs[0].stem}_vec.pdf"
+    box_i, box_v = _stamp_box(img), _stamp_box(vec)
+    a, b = _pixels(img, box_i), _pixels(vec, box_i)
+    diff = sum(abs(x - y) for x, y in zip(a, b)) / max(len(a), 1) / 255
+
+    n = len(pdfs)
+    print(f"files={n} pages={args.pages} (вход общо {src_size / 1024:.0f} KB)")
+    print(f"image : {t_img / n * 1000:7.2f} ms/файл | изход +{(s_img - src_size) / n / 1024:7.1f} KB/файл")
+    print(f"vector: {t_vec / n * 1000:7.2f} ms/файл | изход +{(s_vec - src_size) / n / 1024:7.1f} KB/файл")
+    print(f"speedup x{t_img / t_vec:.1f}, размер на печата x{(s_img - src_size) / max(s_vec - src_size, 1):.1f} по-малък")
+    print(f"кутия image {tuple(round(v, 1) for v in box_i)} | vector {tuple(round(v, 1) for v in box_v)}")
+    print(f"визуална разлика (средно, 0..1): {diff:.4f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+# automation/benchmarks/harness.py
+# Измерване (латентност, percentiles, throughput, памет) и сравнение с baseline.
+from __future__ import annotations
+import gc, json, math, platform, sys, time, tracemalloc
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from automation.utils.metrics import peak_rss_mb
+
+def _percentile(sorted_vals: List[float], q: float) -> float:
+    # линейна интерполация (като numpy.percentile по подразбиране)
+    if not sorted_vals:
+        return float("nan")
+    k = (len(sorted_vals) - 1) * q
+    lo, hi = math.floor(k), math.ceil(k)
+    return sorted_vals[lo] + (sorted_vals[hi] - sorted_vals[lo]) * (k - lo)
+
+def measure(fn: Callable[[], Any], *, repeat: int = 5, warmup: int = 1, items: int = 1,
+            setup: Optional[Callable[[], None]] = None, memory: bool = True) -> Dict[str, Any]:
+    """
+    Пуска fn() warmup + repeat пъти (setup() преди всяко) и връща латентността в ms
+    (min/mean/p50/p95/p99), throughput (items/s по медианата) и памет:
+    peak_py_kb – пик на Python алокациите в едно допълнително пускане под tracemalloc
+    (C паметта на PyMuPDF/pandas не се вижда там), rss_peak_mb – пикът на процеса досега.
+    """
+    for _ in range(warmup):
+        if setup: setup()
+        fn()
+    times: List[float] = []
+    for _ in range(repeat):
+        if setup: setup()
+        gc.collect()
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    times.sort()
+    p50 = _percentile(times, 0.50)
+    res: Dict[str, Any] = {
+        "repeat": repeat,
+        "items": items,
+        "min_ms": round(times[0] * 1000, 3),
+        "mean_ms": round(sum(times) / len(times) * 1000, 3),
+        "p50_ms": round(p50 * 1000, 3),
+        "p95_ms": round(_percentile(times, 0.95) * 1000, 3),
+        "p99_ms": round(_percentile(times, 0.99) * 1000, 3),
+        "items_per_s": round(items / p50, 2) if p50 > 0 else None,
+    }
+    if memory:
+        if setup: setup()
+        started = not tracemalloc.is_tracing()
+        if started:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        fn()
+        res["peak_py_kb"] = round((tracemalloc.get_traced_memory()[1] - base) / 1024, 1)
+        if started:
+            tracemalloc.stop()
+    res["rss_peak_mb"] = peak_rss_mb()
+    return res
+
+def environment() -> Dict[str, Any]:
+    import os
+    versions = {}
+    for mod in ("fitz", "PIL", "pandas", "numpy", "openpyxl", "xlrd"):
+        try:
+            m = __import__(mod)
+            versions[mod] = getattr(m, "__version__", getattr(m, "VersionBind", "?"))
+        except ImportError:
+            versions[mod] = None
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "versions": versions,
+    }
+
+def save(path: Path, results: Dict[str, Any]) -> None:
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps({"meta": environment(), "results": results}, ensure_ascii=False, indent=1),
+                    encoding="utf-8")
+
+def compare(results: Dict[str, Any], baseline_path: Path, threshold: float = 0.10,
+            report_missing: bool = True) -> List[str]:
+    """
+    Сравнява p50 с baseline (JSON от save()). Отпечатва таблица и връща имената
+    на бенчмарките, забавени с повече от threshold (0.10 = 10%).
+    """
+    base = json.loads(Path(baseline_path).read_text(encoding="utf-8")).get("results", {})
+    regressions = []
+    print(f"\n{'benchmark':<44} {'base p50':>10} {'now p50':>10} {'ratio':>7}")
+    for name, r in results.items():
+        b = base.get(name)
+        if not b or not b.get("p50_ms"):
+            print(f"{name:<44} {'—':>10} {r['p50_ms']:>10.2f} {'new':>7}")
+            continue
+        ratio = r["p50_ms"] / b["p50_ms"]
+        mark = ""
+        if ratio > 1 + threshold:
+            mark = "  ← по-бавно"
+            regressions.append(name)
+        elif ratio < 1 - threshold:
+            mark = "  ← по-бързо"
+        print(f"{name:<44} {b['p50_ms']:>10.2f} {r['p50_ms']:>10.2f} {ratio:>7.2f}{mark}")
+    for name in sorted(set(base) - set(results)) if report_missing else ():
+        print(f"{name:<44} {base[name].get('p50_ms', 0):>10.2f} {'—':>10} {'gone':>7}")
+    return regressions
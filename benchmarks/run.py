@@ -0,0 +1,217 @@
+# automation/benchmarks/run.py
+# Бенчмарки на горещите пътища: печат (render/stamp_one/stamp_dir) и четене на Excel.
+# Всичко е офлайн, входовете са синтетични (benchmarks/synthetic.py) и се кешират в --workdir.
+#   python -m automation.benchmarks.run --quick
+#   python -m automation.benchmarks.run --out base.json
+#   python -m automation.benchmarks.run --compare base.json      # exit 1 при забавяне > --threshold
+from __future__ import annotations
+import argparse, contextlib, functools, io, shutil, sys, tempfile
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+from automation.benchmarks import harness, synthetic
+
+Bench = Tuple[str, Callable[[], Optional[Dict[str, Any]]]]
+# (име, функция → kwargs за harness.measure или None = пропусни). Входовете (PDF-и, таблици)
+# се правят в тази функция – само за бенчмарките, които минават --only.
+
+def _stamp_job(pdf: Path, out: Path, as_image: bool) -> dict:
+    from automation.tasks import stamp as st
+    return dict(
+        pdf_in=pdf, out=out,
+        anchor_rel=st.DEFAULT_ANCHOR_REL, rel_fallback=st.DEFAULT_REL_FALLBACK,
+        margin_mm=5.0, width_mm=None, height_mm=None, page_index=0,
+        name="Иван Иванов", reg_no="123", doc_no="45678", in_date="01.01.2025", case_no="2024-00001",
+        font_file=None, font_size=st.DEFAULT_FONT_SIZE, as_image=as_image,
+        border_mm=st.DEFAULT_BORDER_MM, padding_mm=st.DEFAULT_PADDING_MM, fill_white=st.DEFAULT_FILL_BG,
+        stroke_alpha=st.DEFAULT_STROKE_A, fill_alpha=st.DEFAULT_FILL_A,
+    )
+
+# ------------------------ Печат ------------------------
+def bench_render(work: Path, args) -> Iterator[Bench]:
+    text = "ЧСИ Иван Иванов № 123\nВх. документ №  45678\nВходиран: 01.01.2025\nИзп. дело:  2024-00001"
+
+    def kw(cold: bool) -> dict:
+        from automation.tasks.stamp import measure_and_render_text_png, render_cache_clear
+        render = lambda: measure_and_render_text_png(text, None, 10.0)
+        if cold:
+            return dict(fn=render, setup=render_cache_clear, repeat=args.repeat * 2)
+        return dict(fn=render, repeat=args.repeat * 20)
+
+    yield "render/cold", lambda: kw(True)
+    yield "render/warm", lambda: kw(False)
+
+def bench_stamp_one(work: Path, args) -> Iterator[Bench]:
+    out = work / "out" / "one.pdf"
+    variants = [(1, "a4", "medium", False), (10, "a4", "medium", False)]
+    if not args.quick:
+        variants += [(100, "a4", "medium", False), (1, "a3", "heavy", True)]
+    for pages, size, content, image in variants:
+        pdf = functools.cache(lambda pages=pages, size=size, content=content, image=image: synthetic.make_pdf(
+            work / "pdf" / f"{pages}p-{size}-{content}{'-img' if image else ''}.pdf",
+            pages=pages, size=size, content=content, image=image))
+        tag = f"{pages}p" + ("" if (size, content, image) == ("a4", "medium", False) else f"-{size}-{content}-img")
+        for as_image in (True, False):
+            def kw(pdf=pdf, as_image=as_image, pages=pages) -> dict:
+                from automation.tasks.stamp import stamp_one
+                job = _stamp_job(pdf(), out, as_image)
+                return dict(fn=lambda: stamp_one(**job), repeat=args.repeat if pages < 100 else max(3, args.repeat // 2))
+            yield f"stamp_one/{tag}/{'image' if as_image else 'vector'}", kw
+
+def bench_stamp_dir(work: Path, args) -> Iterator[Bench]:
+    count = 10 if args.quick else 50
+    src = functools.cache(lambda: synthetic.make_pdf_dir(work / "pdf" / f"dir{count}", count))
+    out = work / "out" / "dir"
+    clean = lambda: shutil.rmtree(out, ignore_errors=True)
+
+    def run(**extra) -> Callable:
+        from automation.tasks.stamp import stamp_dir
+        kw = dict(in_dir=str(src()), out_dir=str(out), name="Иван Иванов", reg_no="123", doc_no="45678", case_no="1")
+        return lambda: stamp_dir(**kw, **extra)
+
+    for workers in (1, None):
+        yield (f"stamp_dir/{count}x1p/workers={workers or 'auto'}",
+               lambda workers=workers: dict(fn=run(workers=workers), setup=clean, items=count,
+                                            repeat=max(3, args.repeat // 2)))
+    yield (f"stamp_dir/{count}x1p/incremental-noop",
+           lambda: dict(fn=run(incremental=True), items=count, repeat=args.repeat))
+
+# ------------------------ Excel ------------------------
+def bench_read_cases(work: Path, args) -> Iterator[Bench]:
+    sizes = [1000] if args.quick else [1000, 10_000, 50_000]
+    if args.full:
+        sizes.append(200_000)
+
+    def silent(fn: Callable) -> Callable:
+        def run():
+            with contextlib.redirect_stdout(io.StringIO()):   # io.read_cases печата прогреса си
+                return fn()
+        return run
+
+    for rows in sizes:
+        for ext in (".xlsx", ".xls"):
+            @functools.cache
+            def wb(rows=rows, ext=ext) -> Optional[str]:
+                p = synthetic.make_workbook(work / "xlsx" / f"Reports_Order_{rows}{ext}", rows)
+                if p is None:
+                    print(f"  (пропускам {rows}{ext}: няма xlwt или редовете са над лимита на .xls)")
+                    return None
+                if ext == ".xlsx":
+                    args.cleanup.append(str(p))      # записът в кеша се маха след края
+                return str(p)
+
+            def kw(make: Callable[[str], Callable], rows=rows, wb=wb, repeat=None) -> Optional[dict]:
+                p = wb()
+                if p is None:
+                    return None
+                return dict(fn=make(p), items=rows, repeat=repeat or (args.repeat if rows <= 10_000 else 3))
+
+            def tasks_read(cache: bool) -> Callable[[str], Callable]:
+                from automation.tasks import excel_reader as tasks_reader
+                return lambda p: (lambda: tasks_reader.read_cases(p, use_cache=cache))
+
+            def io_read(p: str) -> Callable:
+                from automation.io import excel_reader as io_reader
+                return silent(lambda: io_reader.read_cases(p, use_cache=False))
+
+            def iter_read(p: str) -> Callable:
+                from automation.tasks import excel_reader as tasks_reader
+                return lambda: sum(len(c) for c in tasks_reader.iter_cases(p))
+
+            name = f"{rows}{ext}"
+            yield f"read_cases/tasks/{name}", lambda kw=kw: kw(tasks_read(False))
+            yield f"read_cases/io/{name}", lambda kw=kw: kw(io_read)
+            yield f"iter_cases/{name}", lambda kw=kw: kw(iter_read)
+            if ext == ".xlsx":
+                yield f"read_cases/tasks-cached/{name}", lambda kw=kw: kw(tasks_read(True), repeat=args.repeat)
+
+# ------------------------ Credentials ------------------------
+def bench_credentials(work: Path, args) -> Iterator[Bench]:
+    n = 50 if args.quick else 200
+    entries = {f"AUTOMATION/portal-{i:03d}": (f"user{i}", f"парола-{i}") for i in range(n)}
+
+    @functools.cache
+    def backend(name: str):
+        from automation.credentials.credentials import FileBackend, MemoryBackend
+        if name == "memory":
+            return MemoryBackend(entries)
+        path = work / "credentials" / f"credentials-{n}.json"
+        fb = FileBackend(path)
+        if not path.exists():
+            for t, (u, p) in entries.items():
+                fb.write(t, u, p)
+        return fb
+
+    def kw(name: str, read: Callable, repeat: int) -> dict:
+        b = backend(name)
+        return dict(fn=lambda: read(b), items=n, repeat=repeat)
+
+    from automation.credentials.credentials import list_credentials
+    for name in ("memory", "file"):
+        yield (f"credentials/{name}/list",
+               lambda name=name: kw(name, lambda b: list_credentials(backend=b, ttl_s=0), args.repeat))
+        yield (f"credentials/{name}/list+passwords",
+               lambda name=name: kw(name, lambda b: [c.password for c in list_credentials(backend=b, ttl_s=0)],
+                                    args.repeat))
+        yield (f"credentials/{name}/cached",
+               lambda name=name: kw(name, lambda b: list_credentials(backend=b), args.repeat * 20))
+
+GROUPS = {
+    "render": bench_render,
+    "stamp_one": bench_stamp_one,
+    "stamp_dir": bench_stamp_dir,
+    "read_cases": bench_read_cases,
+    "credentials": bench_credentials,
+}
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Бенчмарки: печат на PDF и четене на Reports_Order")
+    ap.add_argument("--only", default="", help="Само бенчмарки, чието име съдържа някой от изразите (запетая)")
+    ap.add_argument("--quick", action="store_true", help="Малки входове, за бърза проверка")
+    ap.add_argument("--full", action="store_true", help="+ 200k реда Excel (бавно за генериране)")
+    ap.add_argument("--repeat", type=int, default=7)
+    ap.add_argument("--workdir", default=str(Path(tempfile.gettempdir()) / "automation-bench"),
+                    help="Тук се пазят синтетичните входове между пусканията")
+    ap.add_argument("--out", default=None, help="JSON с резултатите (по подразбиране <workdir>/results.json)")
+    ap.add_argument("--compare", default=None, help="Baseline JSON (от --out) за сравнение")
+    ap.add_argument("--threshold", type=float, default=0.10, help="Забавяне над този дял = регресия")
+    args = ap.parse_args(argv)
+    if args.quick:
+        args.repeat = min(args.repeat, 3)
+    args.cleanup = []
+
+    work = Path(args.workdir)
+    work.mkdir(parents=True, exist_ok=True)
+    filters = [f for f in args.only.split(",") if f]
+    results: Dict[str, Any] = {}
+    try:
+        for group, gen in GROUPS.items():
+            for name, make in gen(work, args):
+                if filters and not any(f in name for f in filters):
+                    continue                 # преди make() – без входове за пропуснатите
+                kw = make()
+                if kw is None:
+                    continue
+                with contextlib.redirect_stdout(io.StringIO()) if name.startswith("stamp_dir") else contextlib.nullcontext():
+                    r = harness.measure(**kw)
+                results[name] = r
+                print(f"{name:<44} p50 {r['p50_ms']:>9.2f} ms  p95 {r['p95_ms']:>9.2f}  "
+                      f"{r['items_per_s'] or 0:>10.1f}/s  py peak {r.get('peak_py_kb', 0):>9.0f} KB", flush=True)
+    finally:
+        from automation.tasks.excel_reader import invalidate_cache
+        for p in args.cleanup:       # не оставяме бенчмарк записи в истинския кеш
+            invalidate_cache(p)
+
+    out = Path(args.out) if args.out else work / "results.json"
+    harness.save(out, results)
+    print(f"\nРезултати → {out}")
+    if args.compare:
+        regressions = harness.compare(results, Path(args.compare), args.threshold,
+                                      report_missing=not filters)
+        if regressions:
+            print(f"\nРегресии (> {args.threshold:.0%}): {', '.join(regressions)}")
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,101 @@
+# automation/benchmarks/synthetic.py
+# Синтетични входове за бенчмарките: PDF-и (1/10/100 стр.) и Reports_Order таблици.
+from __future__ import annotations
+import random
+from pathlib import Path
+from typing import Optional
+
+# размер на страницата (pt) и колко „тежко“ е съдържанието
+PAGE_SIZES = {"a4": (595, 842), "letter": (612, 792), "a3": (842, 1191)}
+CONTENT = {"light": 5, "medium": 40, "heavy": 200}    # текстови реда на страница
+
+def make_pdf(path: Path, pages: int = 1, size: str = "a4", content: str = "medium",
+             image: bool = False, seed: int = 1) -> Path:
+    """PDF с `pages` страници текст (и по желание растерна картинка на всяка – по-голям файл)."""
+    import fitz
+    path = Path(path)
+    if path.exists():
+        return path
+    path.parent.mkdir(parents=True, exist_ok=True)
+    rnd = random.Random(seed)
+    w, h = PAGE_SIZES[size]
+    doc = fitz.open()
+    pix = None
+    if image:
+        pix = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 400, 300), False)
+        pix.set_rect(pix.irect, (rnd.randrange(256), rnd.randrange(256), rnd.randrange(256)))
+    for n in range(pages):
+        page = doc.new_page(width=w, height=h)
+        lines = "\n".join(f"Ред {i} на стр. {n + 1}: " + "".join(rnd.choice("абвгдежзик 0123456789") for _ in range(60))
+                          for i in range(CONTENT[content]))
+        page.insert_textbox(fitz.Rect(36, 120, w - 36, h - 36), lines, fontsize=7)
+        if pix is not None:
+            page.insert_image(fitz.Rect(36, h - 300, 336, h - 75), pixmap=pix)
+    tmp = path.with_suffix(".tmp")
+    doc.save(tmp, deflate=True)
+    doc.close()
+    tmp.replace(path)
+    return path
+
+def make_pdf_dir(folder: Path, count: int, pages: int = 1, **kw) -> Path:
+    folder = Path(folder)
+    for i in range(count):
+        make_pdf(folder / f"2024-{i:05d}_bnb.pdf", pages=pages, seed=i, **kw)
+    return folder
+
+def _rows(rows: int, seed: int):
+    """Редове с колоните на истинския Reports_Order (ключовете на MAP) + една допълнителна."""
+    from automation.tasks.excel_reader import MAP
+    rnd = random.Random(seed)
+    flag_values = ["1", "да", "x", "", None, 0, 1, "не", "Yes"]
+    header = list(MAP) + ["Бележка"]
+    yield header
+    for i in range(rows):
+        r = rnd.random()
+        egn = ("".join(rnd.choice("0123456789") for _ in range(10)) if r < 0.7 else
+               "".join(rnd.choice("0123456789") for _ in range(9)) if r < 0.9 else None)
+        row = []
+        for col in header:
+            if col == "EGN-EIK":
+                row.append(egn)
+            elif col == "No_ID":
+                row.append(f"2024-{i}" if rnd.random() > 0.01 else None)
+            elif col == "Бележка":
+                row.append(rnd.choice(["", "спешно", "изпратено", None]))
+            else:
+                row.append(rnd.choice(flag_values))
+        yield row
+
+def make_workbook(path: Path, rows: int, seed: int = 42) -> Optional[Path]:
+    """
+    .xlsx (openpyxl, write-only) или .xls (xlwt – по избор; None, ако липсва
+    или rows > 65535, лимита на формата).
+    """
+    path = Path(path)
+    if path.exists():
+        return path
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name("tmp_" + path.name)
+    if path.suffix.lower() == ".xls":
+        try:
+            import xlwt
+        except ImportError:
+            return None
+        if rows > 65535:
+            return None
+        wb = xlwt.Workbook()
+        ws = wb.add_sheet("Sheet1")
+        for r, row in enumerate(_rows(rows, seed)):
+            for c, v in enumerate(row):
+                if v is not None:
+                    ws.write(r, c, v)
+        wb.save(str(tmp))
+    else:
+        from openpyxl import Workbook
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet()
+        for row in _rows(rows, seed):
+            ws.append(row)
+        wb.save(tmp)
+    tmp.replace(path)
+    return path
@@ -1,17 +1,26 @@
 # credentials.py
-# Показва всички Windows Generic Credentials с TargetName започващ с "AUTOMATION/ "
-# и принтира TargetName, UserName и (по избор) паролата.
+# Записите с TargetName, започващ с "AUTOMATION/", от сменяем източник:
+#   wincred – Windows Credential Manager (pywin32, зарежда се при първо ползване);
+#   file    – локален файл, паролите са криптирани поотделно (utils.secret: DPAPI/Fernet);
+#   memory  – в паметта, за проби и Linux.
+# Списъкът се кешира в процеса (CACHE_TTL_S), а паролата на всеки запис се чете/декодира
+# чак когато някой я поиска.
+#   python -m automation.credentials.credentials [--show] [--backend file]
+#   python -m automation.credentials.credentials --backend file --add AUTOMATION/portal user
 
-from typing import List, Tuple
-import sys
+from __future__ import annotations
+from typing import Any, Dict, List, Optional, Tuple
+import argparse, base64, json, os, sys, tempfile, threading, time
+from pathlib import Path
 
-try:
-    import win32cred  # pywin32
-except ImportError as e:
-    raise SystemExit("Липсва pywin32. Инсталирай с: pip install pywin32") from e
+from automation.utils.paths import local_dir
 
-CRED_TYPE = win32cred.CRED_TYPE_GENERIC
 PREFIX = "AUTOMATION/"
+CACHE_TTL_S = 300.0          # колко време списъкът се ползва наготово (0 = всеки път наново)
+BACKEND_ENV = "AUTOMATION_CREDENTIALS"   # wincred | file | memory
+
+class BackendUnavailable(RuntimeError):
+    """Източникът не може да се ползва на тази машина (напр. няма pywin32)."""
 
 def _decode_password(blob) -> str:
     """
@@ -33,62 +42,320 @@ def _decode_password(blob) -> str:
     # ако не е bytes, връщаме като текст
     return str(blob)
 
-def list_automation_credentials() -> List[Tuple[str, str, str]]:
+class Credential:
     """
-    Връща списък от (target_name, username, password) за всички
-    Generic Credentials с TargetName, започващ с PREFIX.
+    Един запис. Паролата се взема при първо четене на .password (декодиране на
+    blob-а или отделно четене от източника) и после се помни.
+    Разопакова се като досегашните tuple-и: target, user, pwd = cred; cred[2];
+    за сравнение с tuple – cred.as_tuple() == (t, u, p).
+    Сравнението и hash-ът са по target и username – паролата не се чете.
+    Записът държи източника си (паролата се чете от него и след като викащият го е пуснал),
+    а при pickle се записват само target, username и как да се намери източникът – не паролата.
     """
-    results: List[Tuple[str, str, str]] = []
+    __slots__ = ("target", "username", "_blob", "_password", "_backend")
 
-    # CredEnumerate позволява филтър по TargetName
-    # Използваме wildcard за всички под PREFIX.
-    # https://learn.microsoft.com/windows/win32/api/wincred/nf-wincred-credenumeratea
-    try:
-        creds = win32cred.CredEnumerate(f"{PREFIX}*", 0)
-    except win32cred.error as e:
-        # ако няма нищо, CredEnumerate може да върне None или да вдигне грешка
-        creds = None
-
-    if not creds:
-        return results
-
-    for c in creds:
-        target = c.get("TargetName", "")
-        username = c.get("UserName", "")
-        password = _decode_password(c.get("CredentialBlob", b""))
-
-        # Някои реализации на pywin32 понякога не връщат CredentialBlob в Enumerate.
-        # За по-сигурно, прочети пак конкретния запис с CredRead:
-        if password == "" and target:
-            try:
-                one = win32cred.CredRead(target, CRED_TYPE, 0)
-                password = _decode_password(one.get("CredentialBlob", b""))
-                username = one.get("UserName", username)
-            except win32cred.error:
-                pass
+    def __init__(self, target: str, username: str = "", password: Optional[str] = None, *,
+                 blob: Optional[bytes] = None, backend=None):
+        self.target = target
+        self.username = username
+        self._password = password
+        self._blob = blob
+        self._backend = backend
+
+    @property
+    def password(self) -> str:
+        if self._password is None:
+            pw = _decode_password(self._blob)
+            if not pw and self._backend is not None:
+                # Някои версии на pywin32 не връщат CredentialBlob в Enumerate → CredRead
+                user, pw = self._backend.read(self.target)
+                if user:
+                    self.username = user
+            self._password, self._blob = pw, None
+        return self._password
+
+    def has_password(self) -> bool:
+        """Има ли парола – без декодиране, когато blob-ът е наличен; иначе я чете."""
+        if self._password is not None:
+            return bool(self._password)
+        if self._blob:
+            return True
+        return bool(self.password)
+
+    def as_tuple(self) -> Tuple[str, str, str]:
+        pw = self.password               # първо паролата – четенето може да обнови username
+        return (self.target, self.username, pw)
+
+    def __iter__(self):
+        return iter(self.as_tuple())
+
+    def __getitem__(self, i):
+        return self.as_tuple()[i]
+
+    def __eq__(self, other):
+        if isinstance(other, Credential):
+            return (self.target, self.username) == (other.target, other.username)
+        return NotImplemented
+
+    def __hash__(self):
+        return hash((self.target, self.username))
+
+    def __repr__(self) -> str:
+        return f"Credential({self.target!r}, {self.username!r}, password=***)"
+
+    def __reduce__(self):
+        # паролата не се пише (checkpoint, DiskCache, процеси) – чете се отново от източника
+        return (_unpickle_credential, (self.target, self.username, _backend_locator(self._backend)))
+
+def _backend_locator(backend) -> Optional[tuple]:
+    """Как да се намери източникът в друг процес: (име,) или ("file", път)."""
+    if backend is None:
+        return None
+    if isinstance(backend, FileBackend):
+        return (backend.name, str(backend.path))
+    return (backend.name,)
+
+def _unpickle_credential(target: str, username: str, locator: Optional[tuple]) -> Credential:
+    backend = None
+    if locator:
+        try:
+            backend = _file_backend(locator[1]) if len(locator) > 1 else get_backend(locator[0])
+        except BackendUnavailable:
+            backend = None            # паролата ще е "" – записът без източник
+    return Credential(target, username, backend=backend)
+
+def _file_backend(path: str) -> "FileBackend":
+    """FileBackend за даден файл, преизползван в процеса (не по един за всеки разпакетиран запис)."""
+    key = f"file:{Path(path)}"
+    with _lock:
+        if _backends.get(key) is None:
+            _backends[key] = FileBackend(Path(path))
+        return _backends[key]
+
+# ------------------------ Източници ------------------------
+class WinCredBackend:
+    name = "wincred"
+
+    def __init__(self):
+        try:
+            import win32cred  # pywin32
+        except ImportError as e:
+            raise BackendUnavailable("Липсва pywin32. Инсталирай с: pip install pywin32") from e
+        self._w = win32cred
+
+    def list(self, prefix: str) -> List[Credential]:
+        # CredEnumerate позволява филтър по TargetName – едно извикване за всички под prefix.
+        # https://learn.microsoft.com/windows/win32/api/wincred/nf-wincred-credenumeratea
+        try:
+            creds = self._w.CredEnumerate(f"{prefix}*", 0)
+        except self._w.error:
+            # ако няма нищо, CredEnumerate може да върне None или да вдигне грешка
+            creds = None
+        return [Credential(c.get("TargetName", ""), c.get("UserName", "") or "",
+                           blob=c.get("CredentialBlob") or None, backend=self)
+                for c in creds or ()]
+
+    def read(self, target: str) -> Tuple[Optional[str], str]:
+        try:
+            one = self._w.CredRead(target, self._w.CRED_TYPE_GENERIC, 0)
+        except self._w.error:
+            return None, ""
+        return one.get("UserName"), _decode_password(one.get("CredentialBlob", b""))
+
+class FileBackend:
+    """
+    JSON {target: {"username", "secret"}} – secret е base64(utils.secret.protect(парола)),
+    така че при списък не се разкрива нито една парола.
+    """
+    name = "file"
+
+    def __init__(self, path: Optional[Path] = None):
+        if path is None:
+            path = local_dir() / "credentials.json"
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._data: Optional[Dict[str, dict]] = None     # последно прочетеното от list()
+
+    def _load(self) -> Dict[str, dict]:
+        try:
+            return json.loads(self.path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return {}
 
-        results.append((target, username, password))
+    def list(self, prefix: str) -> List[Credential]:
+        self._data = data = self._load()
+        return [Credential(t, rec.get("username", ""), backend=self)
+                for t, rec in sorted(data.items()) if t.startswith(prefix)]
 
-    return results
+    def read(self, target: str) -> Tuple[Optional[str], str]:
+        from automation.utils import secret
+        rec = (self._data if self._data is not None else self._load()).get(target)
+        if not rec:
+            return None, ""
+        return rec.get("username"), secret.unprotect(base64.b64decode(rec["secret"])).decode("utf-8")
 
-def main():
+    def write(self, target: str, username: str, password: str) -> None:
+        from automation.utils import secret
+        blob = base64.b64encode(secret.protect(password.encode("utf-8"))).decode("ascii")
+        with self._lock:
+            data = self._load()
+            data[target] = {"username": username, "secret": blob}
+            self._save(data)
+            self._data = None
+
+    def delete(self, target: str) -> bool:
+        with self._lock:
+            data = self._load()
+            found = data.pop(target, None) is not None
+            if found:
+                self._save(data)
+                self._data = None
+        return found
+
+    def _save(self, data: dict) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # уникален временен файл – два потока в един процес не си пишат в един и същ tmp
+        fd, tmp = tempfile.mkstemp(prefix=self.path.stem + ".", suffix=".tmp", dir=self.path.parent)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(json.dumps(data, ensure_ascii=False, indent=1))
+            os.replace(tmp, self.path)
+        except BaseException:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+
+class MemoryBackend:
+    """MemoryBackend({"AUTOMATION/x": ("user", "pass")}); reads брои отделните четения на пароли."""
+    name = "memory"
+
+    def __init__(self, entries: Optional[Dict[str, Tuple[str, str]]] = None):
+        self.entries: Dict[str, Tuple[str, str]] = dict(entries or {})
+        self.reads = 0
+
+    def list(self, prefix: str) -> List[Credential]:
+        return [Credential(t, u, backend=self) for t, (u, _) in sorted(self.entries.items()) if t.startswith(prefix)]
+
+    def read(self, target: str) -> Tuple[Optional[str], str]:
+        self.reads += 1
+        u, p = self.entries.get(target, (None, ""))
+        return u, p
+
+    def write(self, target: str, username: str, password: str) -> None:
+        self.entries[target] = (username, password)
+
+    def delete(self, target: str) -> bool:
+        return self.entries.pop(target, None) is not None
+
+BACKENDS = {"wincred": WinCredBackend, "file": FileBackend, "memory": MemoryBackend}
+_backends: Dict[str, object] = {}
+_lock = threading.Lock()
+
+def get_backend(name: Optional[str] = None):
+    """
+    Източникът по име; без име – $AUTOMATION_CREDENTIALS, иначе wincred, ако има
+    pywin32, иначе file. Инстанциите се преизползват в процеса.
+    """
+    name = name or os.environ.get(BACKEND_ENV, "").strip().lower() or None
+    with _lock:
+        if name is None:
+            if "wincred" not in _backends:
+                try:
+                    _backends["wincred"] = WinCredBackend()
+                except BackendUnavailable:
+                    _backends["wincred"] = None      # не пробваме импорта при всяко извикване
+            if _backends["wincred"] is not None:
+                return _backends["wincred"]
+            name = "file"
+        if name not in BACKENDS:
+            raise ValueError(f"непознат източник на credentials: {name} (wincred|file|memory)")
+        if _backends.get(name) is None:
+            _backends[name] = BACKENDS[name]()
+        return _backends[name]
+
+# ------------------------ Кеш в процеса ------------------------
+# източник → {prefix: (кога, записи)}; ключът е самата инстанция, не id() – id на изчистен
+# източник може да се падне на нов и да върне чужди записи. Кешът държи източниците;
+# изтеклите записи се махат при следващото извикване, така че временните не се трупат.
+_cache: Dict[Any, Dict[str, Tuple[float, List[Credential]]]] = {}
+
+def _prune(now: float, ttl_s: float) -> None:
+    """Маха записите, по-стари от max(ttl_s, CACHE_TTL_S), и източниците без записи (под _lock)."""
+    keep = max(ttl_s, CACHE_TTL_S)
+    for backend in list(_cache):
+        entries = {p: e for p, e in _cache[backend].items() if now - e[0] < keep}
+        if entries:
+            _cache[backend] = entries
+        else:
+            del _cache[backend]
+
+def list_credentials(prefix: str = PREFIX, backend=None, ttl_s: float = CACHE_TTL_S) -> List[Credential]:
+    """
+    Записите под prefix. Повторно извикване до ttl_s секунди връща същите обекти
+    (с вече прочетените пароли), без нов CredEnumerate.
+    """
+    backend = backend if backend is not None else get_backend()
+    now = time.monotonic()
+    with _lock:
+        _prune(now, ttl_s)
+        hit = _cache.get(backend, {}).get(prefix)
+        if hit and ttl_s > 0 and now - hit[0] < ttl_s:
+            return list(hit[1])
+    creds = backend.list(prefix)
+    with _lock:
+        _cache.setdefault(backend, {})[prefix] = (now, creds)
+    return list(creds)
+
+def invalidate_cache() -> None:
+    with _lock:
+        _cache.clear()
+
+def list_automation_credentials() -> List[Credential]:
+    """
+    Връща списък от Credential (разопакова се като (target_name, username, password))
+    за всички записи с TargetName, започващ с PREFIX.
+    """
+    return list_credentials(PREFIX)
+
+def main(argv=None):
     # CLI:
-    #   python credentials.py           -> списък (без да показва пароли)
-    #   python credentials.py --show    -> списък + пароли (внимавай!)
-    show_passwords = len(sys.argv) > 1 and sys.argv[1].strip() in ("--show", "-s")
+    #   ... credentials           -> списък (без да показва пароли)
+    #   ... credentials --show    -> списък + пароли (внимавай!)
+    ap = argparse.ArgumentParser(description=f"Credentials с TargetName под '{PREFIX}'")
+    ap.add_argument("--show", "-s", action="store_true", help="Покажи и паролите")
+    ap.add_argument("--backend", choices=sorted(BACKENDS), default=None)
+    ap.add_argument("--add", nargs=2, metavar=("TARGET", "USER"), help="Добави/смени запис (паролата се пита)")
+    ap.add_argument("--delete", metavar="TARGET")
+    args = ap.parse_args(argv)
+    try:
+        backend = get_backend(args.backend)
+    except BackendUnavailable as e:
+        sys.exit(str(e))
+
+    if args.add or args.delete:
+        if not hasattr(backend, "write"):
+            sys.exit(f"Източникът '{backend.name}' е само за четене – ползвай Windows Credential Manager.")
+        if args.add:
+            import getpass
+            backend.write(args.add[0], args.add[1], getpass.getpass(f"Парола за {args.add[0]}: "))
+            print(f"Записано: {args.add[0]} ({backend.name})")
+        else:
+            print("Изтрито." if backend.delete(args.delete) else "Няма такъв запис.")
+        return
 
-    rows = list_automation_credentials()
+    rows = list_credentials(PREFIX, backend)
     if not rows:
-        print(f"Няма записи с TargetName започващ с '{PREFIX}'.")
+        print(f"Няма записи с TargetName започващ с '{PREFIX}' ({backend.name}).")
         return
 
-    print(f"Намерени {len(rows)} credential(а) под '{PREFIX}':\n")
-    for target, user, pwd in rows:
-        if show_passwords:
-            print(f"TargetName: {target}\n  UserName: {user}\n  Password: {pwd}\n")
+    print(f"Намерени {len(rows)} credential(а) под '{PREFIX}' ({backend.name}):\n")
+    for c in rows:
+        if args.show:
+            print(f"TargetName: {c.target}\n  UserName: {c.username}\n  Password: {c.password}\n")
         else:
-            masked = "•" * 8 if pwd else ""
-            print(f"TargetName: {target}\n  UserName: {user}\n  Password: {masked} (скрито - добави --show за показване)\n")
+            # маска само ако има парола (празна → празно, както преди); has_password()
+            # не декодира blob-а, но без blob (file, някои pywin32) паролата се чете
+            masked = "•" * 8 if c.has_password() else ""
+            print(f"TargetName: {c.target}\n  UserName: {c.username}\n  Password: {masked} (скрито - добави --show за показване)\n")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,244 @@
+# automation/daemon.py
+# Резидентен worker: пуска pipeline-и по заявка (spool папка) и по график (cron),
+# без да плаща стартиране на интерпретатора, импорти и логър при всяко изпълнение.
+# Топли остават само нещата в самия daemon процес (модули, резолвнати задачи, кешовете
+# при workers=1); process pool-ът на stamp_dir се пуска наново за всяко изпълнение.
+from __future__ import annotations
+import json, logging, os, signal, threading, time, uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from automation.orchestrator import _load_yaml, _summary_line, run_pipeline
+from automation.utils.paths import local_dir
+from automation.utils.cron import Cron
+
+POLL_S = 1.0
+HEARTBEAT_S = 30.0          # daemon.pid се „докосва“ толкова често (от отделна нишка)
+DONE_KEEP = 200             # колко резултата да пазим в spool/done
+
+# ------------------------ Spool: заявки за изпълнение ------------------------
+def spool_dir() -> Path:
+    return local_dir() / "spool"
+
+def submit(pipeline: Optional[str] = None, *, resume: bool = False, vars: Optional[dict] = None,
+           spool: Optional[Path] = None) -> Path:
+    """
+    Поставя заявка <spool>/<време>-<id>.json: {"pipeline", "resume", "vars"}.
+    Записът е атомарен (tmp + os.replace) – daemon-ът никога не чете половин файл.
+    """
+    spool = Path(spool) if spool else spool_dir()
+    spool.mkdir(parents=True, exist_ok=True)
+    req = {"pipeline": pipeline, "resume": resume, "vars": vars or {},
+           "submitted": datetime.now().isoformat(timespec="seconds")}
+    name = f"{datetime.now():%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:8]}"
+    tmp = spool / f"{name}.tmp"
+    tmp.write_text(json.dumps(req, ensure_ascii=False), encoding="utf-8")
+    final = spool / f"{name}.json"
+    os.replace(tmp, final)
+    return final
+
+def request_stop(spool: Optional[Path] = None) -> Path:
+    """Заявка daemon-ът да приключи след текущото изпълнение."""
+    spool = Path(spool) if spool else spool_dir()
+    spool.mkdir(parents=True, exist_ok=True)
+    p = spool / f"{datetime.now():%Y%m%d-%H%M%S}-stop.json"
+    tmp = p.with_suffix(".tmp")
+    tmp.write_text(json.dumps({"command": "stop"}), encoding="utf-8")
+    os.replace(tmp, p)
+    return p
+
+def daemon_alive(spool: Optional[Path] = None) -> bool:
+    """daemon.pid съществува и е обновяван скоро (без сигнали към процеса – работи и под Windows)."""
+    p = (Path(spool) if spool else spool_dir()) / "daemon.pid"
+    try:
+        return time.time() - p.stat().st_mtime < 3 * HEARTBEAT_S
+    except FileNotFoundError:
+        return False
+
+def _claim(spool: Path) -> List[Path]:
+    """Взема чакащите заявки (по ред на пристигане), като ги преименува *.json → *.work."""
+    claimed = []
+    for p in sorted(spool.glob("*.json")):
+        work = p.with_suffix(".work")
+        try:
+            os.replace(p, work)
+        except (FileNotFoundError, PermissionError):
+            continue
+        claimed.append(work)
+    return claimed
+
+def _requeue_stale(spool: Path, log: logging.Logger) -> None:
+    # *.work от предишен daemon, спрял по средата → отново в опашката
+    for p in spool.glob("*.work"):
+        log.info("daemon: връщам недовършената заявка %s в опашката", p.name)
+        os.replace(p, p.with_suffix(".json"))
+
+def _finish(work: Path, result: dict) -> None:
+    done = work.parent / "done"
+    done.mkdir(exist_ok=True)
+    (done / f"{work.stem}.json").write_text(json.dumps(result, ensure_ascii=False, default=str), encoding="utf-8")
+    work.unlink(missing_ok=True)
+    old = sorted(done.glob("*.json"))[:-DONE_KEEP]
+    for p in old:
+        p.unlink(missing_ok=True)
+
+# ------------------------ Графици (schedules: в pipelines.yml) ------------------------
+class Schedule:
+    """
+    Един ред от `schedules:`:
+        - pipeline: daily_main
+          cron: "0 8 * * 1-5"
+          resume: false      # по избор
+          vars: {}           # по избор – допълва vars: за това изпълнение
+    """
+    __slots__ = ("pipeline", "cron", "resume", "vars", "next_run")
+
+    def __init__(self, spec: dict, now: datetime):
+        self.pipeline = spec.get("pipeline")
+        self.cron = Cron(str(spec["cron"]))
+        self.resume = bool(spec.get("resume", False))
+        self.vars = spec.get("vars") or {}
+        self.next_run = self.cron.next_after(now)
+
+    def due(self, now: datetime) -> bool:
+        if self.next_run is None or now < self.next_run:
+            return False
+        self.next_run = self.cron.next_after(now)
+        return True
+
+def _load_schedules(cfg: dict, now: datetime, log: logging.Logger) -> List[Schedule]:
+    out = []
+    for spec in cfg.get("schedules") or []:
+        try:
+            s = Schedule(spec, now)
+        except (KeyError, ValueError) as e:
+            log.error("daemon: невалиден график %s: %s", spec, e)
+            continue
+        log.info("daemon: график %s '%s' → следващо %s", s.pipeline or cfg.get("use"), s.cron.expr, s.next_run)
+        out.append(s)
+    return out
+
+# ------------------------ Основен цикъл ------------------------
+def _stop_requested(spool: Path) -> bool:
+    """Взема чакаща заявка {"command": "stop"} (по име *-stop.json), ако има."""
+    found = False
+    for p in spool.glob("*-stop.json"):
+        work = p.with_suffix(".work")
+        try:
+            os.replace(p, work)
+        except (FileNotFoundError, PermissionError):
+            continue        # основният цикъл я е взел – там също спира
+        _finish(work, {"status": "ok", "command": "stop"})
+        found = True
+    return found
+
+def _heartbeat(pid_file: Path, done: threading.Event, stop: threading.Event,
+               poll_s: float = POLL_S) -> threading.Thread:
+    """
+    Докосва pid файла на всеки HEARTBEAT_S и докато върви дълъг pipeline (daemon_alive).
+    Следи и за заявка за спиране по време на изпълнение – stop стига до стъпките
+    (stamp_dir watch), вместо да чака края на pipeline-а.
+    """
+    def beat():
+        last = 0.0
+        while not done.wait(poll_s):
+            if not stop.is_set() and _stop_requested(pid_file.parent):
+                stop.set()
+            if time.monotonic() - last >= HEARTBEAT_S:
+                try:
+                    pid_file.touch()
+                except OSError:
+                    pass
+                last = time.monotonic()
+    t = threading.Thread(target=beat, name="daemon-heartbeat", daemon=True)
+    t.start()
+    return t
+
+def _run_job(cfg: dict, job: Dict[str, Any], log: logging.Logger, max_workers: Optional[int],
+             stop: Optional[threading.Event] = None) -> dict:
+    t0 = time.perf_counter()
+    log.info("daemon: RUN %s (%s)", job.get("pipeline") or cfg.get("use"), job.get("source"))
+    try:
+        ctx = run_pipeline(cfg, log, job.get("pipeline"), vars_override=job.get("vars"),
+                           max_workers=max_workers, resume=bool(job.get("resume")), stop=stop)
+        result = {"status": "ok", "summary": _summary_line(ctx)}
+    except Exception as e:
+        log.exception("daemon: pipeline-ът се провали")
+        result = {"status": "failed", "error": f"{type(e).__name__}: {e}"}
+    result.update(pipeline=job.get("pipeline") or cfg.get("use"), source=job.get("source"),
+                  seconds=round(time.perf_counter() - t0, 3),
+                  finished=datetime.now().isoformat(timespec="seconds"))
+    return result
+
+def serve(cfg_path: Path, log: logging.Logger, *, max_workers: Optional[int] = None,
+          spool: Optional[Path] = None, poll_s: float = POLL_S,
+          stop: Optional[threading.Event] = None) -> None:
+    """
+    Върти се, докато не получи SIGINT/SIGTERM, заявка {"command": "stop"} или `stop.set()`.
+    Изпълненията са едно по едно (pipeline-ите пипат едни и същи папки) – дълъг
+    pipeline (напр. bnb_watch със stamp_dir watch) задържа всички останали до края си;
+    pipelines.yml се презарежда при промяна. Пропуснатите докато daemon-ът е спрял
+    графици не се наваксват – както при cron.
+    """
+    spool = Path(spool) if spool else spool_dir()
+    spool.mkdir(parents=True, exist_ok=True)
+    stop = stop or threading.Event()
+    if threading.current_thread() is threading.main_thread():
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(sig, lambda *_: stop.set())
+
+    cfg_path = Path(cfg_path)
+    cfg_mtime = cfg_path.stat().st_mtime_ns
+    cfg = _load_yaml(cfg_path)
+    schedules = _load_schedules(cfg, datetime.now(), log)
+    _requeue_stale(spool, log)
+
+    pid_file = spool / "daemon.pid"
+    pid_file.write_text(str(os.getpid()), encoding="utf-8")
+    beating = threading.Event()
+    _heartbeat(pid_file, beating, stop, poll_s)
+    log.info("daemon: готов (pid %s, spool=%s)", os.getpid(), spool)
+    try:
+        while not stop.is_set():
+            try:
+                m = cfg_path.stat().st_mtime_ns
+                if m != cfg_mtime:
+                    cfg, cfg_mtime = _load_yaml(cfg_path), m
+                    schedules = _load_schedules(cfg, datetime.now(), log)
+                    log.info("daemon: конфигурацията е презаредена")
+            except Exception as e:      # наполовина записан yml – остава старата
+                log.warning("daemon: не мога да презаредя %s: %s", cfg_path, e)
+
+            now = datetime.now()
+            jobs: List[Dict[str, Any]] = [
+                {"pipeline": s.pipeline, "resume": s.resume, "vars": s.vars, "source": f"cron {s.cron.expr}"}
+                for s in schedules if s.due(now)
+            ]
+            for work in _claim(spool):
+                try:
+                    req = json.loads(work.read_text(encoding="utf-8"))
+                except Exception as e:
+                    _finish(work, {"status": "failed", "error": f"невалидна заявка: {e}"})
+                    continue
+                jobs.append({**req, "source": f"spool {work.stem}", "_work": work})
+
+            for job in jobs:
+                if job.get("command") == "stop":
+                    log.info("daemon: получена заявка за спиране")
+                    _finish(job["_work"], {"status": "ok", "command": "stop"})
+                    stop.set()
+                    continue
+                if stop.is_set():   # след stop останалите заявки чакат следващия старт
+                    if "_work" in job:
+                        os.replace(job["_work"], job["_work"].with_suffix(".json"))
+                    continue
+                result = _run_job(cfg, job, log, max_workers, stop)
+                if "_work" in job:
+                    _finish(job["_work"], result)
+
+            stop.wait(poll_s)
+    finally:
+        beating.set()
+        pid_file.unlink(missing_ok=True)
+        log.info("daemon: спрян")
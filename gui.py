@@ -1,8 +1,9 @@
 # gui.py
-import subprocess, sys, os, signal, tkinter as tk
+import subprocess, sys, os, signal, threading, time, tkinter as tk
 from tkinter import messagebox
 
 worker_proc = None
+daemon_mode = False     # worker_proc е `--daemon` → Start/Continue изпращат заявки към него
 
 def resolve_worker_path():
     base = os.path.dirname(sys.executable) if getattr(sys, "frozen", False) else os.path.dirname(__file__)
@@ -12,24 +13,99 @@ def resolve_worker_path():
     # dev режим – стартираме Python скрипта
     return [sys.executable, os.path.join(base, "main.py")]
 
-def start_worker():
-    global worker_proc
+def _worker_cli(*flags, on_done=None):
+    # кратко извикване на worker-а: --submit/--stop към работещия daemon. Върви в нишка,
+    # за да не замръзва прозорецът, ако daemon-ът се бави; on_done(грешка или None)
+    # се вика в Tk нишката (root.after).
+    result = {}
+
+    def run():
+        try:
+            subprocess.run(resolve_worker_path() + list(flags), cwd=os.path.dirname(os.path.abspath(__file__)),
+                           timeout=60)
+        except Exception as e:
+            result["error"] = e
+
+    t = threading.Thread(target=run, daemon=True)
+    t.start()
+
+    def poll():
+        if t.is_alive():
+            root.after(100, poll)
+        elif on_done:
+            on_done(result.get("error"))
+    root.after(100, poll)
+
+def _when_exited(proc, timeout, then):
+    # proc.wait(timeout) без да блокира Tk: проверка на 100 ms, then() при изход или timeout
+    deadline = time.monotonic() + timeout
+
+    def poll():
+        if proc.poll() is None and time.monotonic() < deadline:
+            root.after(100, poll)
+        else:
+            then()
+    poll()
+
+def start_worker(resume=False):
+    global worker_proc, daemon_mode
+    if daemon_mode and worker_proc and worker_proc.poll() is None:
+        # daemon-ът е топъл – само заявка в spool опашката му
+        pid = worker_proc.pid
+
+        def sent(err):
+            if err:
+                messagebox.showerror("Грешка", f"Не мога да изпратя заявка: {err}")
+            else:
+                status.set(f"Статус: DAEMON (PID {pid}) – заявката е изпратена")
+        status.set(f"Статус: DAEMON (PID {pid}) – изпращам заявка…")
+        _worker_cli("--submit", *(["--resume"] if resume else []), on_done=sent)
+        return
+    if worker_proc and worker_proc.poll() is None:
+        messagebox.showinfo("Info", "Автоматизацията вече работи.")
+        return
+    # resume → оркестраторът прескача стъпките от checkpoint-а на спряното изпълнение
+    args = resolve_worker_path() + (["--resume"] if resume else [])
+    try:
+        worker_proc = subprocess.Popen(args, cwd=os.path.dirname(os.path.abspath(__file__)))
+        daemon_mode = False
+        status.set(f"Статус: RUNNING (PID {worker_proc.pid}){' – продължение' if resume else ''}")
+    except Exception as e:
+        messagebox.showerror("Грешка", f"Не мога да стартирам: {e}")
+
+def start_daemon():
+    global worker_proc, daemon_mode
     if worker_proc and worker_proc.poll() is None:
         messagebox.showinfo("Info", "Автоматизацията вече работи.")
         return
     try:
-        worker_proc = subprocess.Popen(resolve_worker_path(), cwd=os.path.dirname(os.path.abspath(__file__)))
-        status.set(f"Статус: RUNNING (PID {worker_proc.pid})")
+        worker_proc = subprocess.Popen(resolve_worker_path() + ["--daemon"],
+                                       cwd=os.path.dirname(os.path.abspath(__file__)))
+        daemon_mode = True
+        status.set(f"Статус: DAEMON (PID {worker_proc.pid})")
     except Exception as e:
         messagebox.showerror("Грешка", f"Не мога да стартирам: {e}")
 
-def stop_worker():
-    global worker_proc
+def stop_worker(then=None):
+    global worker_proc, daemon_mode
     if not worker_proc or worker_proc.poll() is not None:
         messagebox.showinfo("Info", "Няма стартирана автоматизация.")
         return
+    if daemon_mode:
+        # първо учтиво (спира след текущото изпълнение), после както при обикновения worker
+        proc = worker_proc
+        status.set(f"Статус: DAEMON (PID {proc.pid}) – спиране…")
+        _worker_cli("--stop", on_done=lambda err: _when_exited(proc, 10, lambda: _kill_worker(then)))
+        return
+    _kill_worker(then)
+
+def _kill_worker(then=None):
+    global worker_proc, daemon_mode
     try:
-        worker_proc.terminate()
+        if worker_proc is None:
+            return
+        if worker_proc.poll() is None:
+            worker_proc.terminate()
         try:
             worker_proc.wait(timeout=10)
         except Exception:
@@ -39,23 +115,31 @@ def stop_worker():
                 os.kill(worker_proc.pid, signal.SIGKILL)
         status.set("Статус: STOPPED")
         worker_proc = None
+        daemon_mode = False
     except Exception as e:
         messagebox.showerror("Грешка", f"Не мога да спра: {e}")
+    finally:
+        if then:
+            then()
 
 def on_close():
-    try: 
+    try:
         if worker_proc and worker_proc.poll() is None:
-            stop_worker()
-    finally:
-        root.destroy()
+            stop_worker(then=root.destroy)     # daemon: прозорецът се затваря след спирането
+            return
+    except Exception:
+        pass
+    root.destroy()
 
 root = tk.Tk()
 root.title("Automation Control")
-root.geometry("320x160")
+root.geometry("320x240")
 status = tk.StringVar(value="Статус: STOPPED")
 
 tk.Label(root, textvariable=status, font=("Segoe UI", 11)).pack(pady=10)
 tk.Button(root, text="Start", width=14, command=start_worker).pack(pady=6)
 tk.Button(root, text="Stop", width=14, command=stop_worker).pack(pady=2)
+tk.Button(root, text="Continue", width=14, command=lambda: start_worker(resume=True)).pack(pady=2)
+tk.Button(root, text="Daemon", width=14, command=start_daemon).pack(pady=2)
 root.protocol("WM_DELETE_WINDOW", on_close)
 root.mainloop()
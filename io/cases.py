@@ -0,0 +1,253 @@
+# automation/io/cases.py
+# Компактен, колонен контейнер за делата вместо list[dict].
+from __future__ import annotations
+import math
+from functools import reduce
+from itertools import accumulate
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+STR_COLUMNS = ("case_no", "egn_or_eik")
+
+def as_text(v: Any) -> str:
+    """Текст за ключова колона: празно/NaN → "", цяло число записано като float → без ".0"."""
+    if v is None:
+        return ""
+    if isinstance(v, float):
+        if math.isnan(v):
+            return ""
+        if v.is_integer():
+            return str(int(v))
+    return str(v).strip()
+
+def flag_array(values: Iterable[Any]) -> np.ndarray:
+    """
+    Флаг като np.uint8 0/1. Всяка ненулева стойност (2, -1 от ръчно попълнен Excel) е 1 –
+    както проверката `if row[flag]` при стария list[dict]; None/NaN → 0. Директен
+    astype(np.uint8) би превъртял -1 → 255 и 256 → 0.
+    """
+    a = np.asarray(values if isinstance(values, np.ndarray) else list(values), dtype=np.float64)
+    return (np.nan_to_num(a) != 0).astype(np.uint8)
+
+class StrColumn:
+    """
+    Колона от низове, пазена като един общ str + offsets (int64),
+    вместо N отделни str обекта в N dict-а.
+    """
+    __slots__ = ("_data", "_offsets")
+
+    def __init__(self, values: Iterable[Any]):
+        parts = [as_text(v) for v in values]
+        self._data = "".join(parts)
+        self._offsets = np.fromiter(accumulate((len(p) for p in parts), initial=0),
+                                    dtype=np.int64, count=len(parts) + 1)
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i: int) -> str:
+        return self._data[self._offsets[i]:self._offsets[i + 1]]
+
+    def __iter__(self) -> Iterator[str]:
+        data, off = self._data, self._offsets.tolist()
+        for a, b in zip(off, off[1:]):
+            yield data[a:b]
+
+    def take(self, idx: np.ndarray) -> "StrColumn":
+        return StrColumn(self[int(i)] for i in idx)
+
+    def tolist(self) -> List[str]:
+        return list(self)
+
+class CaseIndex:
+    """
+    Вторични индекси върху Cases, построени с едно минаване:
+      - флаг → bitmap (np.packbits) и позиции (int32) – работа по агенция за O(резултат);
+      - case_no → ред (първото срещане);
+      - egn_or_eik → редове.
+    """
+    __slots__ = ("n", "flag_bits", "flag_rows", "case_no", "egn")
+
+    def __init__(self, cases: "Cases"):
+        self.n = len(cases)
+        self.flag_bits: Dict[str, np.ndarray] = {}
+        self.flag_rows: Dict[str, np.ndarray] = {}
+        for f in cases.flags:
+            arr = cases.flag(f).astype(bool)
+            self.flag_bits[f] = np.packbits(arr)
+            self.flag_rows[f] = np.flatnonzero(arr).astype(np.int32)
+
+        cols = cases._cols
+        case_col = cols.get("case_no", ())
+        egn_col = cols.get("egn_or_eik", ())
+        self.case_no: Dict[str, int] = {}
+        self.egn: Dict[str, List[int]] = {}
+        for i, c in enumerate(case_col):
+            if c:
+                self.case_no.setdefault(c, i)
+        for i, e in enumerate(egn_col):
+            if e:
+                self.egn.setdefault(e, []).append(i)
+
+    def rows_with(self, *flags: str) -> np.ndarray:
+        """Позициите на делата с всички подадени флагове (AND на bitmap-ите); без флагове – всички."""
+        if len(flags) == 1:
+            return self.flag_rows[flags[0]].copy()      # индексът не се пипа отвън
+        all_rows = np.packbits(np.ones(self.n, dtype=bool))
+        bits = reduce(np.bitwise_and, (self.flag_bits[f] for f in flags), all_rows)
+        return np.flatnonzero(np.unpackbits(bits, count=self.n)).astype(np.int32)
+
+class Cases:
+    """
+    Колонно хранилище за нормализираните дела.
+      - do_* флаговете са np.uint8 масиви (0/1) → филтрите са векторни;
+      - case_no / egn_or_eik са StrColumn;
+      - останалите колони – обикновени списъци.
+    За съвместимост с list[dict]: len(), итерация и cases[i] връщат dict
+    за реда, to_records() връща целия списък. Типовете в тях не са суровите от
+    pandas: case_no и egn_or_eik са str (as_text: 1234.0 → "1234", празно/NaN → ""),
+    флаговете са int 0/1, останалите колони – както са прочетени. Тези dict-ове се
+    сглобяват при всеки достъп – промяна в тях не се връща в Cases (cases[0]["x"] = 1 се губи);
+    за промени работи с to_records() и Cases.from_records().
+    """
+    __slots__ = ("_n", "_order", "_cols", "_index")
+
+    def __init__(self, n: int, order: Sequence[str], cols: Dict[str, Any]):
+        self._n = n
+        self._order = list(order)
+        self._cols = cols
+        self._index: Optional[CaseIndex] = None
+
+    # ---- конструиране ----
+    @classmethod
+    def from_frame(cls, df, flags: Optional[Sequence[str]] = None) -> "Cases":
+        """От DataFrame с вече нормализирани (0/1) флагове и без NaN (fillna(""))."""
+        flags = [c for c in df.columns if str(c).startswith("do_")] if flags is None else list(flags)
+        cols: Dict[str, Any] = {}
+        for c in df.columns:
+            if c in flags:
+                cols[c] = flag_array(df[c].to_numpy(dtype=np.float64, na_value=np.nan))
+            elif c in STR_COLUMNS:
+                cols[c] = StrColumn(df[c].tolist())
+            else:
+                cols[c] = df[c].tolist()
+        return cls(len(df), [str(c) for c in df.columns], cols)
+
+    @classmethod
+    def from_records(cls, records: Sequence[dict], flags: Optional[Sequence[str]] = None) -> "Cases":
+        order: Dict[str, None] = {}
+        for r in records:
+            order.update(dict.fromkeys(r))
+        flags = [c for c in order if c.startswith("do_")] if flags is None else list(flags)
+        cols: Dict[str, Any] = {}
+        for c in order:
+            if c in flags:
+                cols[c] = flag_array([r.get(c, 0) for r in records])
+                continue
+            vals = [r.get(c, "") for r in records]
+            if c in STR_COLUMNS:
+                cols[c] = StrColumn(vals)
+            else:
+                cols[c] = vals
+        return cls(len(records), list(order), cols)
+
+    # ---- list-съвместим интерфейс ----
+    def __len__(self) -> int:
+        return self._n
+
+    def __iter__(self) -> Iterator[dict]:
+        for i in range(self._n):
+            yield self._row(i)
+
+    def __getitem__(self, key):
+        # int → нов dict за реда (копие, виж докстринга на класа); slice/масив → Cases
+        if isinstance(key, (int, np.integer)):
+            i = int(key)
+            if i < 0:
+                i += self._n
+            if not 0 <= i < self._n:
+                raise IndexError("Cases index out of range")
+            return self._row(i)
+        if isinstance(key, slice):
+            return self.take(np.arange(self._n)[key])
+        idx = np.asarray(key)
+        if idx.size == 0:
+            idx = idx.astype(np.intp)           # [] е float64
+        if idx.ndim != 1 or idx.dtype.kind not in "iub":
+            raise TypeError(f"Cases индекс трябва да е int, slice или масив от int/bool, а не {key!r}")
+        return self.take(idx)
+
+    def __repr__(self) -> str:
+        return f"<Cases n={self._n} columns={len(self._order)}>"
+
+    def _row(self, i: int) -> dict:
+        row = {}
+        for c in self._order:
+            col = self._cols[c]
+            row[c] = int(col[i]) if isinstance(col, np.ndarray) else col[i]
+        return row
+
+    def to_records(self) -> List[dict]:
+        """list[dict] за всички редове – типовете са описани в докстринга на класа."""
+        return list(self)
+
+    # ---- колонен достъп ----
+    @property
+    def columns(self) -> List[str]:
+        return list(self._order)
+
+    @property
+    def flags(self) -> List[str]:
+        return [c for c in self._order if isinstance(self._cols[c], np.ndarray)]
+
+    def column(self, name: str) -> list:
+        col = self._cols[name]
+        return col.tolist() if isinstance(col, (np.ndarray, StrColumn)) else list(col)
+
+    def flag(self, name: str) -> np.ndarray:
+        """Флагът като np.uint8 масив (без копие)."""
+        return self._cols[name]
+
+    def positions(self, flag: str) -> np.ndarray:
+        return np.flatnonzero(self._cols[flag])
+
+    def where(self, flag: str) -> "Cases":
+        """Делата с вдигнат флаг, напр. cases.where("do_bnb")."""
+        return self.take(self.positions(flag))
+
+    # ---- индекси ----
+    def build_index(self) -> CaseIndex:
+        self._index = CaseIndex(self)
+        return self._index
+
+    @property
+    def index(self) -> CaseIndex:
+        """Индексите (построяват се при първо ползване)."""
+        return self._index if self._index is not None else self.build_index()
+
+    def with_flags(self, *flags: str) -> "Cases":
+        """Делата с всички подадени флагове, напр. cases.with_flags("do_bnb")."""
+        return self.take(self.index.rows_with(*flags))
+
+    def get(self, case_no: Any) -> Optional[dict]:
+        """Делото по номер или None."""
+        i = self.index.case_no.get(as_text(case_no))
+        return None if i is None else self._row(i)
+
+    def rows_for_egn(self, egn: Any) -> List[int]:
+        return list(self.index.egn.get(as_text(egn), ()))
+
+    def take(self, idx) -> "Cases":
+        idx = np.asarray(idx)
+        idx = np.flatnonzero(idx) if idx.dtype == bool else idx.astype(np.intp, copy=False)
+        cols: Dict[str, Any] = {}
+        for c in self._order:
+            col = self._cols[c]
+            if isinstance(col, np.ndarray):
+                cols[c] = col[idx]
+            elif isinstance(col, StrColumn):
+                cols[c] = col.take(idx)
+            else:
+                cols[c] = [col[int(i)] for i in idx]
+        return Cases(len(idx), self._order, cols)
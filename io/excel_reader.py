@@ -1,8 +1,16 @@
 # automation/io/excel_reader.py
 from __future__ import annotations
-import re
+import re, hashlib
 from pathlib import Path
-import pandas as pd
+from typing import TYPE_CHECKING
+import numpy as np
+
+if TYPE_CHECKING:
+    import pandas as pd   # зарежда се в функциите – flag_value/is_valid_egn минават без pandas
+
+from automation.utils.paths import local_dir
+from automation.utils.disk_cache import DiskCache
+from automation.io.cases import Cases
 
 # Мап към нормализирани ключове
 MAP = {
@@ -21,6 +29,13 @@ MAP = {
 }
 FLAGS = [v for v in MAP.values() if v.startswith("do_")]
 TEXT_TRUE = {"1", "1.0", "да", "д", "yes", "y", "true", "t", "✓", "x"}
+# Смени NORMALIZE_VERSION, ако промениш логиката на нормализация – кешът се обезсилва
+NORMALIZE_VERSION = 3      # 3: в кеша са (Cases, невалидни ЕГН редове)
+MAP_VERSION = hashlib.sha1(
+    f"{NORMALIZE_VERSION}:{sorted(MAP.items())}:{sorted(TEXT_TRUE)}".encode("utf-8")
+).hexdigest()[:12]
+
+EGN_WEIGHTS = np.array([2, 4, 8, 5, 10, 9, 7, 3, 6], dtype=np.int64)
 
 def is_valid_egn(s: str) -> bool:
     s = (s or "").strip()
@@ -31,16 +46,103 @@ def is_valid_egn(s: str) -> bool:
     if chk == 10: chk = 0
     return chk == int(s[9])
 
-def read_cases(path: str) -> list[dict]:
+def flag_value(v) -> int:
+    """Скаларният вариант на normalize_flags – за поточно четене ред по ред."""
+    if str(v).strip().lower() in TEXT_TRUE:
+        return 1
+    try:
+        return int(float(v))
+    except (TypeError, ValueError, OverflowError):
+        return 0
+
+def normalize_flags(df: pd.DataFrame, flags: list[str] = FLAGS) -> pd.DataFrame:
+    """
+    Флаговете към 0/1 с векторни операции: текст от TEXT_TRUE → 1,
+    останалото през pd.to_numeric (нечислово/празно → 0).
+    Колоната се факторизира – нормализират се само уникалните стойности
+    (няколко на колона), а резултатът се разпъва обратно по кодовете.
+    """
+    import pandas as pd
+    for f in flags:
+        codes, uniques = pd.factorize(df[f], use_na_sentinel=True)
+        u = pd.Series(uniques, dtype=object)
+        truthy = u.astype(str).str.strip().str.lower().isin(TEXT_TRUE)
+        num = pd.to_numeric(u.where(~truthy), errors="coerce")
+        vals = num.mask(truthy, 1).fillna(0).astype(int).to_numpy()
+        df[f] = np.append(vals, 0)[codes]      # код -1 (NaN) → последния елемент, 0
+    return df
+
+def bad_egn_rows(col: pd.Series) -> list[int]:
+    """
+    Редовете (Excel номерация: индекс + 2) с 10-цифрено ЕГН и грешна контролна цифра.
+    Чексумата е матрица цифри (N x 10) · тегла, mod 11 – без Python цикъл по редове.
+    """
+    import pandas as pd
+    t = col.astype(str).fillna("").str.strip()      # pandas 3: astype(str) пази NaN
+    cand = t[(t.str.len() == 10) & t.str.isdigit()]
+
+    bad = pd.Series(False, index=t.index)
+    joined = "".join(cand.tolist())
+    if not joined.isascii():
+        # не-ASCII цифри (рядко) – тях по стария начин, останалите векторно
+        ascii_ = cand.str.fullmatch(r"[0-9]{10}").astype(bool)
+        for i, v in cand[~ascii_].items():
+            bad.loc[i] = not is_valid_egn(v)
+        cand = cand[ascii_]
+        joined = "".join(cand.tolist())
+    if len(cand):
+        digits = (np.frombuffer(joined.encode("ascii"), dtype=np.uint8)
+                  .reshape(-1, 10).astype(np.int64) - 48)
+        chk = (digits[:, :9] @ EGN_WEIGHTS) % 11
+        chk[chk == 10] = 0
+        bad.loc[cand.index] = chk != digits[:, 9]
+    return [i + 2 for i in t.index[bad]]
+
+_cache: DiskCache | None = None
+
+def _table_cache() -> DiskCache:
+    global _cache
+    if _cache is None:
+        _cache = DiskCache(local_dir() / "cache" / "excel")
+    return _cache
+
+def _cache_key(p: Path) -> str:
+    return f"io.read_cases|{p.resolve()}"
+
+def _fingerprint(p: Path) -> dict:
+    st = p.stat()
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "map": MAP_VERSION}
+
+def invalidate_cache(path: str | None = None) -> int:
+    """Маха кеша за един файл (path) или целия Excel кеш. Връща броя изтрити записи."""
+    if path is None:
+        return _table_cache().invalidate()
+    return _table_cache().invalidate(_cache_key(Path(path)))
+
+def read_cases(path: str, use_cache: bool = True, index: bool = False) -> Cases:
     p = Path(path)
     if not p.exists():
         raise FileNotFoundError(f"Не намирам файла: {p}")
 
+    # отпечатъкът е от преди четенето – файл, сменен докато го четем, не влиза в кеша с новия
+    fp = _fingerprint(p)
+    if use_cache:
+        hit, cached = _table_cache().get(_cache_key(p), meta=fp)
+        if hit:
+            rows, bad_rows = cached
+            print(f"[excel_reader] От кеша: {p} ({len(rows)} реда)")
+            if bad_rows:
+                print("⚠ Невалидна ЕГН чексума в редове:", bad_rows)
+            if index:
+                rows.build_index()
+            return rows
+
     # Избор на engine по разширение
     ext = p.suffix.lower()
     engine = "xlrd" if ext == ".xls" else ("openpyxl" if ext in (".xlsx", ".xlsm") else None)
     print(f"[excel_reader] Чета: {p} (engine={engine})")
 
+    import pandas as pd
     df = pd.read_excel(p, engine=engine)  # pandas.read_excel поддържа xlrd/openpyxl
     print(f"[excel_reader] Колони (източник): {list(df.columns)}")
 
@@ -55,20 +157,19 @@ def read_cases(path: str) -> list[dict]:
             df[f] = 0
 
     # Нормализирай флаговете към 0/1
-    for f in FLAGS:
-        df[f] = df[f].apply(lambda v: 1 if str(v).strip().lower() in TEXT_TRUE else v)
-    df[FLAGS] = df[FLAGS].apply(pd.to_numeric, errors="coerce").fillna(0).astype(int)
+    df = normalize_flags(df)
 
     # Базова проверка за ЕГН
-    bad_rows = []
-    for i, v in df["egn_or_eik"].astype(str).items():
-        t = v.strip()
-        if t.isdigit() and len(t) == 10 and not is_valid_egn(t):
-            bad_rows.append(i+2)
+    bad_rows = bad_egn_rows(df["egn_or_eik"])
     if bad_rows:
         print("⚠ Невалидна ЕГН чексума в редове:", bad_rows)
 
-    return df.fillna("").to_dict(orient="records")
+    rows = Cases.from_frame(df.fillna(""), flags=FLAGS)
+    if use_cache:
+        _table_cache().put(_cache_key(p), (rows, bad_rows), meta=fp)
+    if index:
+        rows.build_index()
+    return rows
 
 if __name__ == "__main__":
     import argparse, pprint, sys, traceback
@@ -1,9 +1,14 @@
 from __future__ import annotations
-import argparse, json, os, pathlib, logging, logging.handlers, sys
+import argparse, json, os, pathlib, logging, logging.handlers, sys, re, hashlib, pickle, zlib, threading, itertools
+from collections.abc import Sized
+from functools import lru_cache
 from typing import Callable, Dict, Any, List
-import yaml
 from importlib import import_module
 
+from automation.utils.disk_cache import DiskCache
+from automation.utils.metrics import RunMetrics, count_items
+from automation.utils.paths import local_dir
+
 REGISTRY: dict[str, Callable[..., dict]] = {}
 
 def task(name: str):
@@ -12,29 +17,61 @@ def task(name: str):
         return fn
     return deco
 
-def _package_local_dir() -> pathlib.Path:
-    base = pathlib.Path(os.environ.get("LOCALAPPDATA", "")) / "Packages"
-    for p in base.glob("*MyAutomation*"):
-        return p / "LocalCache" / "MyAutomation"
-    return pathlib.Path.home() / "AppData" / "Local" / "MyAutomation"
+# Записите минават през ограничена опашка към QueueListener нишка – log.info в горещите
+# цикли не чака файлов I/O и ротация. При пълна опашка извикващият изчаква (не губим редове).
+LOG_QUEUE_SIZE = 10_000
+_log_listener: logging.handlers.QueueListener | None = None
+_log_queued: List[logging.Logger] = []       # логърите, закачени за опашката на _log_listener
+# модулните логъри (automation.tasks.stamp, automation.web.* …) минават през опашката
+# чрез общия им родител – не през handler-а, който basicConfig слага на root-а
+LOG_ROOT = "automation"
+
+class _BlockingQueueHandler(logging.handlers.QueueHandler):
+    def enqueue(self, record: logging.LogRecord) -> None:
+        self.queue.put(record)          # стандартният put_nowait би изхвърлил записа при пълна опашка
 
 def _make_logger(name="orchestrator", level=logging.INFO, to_console=True) -> logging.Logger:
     """
     Настройва logging така, че винаги да показва на конзолата и да пише във файл,
     дори ако някой вече е конфигурирал logging преди нас.
+    Файлът и конзолата се обслужват от QueueListener (фонова нишка); логърът `name`
+    и пакетният LOG_ROOT имат само QueueHandler. Повторно извикване (напр. main()
+    няколко пъти в един процес) само сменя нивото – не добавя нови handler-и.
     """
+    global _log_listener, _log_queued
+    log = logging.getLogger(name)
+    hub = logging.getLogger(LOG_ROOT)
+    # логър под LOG_ROOT стига до опашката през hub-а – свой handler би дублирал редовете
+    targets = [hub] if name == LOG_ROOT or name.startswith(LOG_ROOT + ".") else [hub, log]
+    qh = next((h for h in hub.handlers if isinstance(h, _BlockingQueueHandler)), None)
+    if _log_listener is not None and qh is not None:
+        _log_listener.queue.join()      # записите от предишното ниво да излязат преди смяната
+        for lg in targets:
+            lg.setLevel(level)
+            if lg is not hub and qh not in lg.handlers:
+                lg.propagate = False
+                lg.addHandler(qh)
+                _log_queued.append(lg)
+        for h in (qh, *_log_listener.handlers):
+            h.setLevel(level)
+        return log
+    _stop_log_listener()                # предишна опашка (напр. ръчно махнат handler) – без втора нишка
+
     # 1) Нулирай предишните настройки и вдигни root-а (Python 3.8+: force=True)
     logging.basicConfig(level=level, force=True)  # принудителна глобална конфигурация
     # refs: logging HOWTO / basicConfig и StreamHandler. 
     # StreamHandler праща изхода към sys.stdout/sys.stderr. (docs) 
 
-    out_dir = _package_local_dir() / "logs"
+    out_dir = local_dir() / "logs"
     out_dir.mkdir(parents=True, exist_ok=True)
     log_path = out_dir / "worker.log"
 
-    log = logging.getLogger(name)
-    log.setLevel(level)
-    log.propagate = False  # да не дублира към root
+    for lg in targets:
+        lg.setLevel(level)
+        lg.propagate = False  # да не дублира към root
+        for h in list(lg.handlers):
+            lg.removeHandler(h)
+            h.close()
 
     # --- File handler (rotating) ---
     fh = logging.handlers.RotatingFileHandler(
@@ -42,25 +79,70 @@ def _make_logger(name="orchestrator", level=logging.INFO, to_console=True) -> lo
     )
     fh.setLevel(level)
     fh.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s"))
-    log.addHandler(fh)
+    handlers: List[logging.Handler] = [fh]
 
     # --- Console handler (stdout) ---
     if to_console:
         sh = logging.StreamHandler(stream=sys.stdout)
         sh.setLevel(level)
         sh.setFormatter(logging.Formatter("[%(levelname)s] %(message)s"))
-        log.addHandler(sh)
+        handlers.append(sh)
+
+    # --- Опашка: логърът → QueueHandler → (нишка) → файл/конзола ---
+    import atexit, queue
+    q: queue.Queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    qh = _BlockingQueueHandler(q)
+    qh.setLevel(level)
+    for lg in targets:
+        lg.addHandler(qh)
+    _log_listener = logging.handlers.QueueListener(q, *handlers, respect_handler_level=True)
+    _log_listener.start()
+    _log_queued = list(targets)
+    atexit.register(_stop_log_listener)   # изпразва опашката преди изход
 
     # Мини „банер“, за да си сигурен, че логът е активен
     log.info("Logger ready → file=%s, level=%s", log_path, logging.getLevelName(level))
     return log
 
+def _stop_log_listener() -> None:
+    """
+    Изпразва опашката и спира нишката. Логърът минава на директни handler-и – иначе
+    записите след спирането (други atexit функции, нишки) пълнят опашката, която никой
+    не чете, и при LOG_QUEUE_SIZE извикващият блокира завинаги. Handler-ите затваря
+    logging.shutdown().
+    """
+    global _log_listener, _log_queued
+    if _log_listener is None:
+        return
+    listener, loggers = _log_listener, _log_queued
+    _log_listener, _log_queued = None, []
+    for log in loggers:
+        for h in [h for h in log.handlers if isinstance(h, _BlockingQueueHandler)]:
+            log.removeHandler(h)
+    listener.stop()
+    for log in loggers:
+        for h in listener.handlers:
+            log.addHandler(h)
+
 def _load_yaml(path: pathlib.Path) -> dict:
+    import yaml   # само при четене на конфигурацията – не при импорт на оркестратора
     with path.open("r", encoding="utf-8") as f:
         return yaml.safe_load(f)
 
+_WHOLE_PLACEHOLDER = re.compile(r"^\{([A-Za-z_][A-Za-z0-9_]*)\}$")
+
 def _resolve_vars(val: Any, vars: dict, ctx: dict) -> Any:
     if isinstance(val, str):
+        # "{cases}" сам по себе → самият обект от ctx (не str() от него). Низовете
+        # (и всички vars) минават през format + expandvars както при "{base}/y".
+        m = _WHOLE_PLACEHOLDER.match(val)
+        if m:
+            key = m.group(1)
+            if key in ctx and not isinstance(ctx[key], str):
+                return ctx[key]
+            if key not in ctx and key not in vars:
+                # иначе задачата би получила буквално "{cases}" и би паднала някъде по-навътре
+                raise KeyError(f"{val}: няма '{key}' в ctx/vars (коя стъпка трябва да го върне като result_key?)")
         try:
             out = val.format(**{**vars, **ctx})
         except Exception:
@@ -73,45 +155,478 @@ def _resolve_vars(val: Any, vars: dict, ctx: dict) -> Any:
         return t(_resolve_vars(v, vars, ctx) for v in val)
     return val
 
-def _run_step(step: dict, ctx: dict, log: logging.Logger):
+_PLACEHOLDER = re.compile(r"\{([A-Za-z_][A-Za-z0-9_]*)")
+
+def _placeholders(val: Any) -> set[str]:
+    """Имената на всички {placeholder}-и в kwargs/when (рекурсивно)."""
+    if isinstance(val, str):
+        return set(_PLACEHOLDER.findall(val))
+    if isinstance(val, dict):
+        return set().union(*(_placeholders(v) for v in val.values())) if val else set()
+    if isinstance(val, (list, tuple)):
+        return set().union(*(_placeholders(v) for v in val)) if val else set()
+    return set()
+
+def _step_id(step: dict) -> str:
+    return step.get("id") or step.get("result_key") or step["task"]
+
+def _step_deps(pipeline: List[dict], vars_cfg: dict) -> List[set[int]]:
+    """
+    Връща за всяка стъпка множеството от индекси на стъпките, от които зависи.
+      - raw стъпка зависи от стъпката, чийто result_key ползва в {placeholder}, и от
+        всички task стъпки след нея – те може да са презаписали ключа в ctx (без
+        такава стъпка, вкл. за vars – от всички task стъпки преди нея);
+      - task стъпка (получава целия ctx) зависи от всички преди нея;
+      - изричното `depends_on: [id|result_key|task, ...]` се добавя към горните.
+    Зависимости само назад по списъка → графът винаги е DAG.
+    """
+    deps: List[set[int]] = []
+    producers: Dict[str, int] = {}
+    opaque: List[int] = []
+    ids: Dict[str, int] = {}
+    for i, step in enumerate(pipeline):
+        raw = step.get("mode", "task") == "raw"
+        if not raw:
+            d = set(range(i))
+        else:
+            d = set()
+            refs = _placeholders(step.get("kwargs")) | _placeholders(step.get("when")) | _placeholders(step.get("cache"))
+            for ref in refs:
+                p = producers.get(ref, -1)
+                if p >= 0:
+                    d.add(p)
+                d.update(o for o in opaque if o > p)
+        names = step.get("depends_on") or []
+        if isinstance(names, str):
+            names = [names]
+        for n in names:
+            if n not in ids:
+                raise ValueError(f"{_step_id(step)}: depends_on '{n}' не е стъпка преди нея")
+            d.add(ids[n])
+        deps.append(d)
+        ids[_step_id(step)] = i
+        ids.setdefault(step["task"], i)
+        if raw and step.get("result_key") is not None:
+            producers[step["result_key"]] = i
+        elif not raw:
+            opaque.append(i)
+    return deps
+
+# ------------------------ Кеш на резултатите от стъпки ------------------------
+_step_cache: DiskCache | None = None
+
+def _configure_step_cache(cfg: dict) -> DiskCache:
+    """Горният `cache:` блок в pipelines.yml: max_mb (LRU лимит) и max_age_days."""
+    global _step_cache
+    opts = cfg.get("cache") or {}
+    _step_cache = DiskCache(
+        local_dir() / "cache" / "steps",
+        max_bytes=int(float(opts.get("max_mb", 512)) * 1024 * 1024),
+        max_age_s=float(opts.get("max_age_days", 30)) * 24 * 3600,
+    )
+    return _step_cache
+
+def _key_default(o: Any):
+    # непознати обекти (напр. Cases) – по съдържание
+    try:
+        return hashlib.sha256(pickle.dumps(o, protocol=pickle.HIGHEST_PROTOCOL)).hexdigest()
+    except Exception:
+        return repr(o)
+
+def _input_fingerprint(path: str, content_hash: bool) -> Any:
+    p = pathlib.Path(path)
+    if not p.exists():
+        return None
+    st = p.stat()
+    if not content_hash:
+        return [st.st_size, st.st_mtime_ns]
+    h = hashlib.sha256()
+    with p.open("rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return [st.st_size, h.hexdigest()]
+
+def _step_cache_key(name: str, kwargs: dict, spec: dict) -> str | None:
+    """
+    task + разрешените kwargs + декларираните входни файлове (mtime/размер или hash).
+    None, ако някой вход липсва – задачата може да чете друг файл (напр. fallback
+    Reports_Order*.xls), чиито промени ключът не би видял, затова стъпката не се кешира.
+    """
+    inputs = spec.get("inputs") or []
+    if isinstance(inputs, str):
+        inputs = [inputs]
+    fps = {str(p): _input_fingerprint(str(p), bool(spec.get("hash"))) for p in inputs}
+    if any(fp is None for fp in fps.values()):
+        return None
+    blob = json.dumps([name, kwargs, fps], sort_keys=True, ensure_ascii=False, default=_key_default)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+def _log_result(result_key: str, out: Any, log: logging.Logger) -> None:
+    # кратък helpful log
+    if isinstance(out, dict):
+        if "stamped_count" in out:
+            log.info("→ stamped_count=%s, skipped=%s, failed=%s, output_dir=%s",
+                     out.get("stamped_count"), out.get("skipped_count", 0),
+                     out.get("failed_count", 0), out.get("output_dir"))
+            for f in out.get("files", ()):
+                if not f.get("ok", True):
+                    log.warning("→ FAILED %s: %s", f.get("file"), f.get("error"))
+        else:
+            log.info("→ %s keys: %s", result_key, ", ".join(sorted(out.keys())))
+    elif _is_collection(out):
+        log.info("→ %s: %d items", result_key, len(out))
+
+# ------------------------ Задачи: резолвинг, pre-flight, prewarm ------------------------
+@lru_cache(maxsize=None)
+def _resolve_task(name: str) -> Callable:
+    """"pkg.mod:func" (или "pkg.mod" за callable модул) → функцията; кешира се по име."""
+    mod, _, attr = name.partition(":")
+    module = import_module(mod)               # официалният API за динамични импорти
+    fn = getattr(module, attr) if attr else module
+    if not callable(fn):
+        raise TypeError(f"{name} не е callable")
+    return fn
+
+def _preflight(pipeline: List[dict], vars_cfg: dict, log: logging.Logger) -> List[str]:
+    """
+    Проверява pipeline-а преди първата стъпка: структура на стъпките, mode,
+    че всяка задача се импортира и приема подадените kwargs, и DAG-а (depends_on).
+    Задачите се резолвват тук (и остават в кеша на _resolve_task).
+    Връща имената на модулите за prewarm; при грешки вдига ValueError със списъка.
+    """
+    import inspect
+    errors: List[str] = []
+    prewarm: List[str] = []
+    known = set(vars_cfg)
+    opaque = False
+    for i, step in enumerate(pipeline):
+        if not isinstance(step, dict) or not isinstance(step.get("task"), str):
+            errors.append(f"стъпка {i}: липсва 'task'")
+            continue
+        name, mode = step["task"], step.get("mode", "task")
+        if mode not in ("raw", "task"):
+            errors.append(f"{name}: непознат mode '{mode}' (raw|task)")
+            continue
+        kwargs = step.get("kwargs") or {}
+        if not isinstance(kwargs, dict):
+            errors.append(f"{name}: kwargs трябва да е mapping")
+            continue
+        try:
+            fn = _resolve_task(name)
+        except (Exception, SystemExit) as e:   # SystemExit: модул, който спира при липсваща зависимост
+            errors.append(f"{name}: {type(e).__name__}: {e}")
+            continue
+        try:
+            sig = inspect.signature(fn)
+        except (TypeError, ValueError):
+            sig = None
+        if sig is not None:
+            try:
+                sig.bind(*(() if mode == "raw" else (None,)), **dict.fromkeys(kwargs))
+            except TypeError as e:
+                errors.append(f"{name}: kwargs не пасват на сигнатурата ({e})")
+        refs = _placeholders(kwargs) | _placeholders(step.get("when")) | _placeholders(step.get("cache"))
+        unknown = sorted(r for r in refs if r not in known)
+        if unknown and not opaque:
+            log.warning("pre-flight: %s ползва {%s}, което никоя стъпка преди нея не дава",
+                        name, ", ".join(unknown))
+        if mode == "raw" and step.get("result_key") is not None:
+            known.add(step["result_key"])
+        elif mode != "raw":
+            opaque = True
+        mod_name = name.partition(":")[0]
+        for m in getattr(sys.modules.get(mod_name), "PREWARM", ()):
+            if m not in prewarm:
+                prewarm.append(m)
+    if not errors:
+        try:
+            _step_deps(pipeline, vars_cfg)
+        except ValueError as e:
+            errors.append(str(e))
+    if errors:
+        raise ValueError("pre-flight: невалиден pipeline:\n  - " + "\n  - ".join(errors))
+    return prewarm
+
+def _prewarm(modules: List[str], log: logging.Logger) -> threading.Thread | None:
+    """Импортира тежките зависимости (pandas, fitz, PIL…) във фонова нишка, докато вървят първите стъпки."""
+    modules = [m for m in modules if m not in sys.modules]
+    if not modules:
+        return None
+
+    def run() -> None:
+        for m in modules:
+            try:
+                import_module(m)
+            except Exception as e:      # липсващото ще гръмне в самата стъпка, с нормална грешка
+                log.debug("prewarm %s: %s", m, e)
+        log.debug("prewarm готов: %s", ", ".join(modules))
+
+    t = threading.Thread(target=run, name="prewarm", daemon=True)
+    t.start()
+    return t
+
+# ------------------------ Метрики ------------------------
+# Настройва се от main(); None → стъпките не се измерват.
+_metrics: RunMetrics | None = None
+
+def _exec_step(step: dict, ctx: dict, log: logging.Logger, index: int = 0) -> dict:
+    """
+    Изпълнява една стъпка върху (копие на) ctx и връща промените като dict.
+    Самото прилагане в ctx става от извикващия – така паралелните стъпки
+    не си пречат и редът на сливане е детерминиран.
+    При включени метрики стъпката се измерва (време, CPU, памет, items/s).
+    """
+    if _metrics is None:
+        return _do_step(step, ctx, log, {})
+    with _metrics.measure(index, step["task"]) as m:
+        return _do_step(step, ctx, log, m)
+
+def _do_step(step: dict, ctx: dict, log: logging.Logger, m: dict) -> dict:
     name = step["task"]
     mode = step.get("mode", "task")
     result_key = step.get("result_key")
     kwargs_raw = step.get("kwargs", {}) or {}
 
     vars_dict = ctx.get("__vars__", {})
+    cond = step.get("when")
+    if cond and "file_exists" in cond:
+        p = pathlib.Path(_resolve_vars(cond["file_exists"], vars_dict, ctx))
+        if not p.exists():
+            log.info("SKIP %s (missing %s)", name, p)
+            m["status"] = "skipped"
+            return {}
     kwargs = _resolve_vars(kwargs_raw, vars_dict, ctx)
 
-    mod, attr = name.split(":") if ":" in name else (name, None)
-    module = import_module(mod)               # официалният API за динамични импорти
-    fn = getattr(module, attr) if attr else module
+    # opt-in кеш (само за raw стъпки – task стъпките зависят от целия ctx)
+    spec = step.get("cache")
+    cache_key = None
+    if spec and mode == "raw" and _step_cache is not None:
+        spec = _resolve_vars(spec if isinstance(spec, dict) else {}, vars_dict, ctx)
+        cache_key = _step_cache_key(name, kwargs, spec)
+        if cache_key is None:
+            log.warning("cache: липсва входен файл за %s – изпълнявам без кеш", name)
+            hit = False
+        else:
+            hit, out = _step_cache.get(cache_key, meta=name, ttl_s=spec.get("ttl"))
+        if hit:
+            log.info("CACHED %s", name)
+            m["status"], m["items"] = "cached", count_items(out)
+            if result_key is None:
+                return {}
+            _log_result(result_key, out, log)
+            return {result_key: out}
+    elif spec and mode != "raw":
+        log.warning("cache: се поддържа само за mode: raw (%s)", name)
+
+    fn = _resolve_task(name)
+
+    # --resume: пакетните задачи с параметър `resume` пропускат вече обработеното
+    if ctx.get("__resume__") and _accepts(fn, "resume"):
+        kwargs = {**kwargs, "resume": True}
+    # дълго живеещите стъпки (stamp_dir watch) спират при Ctrl+C/спиране на daemon-а
+    if ctx.get("__stop__") is not None and _accepts(fn, "stop"):
+        kwargs = {**kwargs, "stop": ctx["__stop__"]}
 
     log.info("START %s %s", name, kwargs if kwargs else "")
+    delta: dict = {}
     if mode == "raw":
         out = fn(**kwargs)
+        if cache_key is not None:
+            try:
+                _step_cache.put(cache_key, out, meta=name)
+            except Exception as e:
+                log.warning("cache: не мога да запиша резултата от %s: %s", name, e)
         if result_key is not None:
-            ctx[result_key] = out
-            # кратък helpful log
-            if isinstance(out, list):
-                log.info("→ %s: %d items", result_key, len(out))
-            elif isinstance(out, dict):
-                if "stamped_count" in out:
-                    log.info("→ stamped_count=%s, output_dir=%s",
-                             out.get("stamped_count"), out.get("output_dir"))
-                else:
-                    log.info("→ %s keys: %s", result_key, ", ".join(sorted(out.keys())))
+            delta[result_key] = out
+            _log_result(result_key, out, log)
     else:
         out = fn(dict(ctx), **kwargs)
         if isinstance(out, dict):
-            ctx.update(out)
+            delta.update(out)
+    m["items"] = count_items(out)
     log.info("END   %s", name)
+    return delta
+
+def _accepts(fn: Callable, param: str) -> bool:
+    import inspect
+    try:
+        return param in inspect.signature(fn).parameters
+    except (TypeError, ValueError):
+        return False
+
+def _run_step(step: dict, ctx: dict, log: logging.Logger):
+    ctx.update(_exec_step(step, ctx, log))
     return ctx
 
+# ------------------------ Checkpoint / resume ------------------------
+# Стъпки, чийто резултат съдържа тайни, не се записват – при resume се пускат пак.
+_SECRET_KEY = re.compile(r"pass|cred|secret|token", re.I)
+
+class Checkpoint:
+    """
+    Пази промените (delta) на всяка успешна стъпка в <local dir>/checkpoints/<pipeline>.ckpt
+    (pickle + zlib, атомарен запис). Важи само за същия pipeline/vars (fingerprint).
+    """
+
+    def __init__(self, pipeline_name: str, pipeline: List[dict], vars_cfg: dict, log: logging.Logger):
+        self.path = local_dir() / "checkpoints" / f"{pipeline_name}.ckpt"
+        blob = json.dumps([pipeline, vars_cfg], sort_keys=True, ensure_ascii=False, default=str)
+        self.fingerprint = hashlib.sha256(blob.encode("utf-8")).hexdigest()
+        self.pipeline = pipeline
+        self.log = log
+        self.done: Dict[int, dict] = {}
+
+    def load(self) -> Dict[int, dict]:
+        try:
+            data = pickle.loads(zlib.decompress(self.path.read_bytes()))
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            self.log.warning("Checkpoint %s е повреден (%s) – започвам отначало", self.path, e)
+            return {}
+        if data.get("fingerprint") != self.fingerprint:
+            self.log.info("Checkpoint %s е за друга конфигурация – започвам отначало", self.path)
+            return {}
+        self.done = data.get("deltas", {})
+        return dict(self.done)
+
+    def record(self, i: int, delta: dict) -> None:
+        step = self.pipeline[i]
+        if step.get("checkpoint") is False or any(_SECRET_KEY.search(k) for k in delta):
+            return
+        self.done[i] = delta
+        try:
+            payload = zlib.compress(pickle.dumps(
+                {"fingerprint": self.fingerprint, "deltas": self.done}, protocol=pickle.HIGHEST_PROTOCOL))
+        except Exception as e:
+            self.done.pop(i, None)
+            self.log.warning("Checkpoint: резултатът от %s не се сериализира (%s)", step["task"], e)
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_bytes(payload)
+        os.replace(tmp, self.path)
+
+    def clear(self) -> None:
+        self.path.unlink(missing_ok=True)
+
+def _run_pipeline(pipeline: List[dict], ctx: dict, log: logging.Logger, max_workers: int = 1,
+                  checkpoint: Checkpoint | None = None, done: Dict[int, dict] | None = None) -> dict:
+    """
+    Пуска стъпките по DAG-а от `_step_deps`: независимите вървят едновременно
+    в ThreadPoolExecutor. Всяка стъпка вижда ctx само с резултатите на стъпките
+    преди нея, а промените се сливат в реда от pipelines.yml → крайният ctx е
+    същият като при последователно изпълнение.
+    `done` – вече изпълнени стъпки (от checkpoint) с техните промени;
+    `checkpoint.record` се вика след всяка успешна стъпка.
+    """
+    deltas: Dict[int, dict] = dict(done or {})
+    for i in sorted(deltas):
+        log.info("RESUME %s (от checkpoint)", pipeline[i]["task"])
+
+    def finished(i: int, delta: dict) -> None:
+        deltas[i] = delta
+        if checkpoint is not None:
+            checkpoint.record(i, delta)
+
+    if max_workers <= 1:
+        for i, step in enumerate(pipeline):
+            if i in deltas:
+                ctx.update(deltas[i])
+                continue
+            delta = _exec_step(step, ctx, log, i)
+            ctx.update(delta)
+            finished(i, delta)
+        return ctx
+
+    from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+    deps = _step_deps(pipeline, ctx.get("__vars__", {}))
+    # всички (и непреки) зависимости – стъпката вижда само техните промени, не тези на
+    # стъпка, която просто е свършила по-рано → същият ctx като при последователно изпълнение
+    closure: List[set[int]] = []
+    for d in deps:
+        closure.append(set(d).union(*(closure[j] for j in d)))
+    pending = [i for i in range(len(pipeline)) if i not in deltas]
+    running: dict = {}
+
+    def snapshot(i: int) -> dict:
+        view = dict(ctx)
+        for j in sorted(closure[i]):
+            view.update(deltas[j])
+        return view
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="step") as ex:
+        try:
+            while pending or running:
+                for i in [i for i in pending if deps[i] <= deltas.keys()]:
+                    pending.remove(i)
+                    running[ex.submit(_exec_step, pipeline[i], snapshot(i), log, i)] = i
+                done_futs, _ = wait(running, return_when=FIRST_COMPLETED)
+                for fut in done_futs:
+                    i = running.pop(fut)
+                    try:
+                        finished(i, fut.result())
+                    except Exception:
+                        for other in running:
+                            other.cancel()
+                        raise
+        except KeyboardInterrupt:
+            # Ctrl+C стига само до главната нишка – стъпките в пула спират през __stop__
+            log.warning("Прекъсване – изчаквам текущите стъпки да спрат")
+            if ctx.get("__stop__") is not None:
+                ctx["__stop__"].set()
+            for other in running:
+                other.cancel()
+            raise
+
+    for i in range(len(pipeline)):
+        ctx.update(deltas[i])
+    return ctx
+
+def _is_collection(v: Any) -> bool:
+    """list или list-подобен контейнер (напр. io.cases.Cases), но не str/dict."""
+    return isinstance(v, Sized) and not isinstance(v, (str, bytes, dict))
+
+# Debug дъмпът на ctx: най-много толкова елемента от колекция и знака общо.
+CTX_PREVIEW_ITEMS = 5
+CTX_PREVIEW_CHARS = 20_000
+
+def _preview(v: Any, depth: int = 0) -> Any:
+    if isinstance(v, dict):
+        if depth > 3:
+            return f"<dict {len(v)} keys>"
+        return {str(k): ("***" if _SECRET_KEY.search(str(k)) else _preview(x, depth + 1)) for k, x in v.items()}
+    if isinstance(v, str):
+        return v if len(v) <= 500 else v[:500] + f"… ({len(v)} chars)"
+    if _is_collection(v):
+        n = len(v)
+        try:
+            head = v[:CTX_PREVIEW_ITEMS]
+        except Exception:
+            head = list(itertools.islice(iter(v), CTX_PREVIEW_ITEMS))
+        head = head.to_records() if hasattr(head, "to_records") else list(head)
+        out = [_preview(x, depth + 1) for x in head]
+        if n > CTX_PREVIEW_ITEMS:
+            out.append(f"… +{n - CTX_PREVIEW_ITEMS} ({n} items)")
+        return out
+    return v
+
+class _CtxPreview:
+    """Съкратен JSON на ctx – сериализира се чак когато записът наистина се форматира."""
+    __slots__ = ("ctx",)
+
+    def __init__(self, ctx: dict):
+        self.ctx = ctx
+
+    def __str__(self) -> str:
+        s = json.dumps(_preview(self.ctx), ensure_ascii=False, default=str)
+        return s if len(s) <= CTX_PREVIEW_CHARS else s[:CTX_PREVIEW_CHARS] + f"… ({len(s)} chars)"
+
 def _summary_line(ctx: dict) -> str:
     parts = []
-    if isinstance(ctx.get("credentials"), list):
+    if _is_collection(ctx.get("credentials")):
         parts.append(f"credentials={len(ctx['credentials'])}")
-    if isinstance(ctx.get("cases"), list):
+    if _is_collection(ctx.get("cases")):
         parts.append(f"cases={len(ctx['cases'])}")
     if "stamped_count" in ctx:
         sc = ctx.get("stamped_count")
@@ -119,44 +634,136 @@ def _summary_line(ctx: dict) -> str:
         parts.append(f"stamped={sc} -> {od}")
     return " | ".join(parts) if parts else "(no outputs captured)"
 
-def main() -> dict:
-    ap = argparse.ArgumentParser(description="Simple task orchestrator")
-    ap.add_argument("--config", default="pipelines.yml", help="Path to pipelines.yml")
-    ap.add_argument("--verbose", action="store_true", help="Verbose console logging (DEBUG)")
-    args = ap.parse_args()
+def _configure_metrics(pipeline_name: str, profile: bool = False, trace_memory: bool = False) -> RunMetrics:
+    global _metrics
+    log_dir = local_dir() / "logs"
+    _metrics = RunMetrics(pipeline_name, log_dir, trace_memory=trace_memory,
+                          profile_dir=log_dir / "profiles" if profile else None)
+    return _metrics
 
-    level = logging.DEBUG if args.verbose else logging.INFO
-    log = _make_logger(level=level, to_console=True)
+def _report_metrics(metrics: RunMetrics, log: logging.Logger) -> None:
+    """Таблица по стъпки в лога + по ред на стъпка в logs/metrics.jsonl."""
+    if not metrics.steps:
+        return
+    log.info("Step metrics (run %s):", metrics.run_id)
+    for line in metrics.summary_lines():
+        log.info("  %s", line)
+    try:
+        log.info("Metrics → %s", metrics.write_jsonl())
+    except OSError as e:
+        log.warning("Metrics: не мога да запиша %s: %s", metrics.jsonl_path, e)
+    for m in metrics.steps:
+        if m.get("profile"):
+            log.info("Profile %s → %s", m["task"], m["profile"])
 
-    cfg_path = pathlib.Path(args.config)
+def _find_config(path: str) -> pathlib.Path:
+    cfg_path = pathlib.Path(path)
     if not cfg_path.exists():
         here = pathlib.Path(__file__).parent
-        for cand in [here / args.config, here / "pipelines.yml", here.parent / "pipelines.yml"]:
+        for cand in [here / path, here / "pipelines.yml", here.parent / "pipelines.yml"]:
             if cand.exists():
-                cfg_path = cand
-                break
-    log.info("Using config: %s", cfg_path)
+                return cand
+    return cfg_path
 
-    cfg = _load_yaml(cfg_path)
-    vars_cfg = cfg.get("vars", {}) or {}
-    selected = cfg.get("use")
+def run_pipeline(cfg: dict, log: logging.Logger, name: str | None = None, *,
+                 vars_override: dict | None = None, max_workers: int | None = None,
+                 resume: bool = False, profile: bool = False, trace_memory: bool = False,
+                 check: bool = False, stop: threading.Event | None = None) -> dict:
+    """
+    Изпълнява един pipeline от вече заредена конфигурация и връща крайния ctx.
+    Ползва се от main() и от daemon-а (automation.daemon) – там модулите,
+    кешовете и логърът остават „топли“ между изпълненията.
+    name=None → `use:` от конфигурацията; vars_override допълва/заменя `vars:`.
+    stop – сигнал за спиране към стъпките с параметър `stop` (напр. stamp_dir watch).
+    """
+    vars_cfg = {**(cfg.get("vars") or {}), **(vars_override or {})}
+    selected = name or cfg.get("use")
+    if selected not in (cfg.get("pipelines") or {}):
+        raise KeyError(f"Няма pipeline '{selected}' в конфигурацията")
     pipeline: List[dict] = cfg["pipelines"][selected]
 
-    ctx: Dict[str, Any] = {"__vars__": vars_cfg}
+    prewarm = _preflight(pipeline, vars_cfg, log)
+    log.info("Pre-flight OK: %s, %d стъпки", selected, len(pipeline))
+    if check:
+        return {}
+    if cfg.get("prewarm", True):
+        _prewarm(prewarm, log)
 
-    for step in pipeline:
-        cond = step.get("when")
-        if cond and "file_exists" in cond:
-            p = pathlib.Path(_resolve_vars(cond["file_exists"], vars_cfg, ctx))
-            if not p.exists():
-                log.info("SKIP %s (missing %s)", step["task"], p)
-                continue
-        ctx = _run_step(step, ctx, log)
+    max_workers = max_workers if max_workers is not None else int(cfg.get("max_workers", 1) or 1)
+    _configure_step_cache(cfg)
+    if profile and max_workers > 1:
+        log.info("--profile: стъпките се изпълняват последователно (max_workers=1)")
+        max_workers = 1
+    metrics = _configure_metrics(selected, profile, trace_memory)
+
+    checkpoint = Checkpoint(selected, pipeline, vars_cfg, log)
+    done = checkpoint.load() if resume else {}
+
+    ctx: Dict[str, Any] = {"__vars__": vars_cfg, "__stop__": stop or threading.Event()}
+    if resume:
+        ctx["__resume__"] = True
+    try:
+        ctx = _run_pipeline(pipeline, ctx, log, max_workers=max_workers, checkpoint=checkpoint, done=done)
+    finally:
+        _report_metrics(metrics, log)
+    ctx.pop("__resume__", None)
+    ctx.pop("__stop__", None)
+    checkpoint.clear()
 
-    safe_ctx = {k: ("***" if "pass" in k.lower() else v) for k, v in ctx.items()}
     log.info("PIPELINE OK; %s", _summary_line(ctx))
-    log.debug("context=%s", json.dumps(safe_ctx, ensure_ascii=False))
+    if log.isEnabledFor(logging.DEBUG):
+        log.debug("context=%s", _CtxPreview(ctx))
     return ctx
 
+def main(argv: List[str] | None = None) -> dict:
+    ap = argparse.ArgumentParser(description="Simple task orchestrator")
+    ap.add_argument("--config", default="pipelines.yml", help="Path to pipelines.yml")
+    ap.add_argument("--pipeline", default=None, help="Кой pipeline да се пусне (по подразбиране `use:`)")
+    ap.add_argument("--verbose", action="store_true", help="Verbose console logging (DEBUG)")
+    ap.add_argument("--max-workers", type=int, default=None,
+                    help="Брой паралелни стъпки (по подразбиране max_workers от pipelines.yml, иначе 1)")
+    ap.add_argument("--resume", action="store_true",
+                    help="Продължи от последния checkpoint: пропусни завършените стъпки и обработените файлове")
+    ap.add_argument("--profile", action="store_true",
+                    help="cProfile за всяка стъпка → logs/profiles/*.prof (стъпките вървят последователно)")
+    ap.add_argument("--trace-memory", action="store_true",
+                    help="tracemalloc: нетна промяна и пик на Python паметта за всяка стъпка")
+    ap.add_argument("--check", action="store_true",
+                    help="Само pre-flight проверка на pipeline-а (задачи, kwargs, depends_on) и изход")
+    ap.add_argument("--daemon", action="store_true",
+                    help="Остани резидентен: изпълнявай заявки от spool папката и `schedules:` от pipelines.yml")
+    ap.add_argument("--submit", action="store_true",
+                    help="Само постави заявка за изпълнение в spool папката на работещия daemon и излез")
+    ap.add_argument("--stop", action="store_true",
+                    help="Помоли работещия daemon да спре след текущото изпълнение и излез")
+    args = ap.parse_args(argv)
+
+    if args.submit:
+        from automation.daemon import submit, daemon_alive
+        req = submit(args.pipeline, resume=args.resume)
+        print(f"Заявката е в опашката: {req}")
+        if not daemon_alive():
+            print("⚠ Daemon-ът не изглежда стартиран (orchestrator --daemon)")
+        return {}
+    if args.stop:
+        from automation.daemon import request_stop
+        print(f"Заявка за спиране: {request_stop()}")
+        return {}
+
+    level = logging.DEBUG if args.verbose else logging.INFO
+    log = _make_logger(level=level, to_console=True)
+
+    cfg_path = _find_config(args.config)
+    log.info("Using config: %s", cfg_path)
+
+    if args.daemon:
+        from automation.daemon import serve
+        serve(cfg_path, log, max_workers=args.max_workers)
+        return {}
+
+    cfg = _load_yaml(cfg_path)
+    return run_pipeline(cfg, log, args.pipeline, max_workers=args.max_workers, resume=args.resume,
+                        profile=args.profile, trace_memory=args.trace_memory, check=args.check)
+
 if __name__ == "__main__":
     main()
@@ -1,5 +1,6 @@
 from __future__ import annotations
 import os, sys, argparse, io
+from functools import lru_cache
 from pathlib import Path
 from datetime import datetime
 
@@ -76,38 +77,65 @@ def read_first_case_no() -> str | None:
         return None
 
 # ---------------- font helpers ----------------
-def _choose_font_path(font_path: Path | None) -> Path:
-    candidates = []
-    if font_path: candidates.append(Path(font_path))
-    candidates += [
-        Path(r"C:\Windows\Fonts\consola.ttf"),
-        Path(r"C:\Windows\Fonts\arial.ttf"),
-        Path(r"C:\Windows\Fonts\segoeui.ttf"),
-        Path(r"C:\Windows\Fonts\times.ttf"),
-    ]
+# Регистър на шрифтовете: пътят се търси веднъж на процес, а заредените
+# FreeTypeFont обекти се пазят по (път, размер в px).
+FONT_PATHS_ENV = "STAMP_FONT_PATHS"   # доп. TTF-и (разделени с os.pathsep), с предимство
+DEFAULT_FONT_CANDIDATES = [
+    Path(r"C:\Windows\Fonts\consola.ttf"),
+    Path(r"C:\Windows\Fonts\arial.ttf"),
+    Path(r"C:\Windows\Fonts\segoeui.ttf"),
+    Path(r"C:\Windows\Fonts\times.ttf"),
+    Path("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf"),   # Linux (с кирилица)
+]
+_font_search: list[Path] = list(DEFAULT_FONT_CANDIDATES)
+
+def set_font_search_path(paths: list) -> None:
+    """
+    Сменя списъка с кандидат-шрифтове за текущия процес и нулира кешовете.
+    За process pool (spawn) ползвай STAMP_FONT_PATHS – той се наследява от децата.
+    """
+    _font_search[:] = [Path(p) for p in paths]
+    _resolve_font_path.cache_clear()
+    _load_font.cache_clear()
+    _render_text_png.cache_clear()
+
+def _font_candidates(env: str) -> list[Path]:
+    return [Path(p) for p in env.split(os.pathsep) if p] + _font_search
+
+@lru_cache(maxsize=None)
+def _resolve_font_path(font_path: str | None, env: str) -> Path:
+    # env (STAMP_FONT_PATHS) е част от ключа – смяна по време на работа важи веднага
+    candidates = ([Path(font_path)] if font_path else []) + _font_candidates(env)
     for p in candidates:
-        if p and p.exists(): return p
+        if p.exists(): return p
     raise FileNotFoundError("Не намерих подходящ TTF в системата.")
 
+def _choose_font_path(font_path: Path | None) -> Path:
+    return _resolve_font_path(str(font_path) if font_path else None, os.environ.get(FONT_PATHS_ENV, ""))
+
+@lru_cache(maxsize=32)
+def _load_font(font_path: str, size_px: int) -> ImageFont.FreeTypeFont:
+    return ImageFont.truetype(font_path, size_px)
+
 # ---------------- text → PNG with auto-sizing ----------------
-def measure_and_render_text_png(
+# Всички PDF-и в една партида имат един и същ текст → рендерираме веднъж.
+RENDER_CACHE_SIZE = 64
+
+@lru_cache(maxsize=RENDER_CACHE_SIZE)
+def _render_text_png(
     text: str,
-    font_path: Path | None,
+    font_path: str,
     font_size_pt: float,
-    pad_px: int = 8,
-    align_right: bool = True,
+    pad_px: int,
+    align_right: bool,
 ):
-    """
-    Връща (png_bytes, px_w, px_h, scale), като картинката е плътна около текста.
-    """
     SCALE = 6.0  # ~432 DPI
     # първо измерване с голямо „платно“
     tmp_w, tmp_h = 2000, 1000
     img = Image.new("RGBA", (tmp_w, tmp_h), (0, 0, 0, 0))
     draw = ImageDraw.Draw(img)
 
-    fpath = _choose_font_path(font_path)
-    fnt = ImageFont.truetype(str(fpath), int(font_size_pt * SCALE))
+    fnt = _load_font(font_path, int(font_size_pt * SCALE))
 
     lines = text.split("\n") or [""]
     # височина на ред и обща височина
@@ -138,6 +166,28 @@ def measure_and_render_text_png(
     img2.save(buf, format="PNG")
     return buf.getvalue(), W, H, SCALE
 
+def measure_and_render_text_png(
+    text: str,
+    font_path: Path | None,
+    font_size_pt: float,
+    pad_px: int = 8,
+    align_right: bool = True,
+):
+    """
+    Връща (png_bytes, px_w, px_h, SCALE), плътна картинка около текста.
+    Резултатът се кешира по (текст, шрифт, размер, padding, подравняване) –
+    виж render_cache_info().
+    """
+    fpath = _choose_font_path(font_path)
+    return _render_text_png(text, str(fpath), float(font_size_pt), int(pad_px), bool(align_right))
+
+def render_cache_info():
+    """hits/misses/currsize на кеша с рендерирани печати (functools.lru_cache)."""
+    return _render_text_png.cache_info()
+
+def render_cache_clear() -> None:
+    _render_text_png.cache_clear()
+
 # ---------------- stamping core ----------------
 def stamp_one(pdf_in: Path, out: Path, *,
               # позициониране
@@ -181,10 +231,19 @@ def stamp_one(pdf_in: Path, out: Path, *,
         pt_w = px_w / SCALE
         pt_h = px_h / SCALE
     else:
-        # ако е векторен текст, ползваме fallback правоъгълник
-        pt_w = mm(width_mm) if width_mm else mm(55.0)
-        pt_h = mm(height_mm) if height_mm else pt_w * 0.6
         png = None
+        try:
+            vec_font = str(_choose_font_path(font_file))
+        except FileNotFoundError:
+            vec_font = None         # няма TTF → вграденият Helvetica, както преди
+        if width_mm or not vec_font:
+            # фиксирана кутия (или няма шрифт за мерене) – fallback правоъгълник
+            pt_w = mm(width_mm) if width_mm else mm(55.0)
+            pt_h = mm(height_mm) if height_mm else pt_w * 0.6
+        else:
+            # векторният печат от tasks/stamp.py: кутията по метриките на шрифта, като PNG-то
+            from automation.tasks.stamp import _vector_layout
+            pt_w, pt_h, _ = _vector_layout(text, vec_font, float(font_size))
 
     # 2) Позициониране (anchor горе-вдясно)
     if anchor_rel:
@@ -220,17 +279,14 @@ def stamp_one(pdf_in: Path, out: Path, *,
     inner = inset(rect, mm(padding_mm))
     if as_image:
         page.insert_image(inner, stream=png, keep_proportion=False)
-    else:
-        # векторен текст с подравняване вдясно
-        kwargs = {
-            "fontsize": font_size,
-            "align": fitz.TEXT_ALIGN_RIGHT,
-            "color": (0,0,0),
-        }
-        fpath = font_file if font_file else _choose_font_path(None)
-        if fpath and Path(fpath).exists():
-            kwargs["fontfile"] = str(fpath)
-        page.insert_textbox(inner, text, **kwargs)
+    elif text and not vec_font:
+        page.insert_textbox(inner, text, fontsize=font_size, align=fitz.TEXT_ALIGN_RIGHT, color=(0,0,0))
+    elif text:
+        # отделен PDF със subset на шрифта → Form XObject; шрифтовете на входа не се пипат
+        from automation.tasks.stamp import _render_text_pdf
+        stamp = fitz.open("pdf", _render_text_pdf(text, vec_font, float(font_size), inner.width, inner.height))
+        page.show_pdf_page(inner, stamp, 0, keep_proportion=False)
+        stamp.close()
 
     out.parent.mkdir(parents=True, exist_ok=True)
     doc.save(out)
@@ -263,6 +319,8 @@ def main():
     ap.add_argument("--font", default=None)
     ap.add_argument("--font-size", type=float, default=DEFAULT_FONT_SIZE)
     ap.add_argument("--as-image", action="store_true", default=DEFAULT_AS_IMAGE)
+    ap.add_argument("--vector", dest="as_image", action="store_false",
+                    help="Векторен текст (вграден subset шрифт) вместо PNG")
 
     # Позициониране/кутия
     ap.add_argument("--anchor-rel", nargs=2, type=float, metavar=("RIGHT","TOP"), default=DEFAULT_ANCHOR_REL)
@@ -1,11 +1,20 @@
 # automation/tasks/excel_reader.py
 from __future__ import annotations
-from typing import Any, Dict, List
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List
 from pathlib import Path
-import os
+import os, hashlib
+from functools import lru_cache
 
-import pandas as pd
 from automation.orchestrator import task
+from automation.utils.paths import local_dir
+from automation.utils.disk_cache import DiskCache
+
+# pandas/numpy се зареждат при първо четене (виж PREWARM в оркестратора)
+if TYPE_CHECKING:
+    import pandas as pd
+    from automation.io.cases import Cases
+
+PREWARM = ("pandas", "automation.io.excel_reader")
 
 # Нормализация по желание; можеш да разшириш MAP според твоите колони
 MAP = {
@@ -22,6 +31,9 @@ MAP = {
     "DVIJEMI": "do_dvijemi",
     "BEZ_ZAPORI": "do_bez_zapори",
 }
+# Смени NORMALIZE_VERSION, ако промениш логиката на нормализация – кешът се обезсилва
+NORMALIZE_VERSION = 2
+FLAGS = [v for v in MAP.values() if v.startswith("do_")]
 WANTED_BASENAME = "Reports_Order"
 ALLOWED_EXTS = (".xlsx", ".xlsm", ".xls")
 
@@ -68,24 +80,172 @@ def _find_fallback(base_path: Path) -> Path | None:
 
     return None  # ще вдигнем подробна грешка в call-site
 
+def _resolve_target(path: str) -> Path:
+    raw = os.path.expandvars(path)
+    p = Path(raw)
+
+    target: Path | None = p if p.exists() else _find_fallback(p)
+    if not target or not target.exists():
+        # по-ясна грешка за логове
+        raise FileNotFoundError(f"Не намирам Excel файла около: {p}")
+    return target
+
+# ------------------------ Кеш на нормализираната таблица ------------------------
+_cache: DiskCache | None = None
+
+def _table_cache() -> DiskCache:
+    global _cache
+    if _cache is None:
+        _cache = DiskCache(local_dir() / "cache" / "excel")
+    return _cache
+
+def _cache_key(target: Path) -> str:
+    return f"tasks.read_cases|{target.resolve()}"
+
+@lru_cache(maxsize=None)
+def map_version() -> str:
+    """
+    Версия на нормализацията за кеша: MAP/NORMALIZE_VERSION оттук + io.excel_reader.MAP_VERSION
+    (флаговете и TEXT_TRUE са там). Импортът е тук, за да не тегли numpy при зареждане.
+    """
+    from automation.io.excel_reader import MAP_VERSION as io_version
+    blob = f"{NORMALIZE_VERSION}:{sorted(MAP.items())}:{io_version}"
+    return hashlib.sha1(blob.encode("utf-8")).hexdigest()[:12]
+
+def _fingerprint(target: Path) -> dict:
+    st = target.stat()
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "map": map_version()}
+
+def invalidate_cache(path: str | None = None) -> int:
+    """Маха кеша за един файл (path) или целия Excel кеш. Връща броя изтрити записи."""
+    if path is None:
+        return _table_cache().invalidate()
+    return _table_cache().invalidate(_cache_key(_resolve_target(path)))
+
 @task("read_cases")
-def read_cases(path: str) -> List[Dict[str, Any]]:
+def read_cases(path: str, use_cache: bool = True, index: bool = False) -> Cases:
     """
     Чете Excel:
       - Ако подаденото `path` съществува → ползва него.
       - Иначе търси автоматично 'Reports_Order*.xls[x|m]' в разумни места около подадения път.
       - Вдига подробен FileNotFoundError, ако нищо не открие.
+    Връща Cases (колонно); cases.to_records() дава list[dict]. За разлика от досегашния
+    df.to_dict("records") стойностите са нормализирани: case_no/egn_or_eik са str
+    (1234.0 → "1234"), do_* флаговете са 0/1 (io.excel_reader.normalize_flags: "да", "x" → 1,
+    нечислово → 0). Викащите сравняват case_no като текст (виж io.cases.as_text).
+    index=True строи веднага индексите (флаг → редове, case_no, egn_or_eik).
+    Нормализираният резултат се кешира на диск по път + размер + mtime + map_version(),
+    така че повторно четене на непроменен файл не парсва Excel-а.
     """
-    raw = os.path.expandvars(path)
-    p = Path(raw)
+    from automation.io.cases import Cases
+    from automation.io.excel_reader import normalize_flags
 
-    target: Path | None = p if p.exists() else _find_fallback(p)
-    if not target or not target.exists():
-        # по-ясна грешка за логове
-        raise FileNotFoundError(f"Не намирам Excel файла около: {p}")
+    target = _resolve_target(path)
+    fp = _fingerprint(target)          # преди четенето – виж io.excel_reader.read_cases
+    if use_cache:
+        hit, rows = _table_cache().get(_cache_key(target), meta=fp)
+        if hit:
+            if index:
+                rows.build_index()
+            return rows
 
+    import pandas as pd
     df = pd.read_excel(target, **_pick_engine(target))
     df = _normalize_columns(df)
     if "case_no" in df.columns:
         df = df[~df["case_no"].isna()]
-    return df.fillna("").to_dict(orient="records")
+    df = normalize_flags(df, FLAGS)
+    rows = Cases.from_frame(df.fillna(""), flags=FLAGS)
+    if use_cache:
+        _table_cache().put(_cache_key(target), rows, meta=fp)
+    if index:
+        rows.build_index()
+    return rows
+
+# ------------------------ Поточно четене на големи файлове ------------------------
+def _xls_value(cell, datemode: int) -> Any:
+    import xlrd
+    if cell.ctype in (xlrd.XL_CELL_EMPTY, xlrd.XL_CELL_BLANK, xlrd.XL_CELL_ERROR):
+        return None
+    if cell.ctype == xlrd.XL_CELL_NUMBER:
+        v = cell.value
+        return int(v) if float(v).is_integer() else v     # като pandas
+    if cell.ctype == xlrd.XL_CELL_DATE:
+        return xlrd.xldate_as_datetime(cell.value, datemode)
+    if cell.ctype == xlrd.XL_CELL_BOOLEAN:
+        return bool(cell.value)
+    return cell.value
+
+def _iter_sheet_rows(target: Path) -> Iterator[tuple]:
+    """Редовете на първия лист (както pd.read_excel по подразбиране), без да зарежда DataFrame."""
+    ext = target.suffix.lower()
+    if ext in (".xlsx", ".xlsm"):
+        from openpyxl import load_workbook
+        wb = load_workbook(target, read_only=True, data_only=True)   # стрийминг по редове
+        try:
+            yield from wb.worksheets[0].iter_rows(values_only=True)
+        finally:
+            wb.close()
+    elif ext == ".xls":
+        # BIFF няма поточен режим – xlrd чете файла, но редовете си ги вадим един по един
+        import xlrd
+        book = xlrd.open_workbook(str(target), on_demand=True)
+        try:
+            sh = book.sheet_by_index(0)
+            for r in range(sh.nrows):
+                yield tuple(_xls_value(c, book.datemode) for c in sh.row(r))
+        finally:
+            book.release_resources()
+    else:
+        raise ValueError(f"Неподдържан формат: {target.suffix}")
+
+def _header_columns(header: tuple) -> List[str]:
+    """Имена на колоните като при pandas (Unnamed: N, дубликати X.1) + MAP нормализация."""
+    cols: List[str] = []
+    seen: Dict[str, int] = {}
+    for i, c in enumerate(header):
+        name = f"Unnamed: {i}" if c is None else str(c).strip()
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        cols.append(MAP.get(name, name))
+    return cols
+
+def iter_cases(path: str, chunk_rows: int = 5000) -> Iterator[Cases]:
+    """
+    Като read_cases, но поточно: връща партиди (Cases) от до `chunk_rows` нормализирани
+    записа, докато файлът още се чете (.xlsx – openpyxl read-only, .xls – xlrd).
+    Същата MAP нормализация и филтър по case_no; празните клетки са "".
+    Стойностите са както са в клетката (без pandas преобразуване на типове).
+    """
+    from automation.io.cases import Cases
+    from automation.io.excel_reader import flag_value
+
+    target = _resolve_target(path)
+    rows = _iter_sheet_rows(target)
+    header = next(rows, None)
+    if header is None:
+        return
+    cols = _header_columns(header)
+    missing = [c for c in dict.fromkeys(MAP.values()) if c not in cols]
+
+    batch: List[Dict[str, Any]] = []
+    for row in rows:
+        rec = {c: "" for c in cols}
+        for c, v in zip(cols, row):
+            if v is not None:
+                rec[c] = v
+        for c in missing:
+            rec[c] = ""
+        if rec.get("case_no", "") == "":
+            continue
+        for f in FLAGS:
+            rec[f] = flag_value(rec[f])
+        batch.append(rec)
+        if len(batch) >= chunk_rows:
+            yield Cases.from_records(batch, flags=FLAGS)
+            batch = []
+    if batch:
+        yield Cases.from_records(batch, flags=FLAGS)
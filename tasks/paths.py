@@ -23,6 +23,8 @@ FOLDERID_Desktop = GUID(
 )
 
 def _known_folder_path(fid: GUID) -> Optional[Path]:
+    if not hasattr(ctypes, "windll"):      # не е Windows → резервните варианти отдолу
+        return None
     ppsz = wintypes.LPWSTR()
     shget = ctypes.windll.shell32.SHGetKnownFolderPath
     shget.argtypes = [ctypes.POINTER(GUID), wintypes.DWORD, wintypes.HANDLE, ctypes.POINTER(wintypes.LPWSTR)]
@@ -0,0 +1,40 @@
+# automation/tasks/portal.py
+# Справки в портала на Агенцията по вписванията за делата от Reports_Order (ctx["cases"]).
+from __future__ import annotations
+import time
+from typing import Any, Dict, Optional, Sequence
+
+from automation.orchestrator import task
+
+# playwright се зарежда при първата справка (виж PREWARM в оркестратора)
+PREWARM = ("playwright.async_api", "automation.web.async_engine")
+
+@task("portal_lookups")
+def portal_lookups(cases: Any, kinds: Sequence[str] = ("ikar", "dvijemi"), base_url: Optional[str] = None,
+                   concurrency: int = 4, contexts: Optional[int] = None, rate_per_host: float = 5.0,
+                   retries: int = 3, headless: bool = True, routes: Any = None,
+                   lookups: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    """
+    По една справка за всяко дело с вдигнат do_<kind>, паралелно през web.async_engine.
+    Връща {"results": [...], "lookup_count", "ok", "failed", "seconds", "login", "requests"};
+    неуспешните справки са в results с ok=False и error – стъпката не пада заради тях.
+    routes – настройки на web.routing.RoutePolicy (block_types, deny, allow, cache), False → без.
+    lookups – {kind: "pkg.mod:func"} за всеки вид от kinds (async (page, job, base_url) → стойност);
+    вид без lookup → ValueError, преди да се пусне браузърът.
+    """
+    from automation.web.async_engine import lookup_cases
+    t0 = time.perf_counter()
+    summary: Dict[str, Any] = {}
+    results = lookup_cases(cases, kinds, summary=summary, base_url=base_url, concurrency=concurrency,
+                           contexts=contexts, rate_per_host=rate_per_host, retries=retries,
+                           headless=headless, routes=routes, lookups=lookups)
+    ok = sum(1 for r in results if r["ok"])
+    return {
+        "results": results,
+        "lookup_count": len(results),
+        "ok": ok,
+        "failed": len(results) - ok,
+        "seconds": round(time.perf_counter() - t0, 2),
+        "login": summary.get("steps", []),
+        "requests": summary.get("requests", {}),
+    }
@@ -3,13 +3,22 @@
 # + малък wrapper `stamp_dir` за оркестратора.
 
 from __future__ import annotations
-import os, sys, io, argparse
+import os, sys, io, argparse, math, json, hashlib, logging, re, threading, time
+from functools import lru_cache
 from pathlib import Path
 from datetime import datetime
-from typing import Optional, Tuple
+from typing import TYPE_CHECKING, Callable, Optional, Tuple
 
-import fitz  # PyMuPDF
-from PIL import Image, ImageDraw, ImageFont
+# fitz (PyMuPDF) и PIL се импортират при първа нужда – модулът се зарежда
+# бързо (напр. при pre-flight в оркестратора), а PREWARM казва на оркестратора
+# какво да зареди предварително във фонова нишка.
+if TYPE_CHECKING:
+    import fitz
+    from PIL import ImageFont
+
+PREWARM = ("fitz", "PIL.Image", "PIL.ImageDraw", "PIL.ImageFont")
+
+log = logging.getLogger(__name__)
 
 # ------------------------ Константи/дефолти ------------------------
 DEFAULT_ANCHOR_REL      = (0.97, 0.02)          # десен/горен ръб в относителни координати
@@ -73,16 +82,13 @@ def read_stamp_txt(root: Path) -> tuple[Optional[str], Optional[str]]:
 # ------------------------ Първо дело от Excel (ако има) ------------------------
 def read_first_case_no() -> Optional[str]:
     """
-    Опитва да прочете първото дело от Excel чрез read_cases().
+    Опитва да прочете първото дело от Excel.
     Търси файл в обичайна локация: %USERPROFILE%\\Documents\\automation\\Reports_Order.xlsx
     (ако не намери/гърми – връща None).
+    Чете поточно само до първия валиден ред (iter_cases), а не целия файл.
     """
-    # import-ът позволява вариантите ти на организация
     try:
-        try:
-            from .excel_reader import read_cases  # ако сме в пакет tasks
-        except Exception:
-            from automation.io.excel_reader import read_cases  # резервен импорт
+        from .excel_reader import iter_cases
     except Exception:
         return None
 
@@ -99,42 +105,71 @@ def read_first_case_no() -> Optional[str]:
             return None
 
     try:
-        rows = read_cases(str(default_excel))
-        return rows[0].get("case_no") if rows else None
+        first = next(iter_cases(str(default_excel), chunk_rows=1), [])
+        return first[0].get("case_no") if first else None
     except Exception:
         return None
 
 # ------------------------ Помощни: шрифт/измерване ------------------------
-def _choose_font_path(font_path: Optional[Path]) -> Path:
-    candidates = []
-    if font_path: candidates.append(Path(font_path))
-    candidates += [
-        Path(r"C:\Windows\Fonts\consola.ttf"),
-        Path(r"C:\Windows\Fonts\arial.ttf"),
-        Path(r"C:\Windows\Fonts\segoeui.ttf"),
-        Path(r"C:\Windows\Fonts\times.ttf"),
-    ]
+# Регистър на шрифтовете: пътят се търси веднъж на процес, а заредените
+# FreeTypeFont обекти се пазят по (път, размер в px).
+FONT_PATHS_ENV = "STAMP_FONT_PATHS"   # доп. TTF-и (разделени с os.pathsep), с предимство
+DEFAULT_FONT_CANDIDATES = [
+    Path(r"C:\Windows\Fonts\consola.ttf"),
+    Path(r"C:\Windows\Fonts\arial.ttf"),
+    Path(r"C:\Windows\Fonts\segoeui.ttf"),
+    Path(r"C:\Windows\Fonts\times.ttf"),
+    Path("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf"),   # Linux (с кирилица)
+]
+_font_search: list[Path] = list(DEFAULT_FONT_CANDIDATES)
+
+def set_font_search_path(paths: list) -> None:
+    """
+    Сменя списъка с кандидат-шрифтове за текущия процес и нулира кешовете.
+    За process pool (spawn) ползвай STAMP_FONT_PATHS – той се наследява от децата.
+    """
+    _font_search[:] = [Path(p) for p in paths]
+    _resolve_font_path.cache_clear()
+    _load_font.cache_clear()
+    _render_text_png.cache_clear()
+
+def _font_candidates(env: str) -> list[Path]:
+    return [Path(p) for p in env.split(os.pathsep) if p] + _font_search
+
+@lru_cache(maxsize=None)
+def _resolve_font_path(font_path: Optional[str], env: str) -> Path:
+    # env (STAMP_FONT_PATHS) е част от ключа – смяна по време на работа (демона) важи веднага
+    candidates = ([Path(font_path)] if font_path else []) + _font_candidates(env)
     for p in candidates:
-        if p and p.exists(): return p
+        if p.exists(): return p
     raise FileNotFoundError("Не намерих подходящ TTF в системата.")
 
-def measure_and_render_text_png(
+def _choose_font_path(font_path: Optional[Path]) -> Path:
+    return _resolve_font_path(str(font_path) if font_path else None, os.environ.get(FONT_PATHS_ENV, ""))
+
+@lru_cache(maxsize=32)
+def _load_font(font_path: str, size_px: int) -> ImageFont.FreeTypeFont:
+    from PIL import ImageFont
+    return ImageFont.truetype(font_path, size_px)
+
+# Всички PDF-и в една партида имат един и същ текст → рендерираме веднъж.
+RENDER_CACHE_SIZE = 64
+
+@lru_cache(maxsize=RENDER_CACHE_SIZE)
+def _render_text_png(
     text: str,
-    font_path: Optional[Path],
+    font_path: str,
     font_size_pt: float,
-    pad_px: int = 8,
-    align_right: bool = True,
+    pad_px: int,
+    align_right: bool,
 ) -> Tuple[bytes, int, int, float]:
-    """
-    Връща (png_bytes, px_w, px_h, SCALE), плътна картинка около текста.
-    """
+    from PIL import Image, ImageDraw
     SCALE = 6.0  # ~432 DPI
     tmp_w, tmp_h = 2000, 1000
     img = Image.new("RGBA", (tmp_w, tmp_h), (0, 0, 0, 0))
     draw = ImageDraw.Draw(img)
 
-    fpath = _choose_font_path(font_path)
-    fnt = ImageFont.truetype(str(fpath), int(font_size_pt * SCALE))
+    fnt = _load_font(font_path, int(font_size_pt * SCALE))
 
     lines = text.split("\n") or [""]
     line_h = max(draw.textbbox((0, 0), "Ag", font=fnt)[3], 1)
@@ -162,8 +197,112 @@ def measure_and_render_text_png(
     img2.save(buf, format="PNG")
     return buf.getvalue(), W, H, SCALE
 
+def measure_and_render_text_png(
+    text: str,
+    font_path: Optional[Path],
+    font_size_pt: float,
+    pad_px: int = 8,
+    align_right: bool = True,
+) -> Tuple[bytes, int, int, float]:
+    """
+    Връща (png_bytes, px_w, px_h, SCALE), плътна картинка около текста.
+    Резултатът се кешира по (текст, шрифт, размер, padding, подравняване) –
+    виж render_cache_info().
+    """
+    fpath = _choose_font_path(font_path)
+    return _render_text_png(text, str(fpath), float(font_size_pt), int(pad_px), bool(align_right))
+
+def render_cache_info():
+    """hits/misses/currsize на кеша с рендерирани печати (functools.lru_cache)."""
+    return _render_text_png.cache_info()
+
+def render_cache_clear() -> None:
+    _render_text_png.cache_clear()
+    _render_text_pdf.cache_clear()
+
+# ------------------------ Векторен печат (без PNG) ------------------------
+# Същата геометрия като при PNG пътя: 8px padding при SCALE=6 и междуредие 1.10,
+# така че кутията и подредбата излизат еднакви, но текстът е истински (векторен,
+# избираем). Печатът се прави като отделен малък PDF със subset на шрифта и се слага
+# на страницата като Form XObject – шрифтовете на входния документ не се пипат.
+VECTOR_PAD_PT    = 8 / 6.0
+LINE_SPACING     = 1.10
+
+@lru_cache(maxsize=8)
+def _font_buffer(font_path: str) -> bytes:
+    return Path(font_path).read_bytes()
+
+@lru_cache(maxsize=8)
+def _fitz_font(font_path: str):
+    import fitz
+    return fitz.Font(fontbuffer=_font_buffer(font_path))
+
+@lru_cache(maxsize=8)
+def _line_metrics(font_path: str) -> Tuple[float, float]:
+    """
+    (ascent, височина на ред) като дял от размера – както ги смята PNG пътят
+    (PIL: getmetrics() и долният ръб на "Ag"). Само метрики, без растеризация.
+    """
+    ref = 1000
+    fnt = _load_font(font_path, ref)
+    return fnt.getmetrics()[0] / ref, max(fnt.getbbox("Ag")[3], 1) / ref
+
+@lru_cache(maxsize=RENDER_CACHE_SIZE)
+def _vector_layout(text: str, font_path: str, font_size_pt: float) -> Tuple[float, float, Tuple[float, ...]]:
+    """(ширина, височина) на кутията в pt и ширината на всеки ред – мерено с метриките на шрифта."""
+    font = _fitz_font(font_path)
+    lines = text.split("\n")
+    widths = tuple(font.text_length(ln, fontsize=font_size_pt) for ln in lines)
+    line_h = _line_metrics(font_path)[1] * font_size_pt
+    return (max(widths) + 2 * VECTOR_PAD_PT,
+            len(lines) * line_h * LINE_SPACING + 2 * VECTOR_PAD_PT,
+            widths)
+
+def _insert_text_vector(page, box, text: str, font_path: str, font_size_pt: float) -> None:
+    """
+    Текстът, подравнен вдясно, в `box` – мащабиран като PNG-то, което
+    insert_image(keep_proportion=False) би разпънало в същата кутия
+    (размер по вертикалния мащаб + хоризонтално разпъване през morph).
+    Всички редове минават през един TextWriter с кеширания fitz.Font → шрифтът се
+    вгражда веднъж (един xref за целия печат), а ширините идват от самия Font,
+    без page.insert_text, който ги преизчислява за всеки нов документ.
+    """
+    pt_w, pt_h, widths = _vector_layout(text, font_path, font_size_pt)
+    ascent, line_h = _line_metrics(font_path)
+    import fitz
+    font = _fitz_font(font_path)
+    sx, sy = box.width / pt_w, box.height / pt_h
+    fs = font_size_pt * sy
+    line_adv = line_h * font_size_pt * LINE_SPACING * sy
+    right = box.x1 - VECTOR_PAD_PT * sx
+    y = box.y0 + VECTOR_PAD_PT * sy + ascent * font_size_pt * sy
+    tw = fitz.TextWriter(page.rect)
+    for ln, w in zip(text.split("\n"), widths):
+        if ln:
+            tw.append((right - w * sy, y), ln, font=font, fontsize=fs)
+        y += line_adv
+    # хоризонталното разпъване е около десния ръб – подравняването се запазва
+    tw.write_text(page, color=(0, 0, 0), morph=(fitz.Point(right, box.y0), fitz.Matrix(sx / sy, 1)))
+
+@lru_cache(maxsize=RENDER_CACHE_SIZE)
+def _render_text_pdf(text: str, font_path: str, font_size_pt: float, w: float, h: float) -> bytes:
+    """
+    Едностраничен PDF (w x h pt) само с текста на печата и subset на шрифта му –
+    векторният аналог на _render_text_png. subset_fonts() работи върху този документ,
+    не върху входния PDF (там биха се subset-нали и неговите шрифтове).
+    """
+    import fitz
+    src = fitz.open()
+    page = src.new_page(width=w, height=h)
+    _insert_text_vector(page, page.rect, text, font_path, font_size_pt)
+    src.subset_fonts()
+    data = src.tobytes(garbage=3, deflate=True, deflate_fonts=True)
+    src.close()
+    return data
+
 # ------------------------ Геометрия ------------------------
 def inset(rect: fitz.Rect, pad: float) -> fitz.Rect:
+    import fitz
     return fitz.Rect(rect.x0 + pad, rect.y0 + pad, rect.x1 - pad, rect.y1 - pad)
 
 # ------------------------ Основно печатане на един PDF ------------------------
@@ -184,6 +323,7 @@ def stamp_one(
     fill_white: bool, stroke_alpha: float, fill_alpha: float,
     debug_frame: bool = False
 ):
+    import fitz  # PyMuPDF
     doc = fitz.open(pdf_in)
     page = doc[page_index]
     Wp, Hp = page.rect.width, page.rect.height
@@ -203,9 +343,18 @@ def stamp_one(
         )
         pt_w, pt_h = px_w / SCALE, px_h / SCALE
     else:
-        pt_w = mm(width_mm) if width_mm else mm(55.0)
-        pt_h = mm(height_mm) if height_mm else pt_w * 0.6
         png = None
+        try:
+            vec_font = str(_choose_font_path(font_file))
+        except FileNotFoundError:
+            # няма TTF → вграденият Helvetica през insert_textbox, както преди (без кирилица)
+            vec_font = None
+        if width_mm or not vec_font:
+            pt_w = mm(width_mm) if width_mm else mm(55.0)
+            pt_h = mm(height_mm) if height_mm else pt_w * 0.6
+        else:
+            # векторно: кутията се мери от метриките на шрифта – като при PNG, без растер
+            pt_w, pt_h, _ = _vector_layout(text, vec_font, float(font_size))
 
     # 2) Позиция
     if anchor_rel:
@@ -240,17 +389,148 @@ def stamp_one(
     inner = inset(rect, mm(padding_mm))
     if as_image:
         page.insert_image(inner, stream=png, keep_proportion=False)
-    else:
-        kwargs = {"fontsize": font_size, "align": fitz.TEXT_ALIGN_RIGHT, "color": (0, 0, 0)}
-        fpath = font_file if font_file else _choose_font_path(None)
-        if fpath and Path(fpath).exists():
-            kwargs["fontfile"] = str(fpath)
-        page.insert_textbox(inner, text, **kwargs)
+    elif text and not vec_font:
+        page.insert_textbox(inner, text, fontsize=font_size, align=fitz.TEXT_ALIGN_RIGHT, color=(0, 0, 0))
+    elif text:
+        stamp = fitz.open("pdf", _render_text_pdf(text, vec_font, float(font_size), inner.width, inner.height))
+        page.show_pdf_page(inner, stamp, 0, keep_proportion=False)
+        stamp.close()
 
     out.parent.mkdir(parents=True, exist_ok=True)
     doc.save(out)
     doc.close()
 
+# ------------------------ Пакетно печатане (process pool) ------------------------
+def _stamp_chunk(jobs: list[dict]) -> list[dict]:
+    """
+    Печата парче от PDF-и в един процес. Грешка в един файл не спира останалите –
+    връща по един резултат {"file", "ok", "error"} за всеки job.
+    """
+    results = []
+    for job in jobs:
+        try:
+            stamp_one(**job)
+            results.append({"file": str(job["pdf_in"]), "ok": True, "error": None})
+        except Exception as e:
+            results.append({"file": str(job["pdf_in"]), "ok": False, "error": f"{type(e).__name__}: {e}"})
+    return results
+
+def _stamp_batch(jobs: list[dict], workers: Optional[int] = None, chunk_size: Optional[int] = None,
+                 on_chunk: Optional[Callable[[list[dict], list[dict]], None]] = None) -> list[dict]:
+    """
+    Разпределя jobs (kwargs за stamp_one) по ProcessPoolExecutor на парчета.
+    workers=None → брой ядра; workers<=1 → в текущия процес.
+    on_chunk(jobs, results) се вика в този процес след всяко завършено парче
+    (напр. за записване на напредъка). Резултатите са в реда на jobs.
+    """
+    workers = workers or os.cpu_count() or 1
+    workers = min(workers, len(jobs))
+    # ~4 парчета на процес: достатъчно за балансиране, без pickle overhead за всеки файл
+    chunk_size = chunk_size or max(1, math.ceil(len(jobs) / (max(workers, 1) * 4)))
+    chunks = [jobs[i:i + chunk_size] for i in range(0, len(jobs), chunk_size)]
+
+    by_chunk: dict[int, list[dict]] = {}
+    if workers <= 1:
+        for n, ch in enumerate(chunks):
+            by_chunk[n] = _stamp_chunk(ch)
+            if on_chunk: on_chunk(ch, by_chunk[n])
+    else:
+        from concurrent.futures import ProcessPoolExecutor, as_completed
+        with ProcessPoolExecutor(max_workers=workers) as ex:
+            futures = {ex.submit(_stamp_chunk, ch): n for n, ch in enumerate(chunks)}
+            for fut in as_completed(futures):
+                n = futures[fut]
+                try:
+                    by_chunk[n] = fut.result()
+                except Exception as e:   # напр. BrokenProcessPool – маркираме цялото парче
+                    by_chunk[n] = [{"file": str(j["pdf_in"]), "ok": False, "error": f"{type(e).__name__}: {e}"}
+                                   for j in chunks[n]]
+                if on_chunk: on_chunk(chunks[n], by_chunk[n])
+    return [r for n in range(len(chunks)) for r in by_chunk[n]]
+
+# ------------------------ Инкрементален режим (manifest) ------------------------
+MANIFEST_NAME = ".stamp_manifest.json"
+MANIFEST_VERSION = 1
+
+def _load_manifest(out_p: Path) -> dict:
+    try:
+        with open(out_p / MANIFEST_NAME, encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") == MANIFEST_VERSION:
+            return data.get("files", {})
+    except Exception:
+        pass
+    return {}
+
+def _save_manifest(out_p: Path, files: dict) -> None:
+    # атомарно: пишем временен файл и го подменяме
+    path = out_p / MANIFEST_NAME
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"version": MANIFEST_VERSION, "files": files}, f, ensure_ascii=False, indent=1)
+    os.replace(tmp, path)
+
+def _stamp_signature(job: dict) -> str:
+    """
+    Хеш на параметрите/текста на печата. Датата (in_date) не влиза – тя е датата
+    на първото входиране и не трябва да пре-печатва всичко всеки ден.
+    """
+    params = {k: v for k, v in job.items() if k not in ("pdf_in", "out", "in_date")}
+    blob = json.dumps(params, default=str, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(blob.encode("utf-8")).hexdigest()
+
+def _file_fingerprint(p: Path, content_hash: bool) -> dict:
+    st = p.stat()
+    fp = {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+    if content_hash:
+        h = hashlib.sha1()
+        with open(p, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+        fp["sha1"] = h.hexdigest()
+    return fp
+
+def _is_up_to_date(entry: Optional[dict], fp: dict, sig: str, out: Path) -> bool:
+    if not entry or entry.get("sig") != sig or not out.exists():
+        return False
+    if "sha1" in fp:
+        return entry.get("size") == fp["size"] and entry.get("sha1") == fp["sha1"]
+    return entry.get("size") == fp["size"] and entry.get("mtime_ns") == fp["mtime_ns"]
+
+# ------------------------ Дело по име на PDF ------------------------
+_NAME_TOKEN = re.compile(r"[^\W_]+(?:-[^\W_]+)*")
+
+def _case_lookup(cases):
+    """case_no → ред от Cases (или list[dict]) чрез индекса в паметта."""
+    from automation.io.cases import Cases
+    if isinstance(cases, str):
+        raise TypeError(f"cases трябва да е Cases/list[dict], а не текст: {cases!r}")
+    if not isinstance(cases, Cases):
+        cases = Cases.from_records(list(cases))
+    return cases.index.case_no
+
+def _match_case_no(stem: str, lookup: Optional[dict], case_pattern: Optional[str]) -> Optional[str]:
+    """
+    Номерът на делото за един PDF:
+      - case_pattern (regex, група `case_no` или първата група) → извлеченото,
+        ако е сред делата (или няма подадени дела);
+      - иначе първият токен от името (думи/цифри, свързани с "-"), който е номер на дело.
+    """
+    from automation.io.cases import as_text
+    if case_pattern:
+        m = re.search(case_pattern, stem)
+        if not m:
+            return None
+        key = m.groupdict().get("case_no") or (m.group(1) if m.groups() else m.group(0))
+        key = as_text(key)
+        return key if lookup is None or key in lookup else None
+    if lookup:
+        for tok in _NAME_TOKEN.findall(stem):
+            for cand in (tok, *tok.split("-")):
+                if cand in lookup:
+                    return cand
+    return None
+
 # ------------------------ Wrapper за оркестратора ------------------------
 def stamp_dir(
     ctx: dict | None = None,
@@ -262,11 +542,41 @@ def stamp_dir(
     case_no: Optional[str] = None,
     page_index: int = 0,
     as_image: bool = True,
-    debug_frame: bool = False
+    debug_frame: bool = False,
+    font_file: Optional[str] = None,
+    workers: Optional[int] = None,
+    chunk_size: Optional[int] = None,
+    incremental: bool = False,
+    content_hash: bool = False,
+    cases=None,
+    case_pattern: Optional[str] = None,
+    resume: bool = False,
+    watch: bool = False,
+    watch_seconds: Optional[float] = None,
+    settle_s: float = 2.0,
+    stop: Optional[threading.Event] = None,
 ) -> dict:
     """
     Обхожда *.pdf от входната папка и прави *_stamped.pdf в изходната.
-    Връща: {"stamped_count": N, "output_dir": "<път>"}
+    Файловете се разпределят на `workers` процеса (по подразбиране – брой ядра);
+    повреден PDF не спира останалите.
+    incremental=True → печата само нови/променени PDF-и или такива с променен текст
+    на печата (по manifest в изходната папка; content_hash=True сравнява sha1
+    вместо mtime). Manifest-ът се записва след всяко парче, така че resume=True
+    (оркестраторът го подава при --resume) продължава от мястото на прекъсване.
+    Manifest-ът се води винаги (размер/mtime, sha1 само при content_hash), за да може
+    и прекъснато обикновено пускане да продължи с --resume; пропускат се файлове
+    само при incremental/resume.
+    cases (Cases/list[dict] от read_cases) → всеки PDF получава своя case_no по името
+    си (виж _match_case_no, case_pattern); без съвпадение – подаденият case_no, а ако
+    и него няма, файлът не се печата и е във files с ok=False.
+    Без cases се ползва общ case_no за всички (или първото дело от Excel).
+    watch=True → след обработката на наличните файлове следи in_dir и печата всеки
+    нов/дописан PDF веднага щом „утихне“ (settle_s), през ограничена опашка към
+    същите процеси; спира след watch_seconds, при stop.set() (оркестраторът го подава –
+    Ctrl+C, спиране на daemon-а) или Ctrl+C в главната нишка. Виж _watch_loop.
+    Връща: {"stamped_count": N, "skipped_count": S, "failed_count": F,
+            "output_dir": "<път>", "files": [{"file", "ok", "error", "case_no"}, ...]}
     """
     desktop = get_desktop_dir()
     # Desktop\Робот-Дела\BNB е дефолт, ако не подадеш in_dir/out_dir
@@ -281,28 +591,214 @@ def stamp_dir(
         name  = name or _n
         reg_no = reg_no or _r
 
-    case_no = case_no or read_first_case_no()
-    date_str = datetime.now().strftime("%d.%m.%Y")
+    lookup = _case_lookup(cases) if cases is not None else None
+    if lookup is None and not case_pattern:
+        case_no = case_no or read_first_case_no()
 
-    pdfs = sorted([p for p in in_p.glob("*.pdf") if p.is_file()])
-    stamped = 0
-    for p in pdfs:
-        out = out_p / (p.stem + "_stamped.pdf")
-        stamp_one(
-            pdf_in=p, out=out,
+    def make_job(p: Path) -> dict:
+        return dict(
+            pdf_in=p, out=out_p / (p.stem + "_stamped.pdf"),
             anchor_rel=DEFAULT_ANCHOR_REL, rel_fallback=DEFAULT_REL_FALLBACK,
             margin_mm=5.0, width_mm=None, height_mm=None,
             page_index=page_index,
-            name=name, reg_no=reg_no, doc_no=doc_no, in_date=date_str, case_no=case_no,
-            font_file=None, font_size=DEFAULT_FONT_SIZE,
+            name=name, reg_no=reg_no, doc_no=doc_no,
+            in_date=datetime.now().strftime("%d.%m.%Y"),
+            case_no=_match_case_no(p.stem, lookup, case_pattern) or case_no,
+            font_file=Path(font_file) if font_file else None, font_size=DEFAULT_FONT_SIZE,
             as_image=as_image,
             border_mm=DEFAULT_BORDER_MM, padding_mm=DEFAULT_PADDING_MM,
             fill_white=DEFAULT_FILL_BG,
             stroke_alpha=DEFAULT_STROKE_A, fill_alpha=DEFAULT_FILL_A,
             debug_frame=debug_frame
         )
-        stamped += 1
-    return {"stamped_count": stamped, "output_dir": str(out_p)}
+
+    watcher = None
+    if watch:
+        from automation.utils.fswatch import DirWatcher
+        # watcher-ът тръгва преди първия обход: наличните PDF-и не ги връща втори път,
+        # а файл, дошъл докато печатаме тях, не се губи
+        watcher = DirWatcher(in_p, "*.pdf", settle_s=settle_s, poll_s=0.5)
+
+    # при търсене по дела PDF без намерено дело (и без общ case_no) не се печата с празен номер
+    matching = lookup is not None or bool(case_pattern)
+
+    def unmatched(job: dict) -> Optional[dict]:
+        if not matching or job["case_no"]:
+            return None
+        log.warning("stamp_dir: %s – няма дело за името на файла, не е печатан", job["pdf_in"].name)
+        return {"file": str(job["pdf_in"]), "ok": False, "error": "няма дело за името на файла", "case_no": None}
+
+    pdfs = sorted([p for p in in_p.glob("*.pdf") if p.is_file()])
+    jobs, no_case = [], []
+    for job in map(make_job, pdfs):
+        miss = unmatched(job)
+        (no_case if miss else jobs).append(miss or job)
+
+    # manifest-ът се пише винаги (--resume след прекъснато обикновено пускане);
+    # готовите файлове се пропускат само при incremental/resume
+    skip_done = incremental or resume
+    seen = {str(p.resolve()) for p in pdfs}
+    manifest = {k: v for k, v in _load_manifest(out_p).items() if k in seen}   # изтритите входове отпадат
+    entries: dict[int, tuple[str, dict]] = {}
+    unreadable: list[dict] = []     # изтрит/заключен вход между обхода и stat/хеширането
+
+    def needs_stamp(job: dict) -> bool:
+        try:
+            key = str(job["pdf_in"].resolve())
+            fp = _file_fingerprint(job["pdf_in"], content_hash)
+        except OSError as e:
+            log.warning("stamp_dir: %s – не може да се прочете: %s", job["pdf_in"].name, e)
+            unreadable.append({"file": str(job["pdf_in"]), "ok": False,
+                               "error": f"{type(e).__name__}: {e}", "case_no": job["case_no"]})
+            return False
+        sig = _stamp_signature(job)
+        if skip_done and _is_up_to_date(manifest.get(key), fp, sig, job["out"]):
+            return False
+        entries[id(job)] = (key, {**fp, "sig": sig, "out": str(job["out"]), "in_date": job["in_date"]})
+        return True
+
+    def progress(chunk: list[dict], chunk_results: list[dict]) -> None:
+        for job, r in zip(chunk, chunk_results):
+            r["case_no"] = job["case_no"]
+            key, entry = entries.pop(id(job))
+            if r["ok"]:
+                manifest[key] = entry
+        _save_manifest(out_p, manifest)
+
+    todo = [job for job in jobs if needs_stamp(job)]
+    skipped = len(jobs) - len(todo) - len(unreadable)
+
+    try:
+        results = _stamp_batch(todo, workers=workers, chunk_size=chunk_size, on_chunk=progress) if todo else []
+        results = no_case + unreadable + results
+        unreadable.clear()
+        if not todo:
+            _save_manifest(out_p, manifest)
+
+        if watcher is not None:
+            # файл, дошъл между старта на watcher-а и обхода, е вече в пакета – брои се веднъж
+            batch_sigs = {}
+            for p in pdfs:
+                try:
+                    st = p.stat()
+                    batch_sigs[p.name] = (st.st_size, st.st_mtime_ns)
+                except FileNotFoundError:
+                    pass
+
+            def submit_file(p: Path) -> Optional[dict]:
+                nonlocal skipped
+                try:
+                    st = p.stat()
+                except FileNotFoundError:
+                    return None
+                if batch_sigs.pop(p.name, None) == (st.st_size, st.st_mtime_ns):
+                    return None
+                job = make_job(p)
+                miss = unmatched(job)
+                if miss:
+                    results.append(miss)
+                    return None
+                if needs_stamp(job):
+                    return job
+                if unreadable:
+                    results.append(unreadable.pop())
+                else:
+                    skipped += 1
+                return None
+
+            results += _watch_loop(watcher, submit_file, progress, workers=workers,
+                                   watch_seconds=watch_seconds, stop=stop)
+    finally:
+        if watcher is not None:
+            watcher.close()
+
+    stamped = sum(1 for r in results if r["ok"])
+    return {
+        "stamped_count": stamped,
+        "skipped_count": skipped,
+        "failed_count": len(results) - stamped,
+        "output_dir": str(out_p),
+        "files": results,
+    }
+
+# ------------------------ Watch режим ------------------------
+def _watch_loop(
+    watcher,
+    make_job: Callable[[Path], Optional[dict]],
+    on_done: Callable[[list[dict], list[dict]], None],
+    workers: Optional[int] = None,
+    watch_seconds: Optional[float] = None,
+    max_inflight: Optional[int] = None,
+    stop: Optional[threading.Event] = None,
+) -> list[dict]:
+    """
+    Взема готовите PDF-и от watcher-а (utils.fswatch.DirWatcher) и ги печата поотделно.
+    Опашката към процесите е ограничена (max_inflight, по подразбиране 2 × workers) –
+    останалите чакат като пътища, вместо да се трупат задачи в пула.
+    make_job(p) → job или None (пропуснат – броенето е при извикващия);
+    on_done(jobs, results) е същият callback като при пакетното печатане (manifest).
+    Спира след watch_seconds, при stop.set() или при Ctrl+C (само в главната нишка) –
+    довършва започнатите файлове. Връща резултатите; Ctrl+C се вдига отново след
+    довършването, за да не се отчете стъпката като успешна (и --resume да продължи).
+    """
+    from collections import deque
+    from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+    workers = workers or os.cpu_count() or 1
+    max_inflight = max_inflight or 2 * workers
+    deadline = time.monotonic() + watch_seconds if watch_seconds else None
+    stop = stop or threading.Event()
+    results: list[dict] = []
+    backlog: deque[Path] = deque()
+    inflight: dict = {}
+    ex = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+
+    def finish(job: dict, res: list[dict]) -> None:
+        on_done([job], res)
+        results.extend(res)
+        if res[0]["ok"]:
+            log.info("stamp_dir watch: %s → OK", job["pdf_in"].name)
+        else:
+            log.warning("stamp_dir watch: %s → FAILED (%s)", job["pdf_in"].name, res[0]["error"])
+
+    log.info("stamp_dir watch: следя %s (%s)", watcher.root, watcher.backend)
+    try:
+        while not stop.is_set() and (deadline is None or time.monotonic() < deadline):
+            left = None if deadline is None else max(0.0, deadline - time.monotonic())
+            backlog.extend(watcher.poll(timeout=0.5 if left is None else min(0.5, left)))
+            while backlog and len(inflight) < max_inflight:
+                job = make_job(backlog.popleft())
+                if job is None:
+                    continue
+                if ex is None:
+                    finish(job, _stamp_chunk([job]))
+                else:
+                    inflight[ex.submit(_stamp_chunk, [job])] = job
+            if inflight:
+                done, _ = wait(inflight, timeout=0, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    job = inflight.pop(fut)
+                    try:
+                        res = fut.result()
+                    except Exception as e:   # напр. BrokenProcessPool
+                        res = [{"file": str(job["pdf_in"]), "ok": False, "error": f"{type(e).__name__}: {e}"}]
+                    finish(job, res)
+    except KeyboardInterrupt:
+        log.info("stamp_dir watch: спиране…")
+        raise
+    finally:
+        for fut in list(inflight):
+            job = inflight.pop(fut)
+            try:
+                res = fut.result()
+            except Exception as e:
+                res = [{"file": str(job["pdf_in"]), "ok": False, "error": f"{type(e).__name__}: {e}"}]
+            finish(job, res)
+        if ex is not None:
+            ex.shutdown()
+    if stop.is_set():
+        log.info("stamp_dir watch: спрян отвън")
+    return results
 
 # ------------------------ CLI ------------------------
 def main():
@@ -331,6 +827,8 @@ def main():
     ap.add_argument("--font", default=None)
     ap.add_argument("--font-size", type=float, default=DEFAULT_FONT_SIZE)
     ap.add_argument("--as-image", action="store_true", default=DEFAULT_AS_IMAGE)
+    ap.add_argument("--vector", dest="as_image", action="store_false",
+                    help="Векторен текст (вграден subset шрифт) вместо PNG – по-малки и по-бързи файлове")
 
     # Позициониране/кутия
     ap.add_argument("--anchor-rel", nargs=2, type=float, metavar=("RIGHT","TOP"), default=DEFAULT_ANCHOR_REL)
@@ -0,0 +1,109 @@
+# automation/tests/test_cases.py
+# io/cases.py: list-съвместимият интерфейс на Cases (индекс, срез, маска), типовете
+# в to_records(), флаговете като 0/1 и индексите (rows_with, get, rows_for_egn).
+#   python -m pytest automation/tests
+from __future__ import annotations
+import math
+
+import numpy as np
+import pytest
+
+from automation.io.cases import Cases, StrColumn, as_text, flag_array
+
+RECORDS = [
+    {"case_no": "2024-1", "egn_or_eik": "7501020018", "name": "А", "do_bnb": 1, "do_ikar": 0},
+    {"case_no": 1234.0, "egn_or_eik": 7501020018, "name": "Б", "do_bnb": 0, "do_ikar": 1},
+    {"case_no": "2024-3", "egn_or_eik": "", "name": "В", "do_bnb": 1, "do_ikar": 1},
+    {"case_no": "2024-4", "egn_or_eik": None, "name": "Г", "do_bnb": 0, "do_ikar": 0},
+]
+
+@pytest.fixture
+def cases() -> Cases:
+    return Cases.from_records(RECORDS)
+
+# ------------------------ list интерфейс ------------------------
+def test_len_index_and_negative_index(cases):
+    assert len(cases) == 4
+    assert cases[0] == {"case_no": "2024-1", "egn_or_eik": "7501020018", "name": "А", "do_bnb": 1, "do_ikar": 0}
+    assert cases[-1]["case_no"] == "2024-4"
+    assert cases[np.int64(1)]["name"] == "Б"
+    with pytest.raises(IndexError):
+        cases[4]
+    with pytest.raises(IndexError):
+        cases[-5]
+
+def test_slices_and_masks_return_cases(cases):
+    part = cases[1:3]
+    assert isinstance(part, Cases)
+    assert [r["name"] for r in part] == ["Б", "В"]
+    assert [r["name"] for r in cases[::-2]] == ["Г", "Б"]
+    assert [r["name"] for r in cases[np.array([True, False, False, True])]] == ["А", "Г"]
+    assert [r["name"] for r in cases[[3, 0]]] == ["Г", "А"]
+    assert len(cases[4:]) == 0
+    assert len(cases[[]]) == 0
+
+@pytest.mark.parametrize("key", ["case_no", 1.0, [0.0, 1.0], None, [[0, 1]]])
+def test_other_keys_are_a_type_error(cases, key):
+    with pytest.raises(TypeError):
+        cases[key]
+
+def test_rows_are_copies(cases):
+    cases[0]["name"] = "X"
+    assert cases[0]["name"] == "А"
+
+def test_record_types(cases):
+    recs = cases.to_records()
+    assert recs == list(cases)
+    assert recs[1]["case_no"] == "1234" and recs[1]["egn_or_eik"] == "7501020018"
+    assert recs[3]["egn_or_eik"] == ""
+    assert all(type(r["do_bnb"]) is int for r in recs)
+    assert Cases.from_records(recs).to_records() == recs
+
+# ------------------------ Флагове ------------------------
+def test_flag_array_is_zero_or_one():
+    a = flag_array([1, 0, 2, -1, 256, None, float("nan"), 0.0, 1.0])
+    assert a.dtype == np.uint8
+    assert a.tolist() == [1, 0, 1, 1, 1, 0, 0, 0, 1]
+
+def test_where_and_flags(cases):
+    assert cases.flags == ["do_bnb", "do_ikar"]
+    assert cases.flag("do_bnb").tolist() == [1, 0, 1, 0]
+    assert [r["name"] for r in cases.where("do_ikar")] == ["Б", "В"]
+
+# ------------------------ Индекси ------------------------
+def test_rows_with(cases):
+    idx = cases.index
+    assert idx.rows_with("do_bnb").tolist() == [0, 2]
+    assert idx.rows_with("do_bnb", "do_ikar").tolist() == [2]
+    assert idx.rows_with().tolist() == [0, 1, 2, 3]          # без флагове – всички
+    idx.rows_with("do_bnb")[0] = 3
+    assert idx.rows_with("do_bnb").tolist() == [0, 2]          # копие, не вътрешният масив
+    assert [r["name"] for r in cases.with_flags("do_bnb", "do_ikar")] == ["В"]
+
+def test_rows_with_matches_a_plain_filter():
+    rng = np.random.default_rng(7)
+    recs = [{"case_no": str(i), "do_a": int(rng.integers(2)), "do_b": int(rng.integers(2)),
+             "do_c": int(rng.integers(2))} for i in range(997)]         # не кратно на 8 – опашката на packbits
+    cs = Cases.from_records(recs)
+    want = [i for i, r in enumerate(recs) if r["do_a"] and r["do_c"]]
+    assert cs.index.rows_with("do_a", "do_c").tolist() == want
+
+def test_get_and_rows_for_egn(cases):
+    assert cases.get("1234")["name"] == "Б"
+    assert cases.get(1234)["name"] == "Б"
+    assert cases.get("nope") is None
+    assert cases.rows_for_egn(7501020018) == [0, 1]
+    assert cases.rows_for_egn("") == []
+
+# ------------------------ Помощни ------------------------
+def test_as_text():
+    assert as_text(None) == "" and as_text(math.nan) == ""
+    assert as_text(12.0) == "12" and as_text(12.5) == "12.5"
+    assert as_text("  2024-1 ") == "2024-1"
+
+def test_str_column():
+    col = StrColumn(["a", "", "ccc", None])
+    assert len(col) == 4
+    assert col.tolist() == ["a", "", "ccc", ""]
+    assert col[2] == "ccc"
+    assert col.take(np.array([2, 0])).tolist() == ["ccc", "a"]
@@ -0,0 +1,59 @@
+# automation/tests/test_credentials.py
+# credentials/credentials.py с MemoryBackend: кеш в процеса, пароли при поискване,
+# сравнение без четене на пароли и pickle без паролата.
+#   python -m pytest automation/tests
+from __future__ import annotations
+import gc, pickle
+
+import pytest
+
+from automation.credentials import credentials as cr
+from automation.credentials.credentials import Credential, MemoryBackend, list_credentials
+
+@pytest.fixture(autouse=True)
+def clean_cache():
+    cr.invalidate_cache()
+    yield
+    cr.invalidate_cache()
+
+def test_list_is_cached_and_passwords_are_lazy():
+    b = MemoryBackend({"AUTOMATION/a": ("u", "p"), "OTHER/b": ("x", "y")})
+    first = list_credentials(backend=b)
+    assert [c.target for c in first] == ["AUTOMATION/a"]
+    assert b.reads == 0
+    assert list_credentials(backend=b)[0] is first[0]
+    assert first[0].password == "p" and b.reads == 1
+    assert tuple(first[0]) == ("AUTOMATION/a", "u", "p")
+
+def test_password_survives_dropping_the_backend():
+    cred = list_credentials(backend=MemoryBackend({"AUTOMATION/a": ("u", "p")}))[0]
+    gc.collect()
+    assert cred.password == "p"
+
+def test_expired_entries_release_their_backend(monkeypatch):
+    list_credentials(backend=MemoryBackend({"AUTOMATION/a": ("u", "p")}))
+    assert len(cr._cache) == 1
+    later = cr.time.monotonic() + cr.CACHE_TTL_S + 1
+    monkeypatch.setattr(cr.time, "monotonic", lambda: later)
+    list_credentials(backend=MemoryBackend())
+    assert len(cr._cache) == 1                   # само новият източник
+
+def test_eq_and_hash_use_target_and_username():
+    a, b = Credential("t", "u", "p1"), Credential("t", "u")
+    assert a == b and hash(a) == hash(b)
+    assert a != Credential("t", "v", "p1")
+    assert a != ("t", "u", "p1") and a.as_tuple() == ("t", "u", "p1")
+    assert len({a, b, Credential("t", "u", "p2")}) == 1
+
+def test_pickle_does_not_contain_the_password():
+    shared = cr.get_backend("memory")
+    shared.entries["AUTOMATION/pk"] = ("u", "S3cret-xyz")
+    try:
+        cred = list_credentials(backend=shared)[0]
+        assert cred.password == "S3cret-xyz"
+        data = pickle.dumps(cred)
+        assert b"S3cret-xyz" not in data
+        back = pickle.loads(data)
+        assert back == cred and back.password == "S3cret-xyz"    # наново от източника
+    finally:
+        shared.entries.pop("AUTOMATION/pk", None)
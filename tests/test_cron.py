@@ -0,0 +1,70 @@
+# automation/tests/test_cron.py
+# utils/cron.py: парсване на полетата и Cron.next_after – стъпки, ден от месеца
+# ИЛИ ден от седмицата, преход през месец/година и невъзможни дати.
+#   python -m pytest automation/tests
+from __future__ import annotations
+from datetime import datetime
+
+import pytest
+
+from automation.utils.cron import Cron
+
+def nxt(expr: str, *at: int) -> datetime | None:
+    return Cron(expr).next_after(datetime(*at))
+
+# ------------------------ Стъпки ------------------------
+def test_every_15_minutes():
+    assert nxt("*/15 * * * *", 2026, 3, 10, 10, 7) == datetime(2026, 3, 10, 10, 15)
+    assert nxt("*/15 * * * *", 2026, 3, 10, 10, 45) == datetime(2026, 3, 10, 11, 0)
+
+def test_next_after_is_strictly_later():
+    # dt, който сам съвпада (и секундите му), не се връща
+    assert nxt("*/15 * * * *", 2026, 3, 10, 10, 15, 30) == datetime(2026, 3, 10, 10, 30)
+
+def test_start_with_step_runs_to_the_end_of_the_range():
+    assert Cron("5/15 * * * *").minute == frozenset({5, 20, 35, 50})
+    assert Cron("8-18/4 * * * *").minute == frozenset({8, 12, 16})
+    assert nxt("5/15 * * * *", 2026, 3, 10, 10, 51) == datetime(2026, 3, 10, 11, 5)
+
+def test_workday_hours():
+    # петък 18:50 → понеделник 8:00
+    assert nxt("0 8-18 * * 1-5", 2026, 10, 16, 18, 50) == datetime(2026, 10, 19, 8, 0)
+
+# ------------------------ Ден от месеца / седмицата ------------------------
+def test_dom_or_dow_when_both_are_restricted():
+    c = Cron("0 0 13 * 5")                       # 13-о число ИЛИ петък
+    assert c.next_after(datetime(2026, 10, 16)) == datetime(2026, 10, 23)          # петък
+    assert c.next_after(datetime(2026, 11, 6, 1)) == datetime(2026, 11, 13)        # петък 13-и
+    assert c.next_after(datetime(2026, 12, 11, 1)) == datetime(2026, 12, 13)       # неделя 13-и
+
+def test_star_step_is_not_a_restriction():
+    # "*/2" в деня от месеца започва с "*" → И, не ИЛИ: нечетен ден, който е понеделник
+    assert nxt("0 0 */2 * 1", 2026, 10, 16) == datetime(2026, 10, 19)
+    assert nxt("0 0 1 * */2", 2026, 10, 16) == datetime(2026, 11, 1)    # 1-во число и неделя
+
+def test_dom_only_skips_short_months():
+    assert nxt("0 0 31 * *", 2026, 8, 31, 12) == datetime(2026, 10, 31)
+
+def test_dow_only_and_sunday_as_7():
+    assert nxt("30 9 * * 7", 2026, 10, 16) == datetime(2026, 10, 18, 9, 30)
+    assert Cron("0 0 * * 0").weekday == Cron("0 0 * * 7").weekday == frozenset({0})
+
+def test_alias_and_year_rollover():
+    assert nxt("@monthly", 2026, 12, 31, 23, 59) == datetime(2027, 1, 1)
+    assert nxt("0 0 1 1 *", 2026, 1, 1, 0, 0) == datetime(2027, 1, 1)
+
+def test_leap_day_and_impossible_date():
+    assert nxt("0 0 29 2 *", 2026, 3, 1) == datetime(2028, 2, 29)
+    assert nxt("0 0 30 2 *", 2026, 3, 1) is None
+
+def test_matches():
+    c = Cron("*/10 8 * * 1-5")
+    assert c.matches(datetime(2026, 10, 16, 8, 20))
+    assert not c.matches(datetime(2026, 10, 17, 8, 20))     # събота
+    assert not c.matches(datetime(2026, 10, 16, 8, 25))
+
+# ------------------------ Грешки ------------------------
+@pytest.mark.parametrize("expr", ["* * * *", "*/0 * * * *", "60 * * * *", "0 0 0 * *", "5-1 * * * *", "0 0 * 13 *"])
+def test_invalid_expressions(expr):
+    with pytest.raises(ValueError):
+        Cron(expr)
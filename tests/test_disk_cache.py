@@ -0,0 +1,93 @@
+# automation/tests/test_disk_cache.py
+# utils/disk_cache.py: meta/ttl, изчистване по възраст и по размер (LRU),
+# повреден запис и файл, който не може да се изтрие (Windows: отворен от друг).
+#   python -m pytest automation/tests
+from __future__ import annotations
+import os, time
+from pathlib import Path
+
+import pytest
+
+from automation.utils.disk_cache import DiskCache
+
+@pytest.fixture
+def cache(tmp_path) -> DiskCache:
+    return DiskCache(tmp_path / "c")
+
+def _age(c: DiskCache, key: str, seconds: float) -> None:
+    """Прави записа „неползван“ от seconds секунди (evict гледа mtime)."""
+    t = time.time() - seconds
+    os.utime(c._path(key), (t, t))
+
+# ------------------------ get / put ------------------------
+def test_roundtrip_and_counters(cache):
+    assert cache.get("k") == (False, None)
+    cache.put("k", {"rows": [1, 2]}, meta={"mtime": 1})
+    assert cache.get("k", meta={"mtime": 1}) == (True, {"rows": [1, 2]})
+    assert (cache.hits, cache.misses) == (1, 1)
+
+def test_other_meta_is_a_miss_and_drops_the_entry(cache):
+    cache.put("k", 1, meta=1)
+    assert cache.get("k", meta=2) == (False, None)
+    assert not cache._path("k").exists()
+
+def test_ttl(cache):
+    cache.put("k", 1)
+    assert cache.get("k", ttl_s=60) == (True, 1)
+    time.sleep(0.01)
+    assert cache.get("k", ttl_s=0.005) == (False, None)
+
+def test_corrupt_entry_is_a_miss(cache):
+    cache.put("k", 1)
+    cache._path("k").write_bytes(b"not a pickle")
+    assert cache.get("k") == (False, None)
+    assert not cache._path("k").exists()
+
+def test_busy_file_is_a_miss_not_an_error(cache, monkeypatch):
+    cache.put("k", 1, meta=1)
+
+    def busy(self, missing_ok=False):
+        raise PermissionError(13, "used by another process", str(self))
+
+    monkeypatch.setattr(Path, "unlink", busy)
+    assert cache.get("k", meta=2) == (False, None)
+    assert cache.invalidate("k") == 0
+    assert cache.invalidate() == 0
+    monkeypatch.undo()
+    assert cache.invalidate() == 1
+
+# ------------------------ evict ------------------------
+def test_evict_by_age(tmp_path):
+    c = DiskCache(tmp_path, max_age_s=3600)
+    c.put("old", 1)
+    c.put("new", 2)
+    _age(c, "old", 7200)
+    assert c.evict() == 1
+    assert c.get("old") == (False, None)
+    assert c.get("new") == (True, 2)
+
+def test_evict_by_size_drops_least_recently_used(tmp_path):
+    blob = b"x" * 1000
+    c = DiskCache(tmp_path, max_bytes=10 ** 6, max_age_s=None)
+    for i, k in enumerate(("a", "b", "c")):
+        c.put(k, blob)
+        _age(c, k, 100 - i)                 # a е най-старият …
+    assert c.get("a")[0]                    # … но get() го обновява → b е най-отдавна ползван
+    size = c._path("a").stat().st_size
+    c.max_bytes = 2 * size
+    assert c.evict() == 1
+    assert not c._path("b").exists()
+    assert c._path("a").exists() and c._path("c").exists()
+
+def test_put_evicts_over_the_limit(tmp_path):
+    c = DiskCache(tmp_path, max_bytes=1, max_age_s=None)
+    c.put("k", b"x" * 100)
+    assert c.stats()["entries"] == 0
+
+def test_invalidate(cache):
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.invalidate("a") == 1
+    assert cache.invalidate("a") == 0
+    assert cache.invalidate() == 1
+    assert cache.stats()["entries"] == 0
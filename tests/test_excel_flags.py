@@ -0,0 +1,51 @@
+# automation/tests/test_excel_flags.py
+# io/excel_reader.py: векторните normalize_flags/bad_egn_rows дават същото като
+# старите цикли (benchmarks/bench_excel_flags.py), а flag_value – като normalize_flags;
+# кешът на tasks/excel_reader следва версията на нормализацията в io.
+#   python -m pytest automation/tests
+from __future__ import annotations
+
+import pandas as pd
+import pytest
+
+from automation.benchmarks.bench_excel_flags import legacy_bad_rows, legacy_flags, synthetic_sheet
+from automation.io.excel_reader import FLAGS, bad_egn_rows, flag_value, is_valid_egn, normalize_flags
+
+@pytest.fixture(scope="module")
+def sheet() -> pd.DataFrame:
+    return synthetic_sheet(3000, seed=3)
+
+def test_flags_equal_legacy(sheet):
+    assert normalize_flags(sheet.copy())[FLAGS].equals(legacy_flags(sheet.copy())[FLAGS])
+
+def test_flag_edge_cases_equal_legacy():
+    values = ["1", " Да ", "X", "✓", "0", "не", "", None, float("nan"), 2, -1, "2.0", "abc", True, False]
+    df = pd.DataFrame({f: values for f in FLAGS})
+    new = normalize_flags(df.copy())[FLAGS]
+    assert new.equals(legacy_flags(df.copy())[FLAGS])
+    assert new[FLAGS[0]].tolist() == [1, 1, 1, 1, 0, 0, 0, 0, 0, 2, -1, 2, 0, 1, 0]
+    assert [flag_value(v) for v in values] == new[FLAGS[0]].tolist()
+
+def test_bad_egn_rows_equal_legacy(sheet):
+    col = sheet["egn_or_eik"]
+    bad = bad_egn_rows(col)
+    assert bad == legacy_bad_rows(col)
+    assert bad                                 # синтетичният лист има и грешни чексуми
+
+def test_bad_egn_rows_edge_cases():
+    valid = next(f"75010200{i:02d}" for i in range(100) if is_valid_egn(f"75010200{i:02d}"))
+    invalid = valid[:9] + str((int(valid[9]) + 1) % 10)
+    arabic = "".join(chr(0x660 + int(d)) for d in invalid)       # не-ASCII цифри
+    col = pd.Series([valid, invalid, f" {invalid} ", int(invalid), "123456789", None, "", arabic, "75O1020018"])
+    assert bad_egn_rows(col) == legacy_bad_rows(col) == [3, 4, 5, 9]
+
+def test_task_cache_version_follows_io_normalization(monkeypatch):
+    from automation.io import excel_reader as io_er
+    from automation.tasks import excel_reader as task_er
+    task_er.map_version.cache_clear()
+    before = task_er.map_version()
+    monkeypatch.setattr(io_er, "MAP_VERSION", io_er.MAP_VERSION + "x")
+    task_er.map_version.cache_clear()
+    assert task_er.map_version() != before
+    monkeypatch.undo()
+    task_er.map_version.cache_clear()
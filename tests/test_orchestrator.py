@@ -0,0 +1,206 @@
+# automation/tests/test_orchestrator.py
+# orchestrator.run_pipeline с малки задачи от този модул (task: "<модул>:<функция>"):
+# паралелният DAG дава същия ctx като последователното изпълнение, а --resume
+# прескача стъпките от checkpoint-а.
+#   python -m pytest automation/tests
+from __future__ import annotations
+import logging, threading, time
+
+import pytest
+
+from automation import orchestrator
+
+log = logging.getLogger("test_orchestrator")
+T = __name__            # задачите се резолвват по "<модул>:<функция>"
+
+calls: dict[str, int] = {}
+barrier: threading.Barrier | None = None
+broken = threading.Event()       # вдигнат → fragile() пада
+
+@pytest.fixture(autouse=True)
+def local(tmp_path, monkeypatch):
+    # checkpoint-ите и кешът на стъпките – във временна папка
+    monkeypatch.setattr(orchestrator, "local_dir", lambda: tmp_path)
+    calls.clear()
+    broken.clear()
+    yield tmp_path
+
+def _called(name: str) -> None:
+    calls[name] = calls.get(name, 0) + 1
+
+# ------------------------ Задачи ------------------------
+def number(n: int) -> int:
+    _called(f"number{n}")
+    return n
+
+def meet(n: int) -> int:
+    # двете независими стъпки се чакат една друга – минава само ако вървят едновременно
+    barrier.wait()
+    return n
+
+def add(a: int, b: int) -> int:
+    _called("add")
+    return a + b
+
+def label(prefix: str, total: int) -> str:
+    return f"{prefix}-{total}"
+
+def double_total(ctx: dict) -> dict:
+    return {"doubled": ctx["total"] * 2}
+
+def slow_overwrite(ctx: dict) -> dict:
+    time.sleep(0.2)                  # свършва след независимите стъпки
+    return {"a": ctx["a"] * 100}
+
+def fragile(x: int) -> int:
+    _called("fragile")
+    if broken.is_set():
+        raise RuntimeError("прекъснато")
+    return x + 1
+
+def token(n: int) -> str:
+    _called("token")
+    return f"t{n}"
+
+PIPELINE = [
+    {"task": f"{T}:number", "mode": "raw", "kwargs": {"n": 2}, "result_key": "a"},
+    {"task": f"{T}:number", "mode": "raw", "kwargs": {"n": 3}, "result_key": "b", "id": "b"},
+    {"task": f"{T}:add", "mode": "raw", "kwargs": {"a": "{a}", "b": "{b}"}, "result_key": "total"},
+    {"task": f"{T}:label", "mode": "raw", "kwargs": {"prefix": "{name}", "total": "{total}"}, "result_key": "label"},
+    {"task": f"{T}:double_total"},
+    {"task": f"{T}:number", "mode": "raw", "kwargs": {"n": 7}, "result_key": "c", "depends_on": ["b"]},
+]
+
+def _cfg(pipeline=PIPELINE, **extra) -> dict:
+    return {"use": "p", "prewarm": False, "vars": {"name": "x"}, "pipelines": {"p": pipeline}, **extra}
+
+def _public(ctx: dict) -> dict:
+    return {k: v for k, v in ctx.items() if not k.startswith("__")}
+
+# ------------------------ DAG ------------------------
+def test_parallel_ctx_equals_sequential():
+    seq = orchestrator.run_pipeline(_cfg(), log, max_workers=1)
+    par = orchestrator.run_pipeline(_cfg(), log, max_workers=4)
+    assert _public(par) == _public(seq)
+    assert list(par) == list(seq)              # и същият ред на ключовете
+    assert _public(seq) == {"a": 2, "b": 3, "total": 5, "label": "x-5", "doubled": 10, "c": 7}
+
+def test_independent_steps_run_concurrently():
+    global barrier
+    barrier = threading.Barrier(2, timeout=5)
+    pipeline = [
+        {"task": f"{T}:meet", "mode": "raw", "kwargs": {"n": 1}, "result_key": "a"},
+        {"task": f"{T}:meet", "mode": "raw", "kwargs": {"n": 2}, "result_key": "b"},
+    ]
+    ctx = orchestrator.run_pipeline(_cfg(pipeline), log, max_workers=2)
+    assert (ctx["a"], ctx["b"]) == (1, 2)
+
+def test_step_deps_from_placeholders_and_depends_on():
+    deps = orchestrator._step_deps(PIPELINE, {"name": "x"})
+    assert deps == [set(), set(), {0, 1}, {2}, {0, 1, 2, 3}, {1}]
+
+def test_raw_step_waits_for_a_task_step_that_overwrites_its_key():
+    pipeline = [
+        {"task": f"{T}:number", "mode": "raw", "kwargs": {"n": 2}, "result_key": "a"},
+        {"task": f"{T}:slow_overwrite"},
+        {"task": f"{T}:number", "mode": "raw", "kwargs": {"n": 3}, "result_key": "b"},
+        {"task": f"{T}:add", "mode": "raw", "kwargs": {"a": "{a}", "b": "{b}"}, "result_key": "total"},
+        {"task": f"{T}:add", "mode": "raw", "kwargs": {"a": "{b}", "b": 1}, "result_key": "other",
+         "depends_on": ["a"]},
+    ]
+    assert orchestrator._step_deps(pipeline, {}) == [set(), {0}, set(), {0, 1, 2}, {0, 2}]
+    seq = orchestrator.run_pipeline(_cfg(pipeline), log, max_workers=1)
+    par = orchestrator.run_pipeline(_cfg(pipeline), log, max_workers=4)
+    assert _public(par) == _public(seq)
+    assert seq["total"] == 203 and seq["other"] == 4
+
+def test_step_sees_only_its_dependencies(monkeypatch):
+    # c не зависи от b – дори b да е свършила, c не вижда ключа ѝ (както и да са подредени нишките)
+    pipeline = [
+        {"task": f"{T}:number", "mode": "raw", "kwargs": {"n": 1}, "result_key": "a"},
+        {"task": f"{T}:number", "mode": "raw", "kwargs": {"n": 2}, "result_key": "b"},
+        {"task": f"{T}:label", "mode": "raw", "kwargs": {"prefix": "p", "total": "{a}"}, "result_key": "c"},
+    ]
+    deltas = {0: {"a": 1}, 1: {"b": 2}}
+    seen = []
+    orig = orchestrator._exec_step
+
+    def spy(step, ctx, lg, i=0):
+        seen.append((i, sorted(k for k in ctx if not k.startswith("__"))))
+        return orig(step, ctx, lg, i)
+
+    monkeypatch.setattr(orchestrator, "_exec_step", spy)
+    orchestrator._run_pipeline(pipeline, {"__vars__": {}}, log, max_workers=2, done=deltas)
+    assert seen == [(2, ["a"])]
+
+def test_unknown_depends_on_fails_preflight():
+    pipeline = [{"task": f"{T}:number", "mode": "raw", "kwargs": {"n": 1}, "depends_on": ["nope"]}]
+    with pytest.raises(ValueError, match="nope"):
+        orchestrator.run_pipeline(_cfg(pipeline), log)
+
+# ------------------------ Checkpoint / resume ------------------------
+RESUMABLE = [
+    {"task": f"{T}:number", "mode": "raw", "kwargs": {"n": 2}, "result_key": "a"},
+    {"task": f"{T}:token", "mode": "raw", "kwargs": {"n": 1}, "result_key": "api_token"},
+    {"task": f"{T}:fragile", "mode": "raw", "kwargs": {"x": "{a}"}, "result_key": "b"},
+    {"task": f"{T}:add", "mode": "raw", "kwargs": {"a": "{a}", "b": "{b}"}, "result_key": "total"},
+]
+
+@pytest.mark.parametrize("workers", [1, 3])
+def test_resume_skips_completed_steps(local, workers):
+    broken.set()
+    with pytest.raises(RuntimeError):
+        orchestrator.run_pipeline(_cfg(RESUMABLE), log, max_workers=workers)
+    assert (local / "checkpoints" / "p.ckpt").exists()
+    assert calls == {"number2": 1, "token": 1, "fragile": 1}
+
+    broken.clear()
+    ctx = orchestrator.run_pipeline(_cfg(RESUMABLE), log, max_workers=workers, resume=True)
+    assert _public(ctx) == {"a": 2, "api_token": "t1", "b": 3, "total": 5}
+    assert calls["number2"] == 1                 # от checkpoint-а
+    assert calls["token"] == 2                   # тайна → не се записва, пуска се пак
+    assert calls["fragile"] == 2 and calls["add"] == 1
+    assert not (local / "checkpoints" / "p.ckpt").exists()   # успешният край го изтрива
+
+def test_without_resume_the_checkpoint_is_ignored(local):
+    broken.set()
+    with pytest.raises(RuntimeError):
+        orchestrator.run_pipeline(_cfg(RESUMABLE), log)
+    broken.clear()
+    orchestrator.run_pipeline(_cfg(RESUMABLE), log)
+    assert calls["number2"] == 2
+
+def test_checkpoint_of_changed_pipeline_is_not_used(local):
+    broken.set()
+    with pytest.raises(RuntimeError):
+        orchestrator.run_pipeline(_cfg(RESUMABLE), log)
+    broken.clear()
+    changed = [dict(RESUMABLE[0], kwargs={"n": 4}), *RESUMABLE[1:]]
+    ctx = orchestrator.run_pipeline(_cfg(changed), log, resume=True)
+    assert ctx["a"] == 4 and calls["number4"] == 1
+
+# ------------------------ Логове ------------------------
+@pytest.fixture
+def queued_logging():
+    yield
+    orchestrator._stop_log_listener()
+    for name in ("orchestrator", orchestrator.LOG_ROOT):
+        lg = logging.getLogger(name)
+        for h in list(lg.handlers):
+            lg.removeHandler(h)
+            h.close()
+        lg.propagate = True
+        lg.setLevel(logging.NOTSET)
+
+def test_module_loggers_go_through_the_queue(local, queued_logging):
+    log1 = orchestrator._make_logger(to_console=False)
+    listener = orchestrator._log_listener
+    logging.getLogger("automation.tasks.stamp").info("от stamp")
+    log1.info("от оркестратора")
+    assert orchestrator._make_logger(to_console=False) is log1       # повторно – същата опашка
+    assert orchestrator._log_listener is listener
+    logging.getLogger("automation.web.routing").info("от routing")
+    orchestrator._stop_log_listener()
+    text = (local / "logs" / "worker.log").read_text(encoding="utf-8")
+    for msg in ("от stamp", "от оркестратора", "от routing"):
+        assert text.count(msg) == 1
@@ -0,0 +1,34 @@
+# automation/tests/test_secret.py
+# utils/secret.py с Fernet: ключът се създава веднъж, празен secret.key (прекъснат
+# запис) не чупи protect(), а вече създаден ключ не се презаписва.
+#   python -m pytest automation/tests
+from __future__ import annotations
+import pytest
+
+pytest.importorskip("cryptography")
+
+from automation.utils import secret
+
+@pytest.fixture(autouse=True)
+def fernet_only(tmp_path, monkeypatch):
+    monkeypatch.setattr(secret, "local_dir", lambda: tmp_path)
+    monkeypatch.setattr(secret, "_win32crypt", lambda: None)
+
+def test_roundtrip_creates_the_key_once(tmp_path):
+    blob = secret.protect(b"token")
+    key = (tmp_path / "secret.key").read_bytes()
+    assert secret.unprotect(secret.protect(b"x")) == b"x"
+    assert secret.unprotect(blob) == b"token"
+    assert (tmp_path / "secret.key").read_bytes() == key
+    assert [p.name for p in tmp_path.iterdir()] == ["secret.key"]      # без временни файлове
+
+def test_empty_key_file_is_replaced(tmp_path):
+    (tmp_path / "secret.key").write_bytes(b"")
+    assert secret.unprotect(secret.protect(b"token")) == b"token"
+    assert (tmp_path / "secret.key").read_bytes()
+
+def test_key_created_meanwhile_is_kept(tmp_path):
+    from cryptography.fernet import Fernet
+    theirs = Fernet.generate_key()
+    (tmp_path / "secret.key").write_bytes(theirs)
+    assert secret._create_key(tmp_path / "secret.key", Fernet.generate_key()) == theirs
@@ -0,0 +1,123 @@
+# automation/tests/test_stamp_incremental.py
+# tasks/stamp.py stamp_dir: manifest-ът, пропускането на готовите файлове при
+# incremental/resume и пре-печатването на променените – без fitz (stamp_one е подменен).
+#   python -m pytest automation/tests
+from __future__ import annotations
+import pytest
+
+from automation.tasks import stamp as st
+
+@pytest.fixture
+def stamped(monkeypatch):
+    """Подменя stamp_one: пише изхода и помни кои входове е печатал."""
+    calls: list[str] = []
+
+    def fake_stamp_one(pdf_in, out, **kw):
+        if pdf_in.name.startswith("bad"):
+            raise ValueError("повреден PDF")
+        calls.append(pdf_in.name)
+        out.write_bytes(pdf_in.read_bytes())
+
+    monkeypatch.setattr(st, "stamp_one", fake_stamp_one)
+    return calls
+
+@pytest.fixture
+def dirs(tmp_path):
+    src, out = tmp_path / "in", tmp_path / "out"
+    src.mkdir()
+    for n in ("a", "b", "c"):
+        (src / f"{n}.pdf").write_bytes(n.encode())
+    return src, out
+
+def run(dirs, **kw) -> dict:
+    src, out = dirs
+    kw = {"name": "N", "reg_no": "R", "case_no": "1", "workers": 1, **kw}
+    return st.stamp_dir(in_dir=str(src), out_dir=str(out), **kw)
+
+def test_plain_run_records_the_manifest_for_resume(dirs, stamped):
+    assert run(dirs)["stamped_count"] == 3
+    assert (dirs[1] / st.MANIFEST_NAME).exists()
+    stamped.clear()
+    res = run(dirs, resume=True)
+    assert stamped == [] and res["skipped_count"] == 3
+
+def test_incremental_skips_up_to_date_files(dirs, stamped):
+    run(dirs, incremental=True)
+    stamped.clear()
+    res = run(dirs, incremental=True)
+    assert stamped == [] and (res["stamped_count"], res["skipped_count"]) == (0, 3)
+
+@pytest.mark.parametrize("content_hash", [False, True])
+def test_changed_input_is_restamped(dirs, stamped, content_hash):
+    run(dirs, incremental=True, content_hash=content_hash)
+    stamped.clear()
+    (dirs[0] / "b.pdf").write_bytes(b"bb")
+    res = run(dirs, incremental=True, content_hash=content_hash)
+    assert stamped == ["b.pdf"] and res["skipped_count"] == 2
+
+def test_changed_stamp_text_or_missing_output_restamps(dirs, stamped):
+    run(dirs, incremental=True)
+    stamped.clear()
+    assert run(dirs, incremental=True, reg_no="R2")["stamped_count"] == 3
+    stamped.clear()
+    (dirs[1] / "a_stamped.pdf").unlink()
+    run(dirs, incremental=True, reg_no="R2")
+    assert stamped == ["a.pdf"]
+
+def test_resume_after_crash_continues(dirs, stamped, monkeypatch):
+    real = st.stamp_one
+
+    def crash_on_c(pdf_in, out, **kw):
+        if pdf_in.name == "c.pdf":
+            raise KeyboardInterrupt
+        real(pdf_in, out, **kw)
+
+    monkeypatch.setattr(st, "stamp_one", crash_on_c)
+    with pytest.raises(KeyboardInterrupt):
+        run(dirs, chunk_size=1)
+    monkeypatch.setattr(st, "stamp_one", real)
+    stamped.clear()
+    res = run(dirs, resume=True)
+    assert stamped == ["c.pdf"] and res["skipped_count"] == 2
+
+def test_failed_and_unreadable_files_are_reported(dirs, stamped, monkeypatch):
+    (dirs[0] / "bad.pdf").write_bytes(b"x")
+    real = st._file_fingerprint
+
+    def locked(p, content_hash):
+        if p.name == "b.pdf":
+            raise PermissionError(13, "used by another process", str(p))
+        return real(p, content_hash)
+
+    monkeypatch.setattr(st, "_file_fingerprint", locked)
+    res = run(dirs, incremental=True)
+    failed = {r["file"].rsplit("/", 1)[-1]: r["error"] for r in res["files"] if not r["ok"]}
+    assert set(failed) == {"b.pdf", "bad.pdf"} and failed["b.pdf"].startswith("PermissionError")
+    assert (res["stamped_count"], res["skipped_count"], res["failed_count"]) == (2, 0, 2)
+    monkeypatch.setattr(st, "_file_fingerprint", real)
+    stamped.clear()
+    run(dirs, incremental=True)
+    assert stamped == ["b.pdf"]                  # неуспешните не влизат в manifest-а
+
+# ------------------------ Watch режим ------------------------
+class _Watcher:
+    """Връща подадените пътища по един на poll(), после Ctrl+C."""
+    root, backend = "in", "test"
+
+    def __init__(self, paths):
+        self.paths = list(paths)
+
+    def poll(self, timeout=None):
+        if not self.paths:
+            raise KeyboardInterrupt
+        return [self.paths.pop(0)]
+
+def test_watch_ctrl_c_finishes_started_files_and_reraises(dirs, stamped):
+    src, out = dirs
+    done: list[str] = []
+    job = lambda p: dict(pdf_in=p, out=out / p.name)
+    out.mkdir()
+    with pytest.raises(KeyboardInterrupt):
+        st._watch_loop(_Watcher([src / "a.pdf", src / "b.pdf"]), job,
+                       lambda jobs, res: done.extend(r["file"] for r in res if r["ok"]), workers=1)
+    assert stamped == ["a.pdf", "b.pdf"] and len(done) == 2
@@ -0,0 +1,174 @@
+# automation/tests/test_web_pool.py
+# web/pool.py с фалшив Playwright драйвер (без Chromium): lease, timeout, рестарт, close.
+# Драйверът проверява, че всяко извикване е от нишката, стартирала браузъра –
+# както истинското sync API.
+#   python -m pytest automation/tests
+from __future__ import annotations
+import sys, threading, time, types
+from concurrent.futures import TimeoutError as FutureTimeout
+
+import pytest
+
+from automation.web import pool as pool_mod
+from automation.web.pool import BrowserPool
+
+# ------------------------ Фалшив драйвер ------------------------
+class FakeContext:
+    def __init__(self, browser: "FakeBrowser"):
+        self.browser = browser
+        self.closed = False
+
+    def close(self) -> None:
+        self.browser.check_thread()
+        self.closed = True
+
+class FakeBrowser:
+    def __init__(self, driver: "FakeDriver"):
+        self.tid = threading.get_ident()
+        self.connected = True
+        self.contexts: list[FakeContext] = []
+        driver.launched.append(self)
+
+    def check_thread(self) -> None:
+        assert threading.get_ident() == self.tid, "извикване от чужда нишка"
+
+    def is_connected(self) -> bool:
+        return self.connected
+
+    def new_context(self, **kwargs) -> FakeContext:
+        self.check_thread()
+        if not self.connected:
+            raise RuntimeError("Target closed")
+        ctx = FakeContext(self)
+        self.contexts.append(ctx)
+        return ctx
+
+    def close(self) -> None:
+        self.connected = False
+
+class FakeDriver:
+    def __init__(self):
+        self.launched: list[FakeBrowser] = []
+        self.stopped = 0
+        self.chromium = self
+
+    # sync_playwright().start() / .chromium.launch() / .stop()
+    def start(self) -> "FakeDriver":
+        return self
+
+    def launch(self, headless: bool = True, **kwargs) -> FakeBrowser:
+        return FakeBrowser(self)
+
+    def stop(self) -> None:
+        self.stopped += 1
+
+@pytest.fixture
+def driver(monkeypatch):
+    drv = FakeDriver()
+    api = types.ModuleType("playwright.sync_api")
+    api.sync_playwright = lambda: drv
+    pkg = types.ModuleType("playwright")
+    pkg.sync_api = api
+    monkeypatch.setitem(sys.modules, "playwright", pkg)
+    monkeypatch.setitem(sys.modules, "playwright.sync_api", api)
+    return drv
+
+# ------------------------ submit / map ------------------------
+def test_submit_runs_in_fresh_context_closed_afterwards(driver):
+    with BrowserPool(1, warm=False) as pool:
+        c1 = pool.submit(lambda ctx: ctx).result(5)
+        c2 = pool.submit(lambda ctx: ctx).result(5)
+    assert c1 is not c2
+    assert c1.closed and c2.closed
+    assert len(driver.launched) == 1          # един браузър за двете задачи
+
+def test_map_keeps_order_and_propagates_errors(driver):
+    with BrowserPool(2, warm=False) as pool:
+        assert pool.map(lambda ctx, x: x * 2, [1, 2, 3]) == [2, 4, 6]
+        with pytest.raises(ValueError):
+            pool.submit(lambda ctx: int("x")).result(5)
+
+# ------------------------ Lease ------------------------
+def test_session_reuses_one_context_until_exit(driver):
+    with BrowserPool(1, warm=False) as pool:
+        with pool.session(timeout=5) as s:
+            a = s.run(lambda ctx: ctx)
+            b = s.run(lambda ctx: ctx)
+            assert a is b and not a.closed
+        deadline = time.monotonic() + 5
+        while not a.closed and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert a.closed
+        # браузърът е свободен отново
+        assert pool.submit(lambda ctx: 1).result(5) == 1
+
+def test_session_outside_with_block_raises(driver):
+    with BrowserPool(1, warm=False) as pool:
+        lease = pool.session()
+        with pytest.raises(RuntimeError):
+            lease.run(lambda ctx: None)
+
+def test_session_timeout_when_all_browsers_busy(driver):
+    with BrowserPool(1, warm=False) as pool:
+        with pool.session(timeout=5) as held:
+            held.run(lambda ctx: None)
+            t0 = time.monotonic()
+            with pytest.raises(FutureTimeout):
+                with pool.session(timeout=0.2):
+                    pass
+            assert time.monotonic() - t0 < 2
+        # отказаната заявка не държи браузъра – следващата минава
+        with pool.session(timeout=5) as s:
+            assert s.run(lambda ctx: "ok") == "ok"
+
+# ------------------------ Рестарт ------------------------
+def test_disconnected_browser_is_relaunched(driver):
+    with BrowserPool(1, warm=False) as pool:
+        pool.submit(lambda ctx: None).result(5)
+        driver.launched[-1].connected = False     # браузърът е паднал
+        ctx = pool.submit(lambda ctx: ctx).result(5)
+    assert len(driver.launched) == 2
+    assert ctx.browser is driver.launched[1]
+
+def test_browser_recycled_after_max_contexts(driver):
+    with BrowserPool(1, warm=False, max_contexts=3) as pool:
+        for _ in range(7):
+            pool.submit(lambda ctx: None).result(5)
+        stats = pool.stats()[0]
+    assert len(driver.launched) == 3
+    assert stats["launches"] == 3 and stats["contexts"] == 1
+
+# ------------------------ close ------------------------
+def test_close_waits_for_running_job_and_stops_driver(driver):
+    pool = BrowserPool(1, warm=False)
+    started = threading.Event()
+
+    def slow(ctx):
+        started.set()
+        time.sleep(0.3)
+        return "done"
+
+    fut = pool.submit(slow)
+    assert started.wait(5)
+    pool.close()
+    assert fut.result(0) == "done"
+    assert not any(s["alive"] for s in pool.stats())
+    assert not driver.launched[0].connected
+    assert driver.stopped == 1
+    with pytest.raises(RuntimeError):
+        pool.submit(lambda ctx: None)
+    with pytest.raises(RuntimeError):
+        pool.session()
+
+def test_get_pool_is_shared_until_closed(driver, monkeypatch):
+    monkeypatch.setattr(pool_mod, "_shared", None)
+    a = pool_mod.get_pool(1, warm=False)
+    try:
+        assert pool_mod.get_pool() is a
+    finally:
+        pool_mod.close_pool()
+    b = pool_mod.get_pool(1, warm=False)
+    try:
+        assert b is not a
+    finally:
+        pool_mod.close_pool()
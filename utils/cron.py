@@ -0,0 +1,88 @@
+# automation/utils/cron.py
+# Минимален cron парсер (5 полета) за `schedules:` в pipelines.yml.
+from __future__ import annotations
+from datetime import datetime, timedelta
+from typing import FrozenSet, Optional
+
+# (име, min, max); ден от седмицата: 0 или 7 = неделя
+_FIELDS = (("minute", 0, 59), ("hour", 0, 23), ("day", 1, 31), ("month", 1, 12), ("weekday", 0, 7))
+_ALIASES = {
+    "@hourly": "0 * * * *",
+    "@daily": "0 0 * * *",
+    "@weekly": "0 0 * * 0",
+    "@monthly": "0 0 1 * *",
+}
+
+def _parse_field(expr: str, lo: int, hi: int) -> FrozenSet[int]:
+    out = set()
+    for part in expr.split(","):
+        rng, _, step = part.partition("/")
+        step_n = int(step) if step else 1
+        if step_n < 1:
+            raise ValueError(f"cron: стъпка < 1 в '{part}'")
+        if rng == "*":
+            a, b = lo, hi
+        elif "-" in rng:
+            a, b = (int(x) for x in rng.split("-", 1))
+        else:
+            a = int(rng)
+            b = hi if step else a          # "5/15" = от 5 до края през 15
+        if not (lo <= a <= hi and lo <= b <= hi and a <= b):
+            raise ValueError(f"cron: '{part}' е извън {lo}-{hi}")
+        out.update(range(a, b + 1, step_n))
+    return frozenset(out)
+
+class Cron:
+    """
+    "мин час ден месец ден_от_седмицата", напр. "*/15 8-18 * * 1-5".
+    Поддържа *, списъци (1,3), диапазони (1-5), стъпки (*/10, 8-18/2) и @hourly/@daily/…
+    Както в cron: ако и денят от месеца, и денят от седмицата са ограничени (не
+    започват с "*"), достатъчно е да съвпадне един от тях; иначе трябват и двата.
+    """
+    __slots__ = ("expr", "minute", "hour", "day", "month", "weekday", "_dom_any", "_dow_any")
+
+    def __init__(self, expr: str):
+        self.expr = expr.strip()
+        parts = _ALIASES.get(self.expr, self.expr).split()
+        if len(parts) != 5:
+            raise ValueError(f"cron: очакват се 5 полета, получих '{expr}'")
+        for (name, lo, hi), part in zip(_FIELDS, parts):
+            setattr(self, name, _parse_field(part, lo, hi))
+        self.weekday = frozenset(d % 7 for d in self.weekday)
+        # като във Vixie cron: поле, започващо с "*" (и */2), не се брои за ограничено
+        self._dom_any = parts[2].startswith("*")
+        self._dow_any = parts[4].startswith("*")
+
+    def matches(self, dt: datetime) -> bool:
+        return (dt.minute in self.minute and dt.hour in self.hour
+                and dt.month in self.month and self._day_ok(dt))
+
+    def next_after(self, dt: datetime) -> Optional[datetime]:
+        """Първата минута след dt, която съвпада (търси до ~4 години напред; иначе None)."""
+        t = dt.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        end = t + timedelta(days=366 * 4)
+        while t < end:
+            if t.month not in self.month:
+                t = (t.replace(day=1, hour=0, minute=0) + timedelta(days=32)).replace(day=1)
+                continue
+            if not self._day_ok(t):
+                t = t.replace(hour=0, minute=0) + timedelta(days=1)
+                continue
+            if t.hour not in self.hour:
+                t = t.replace(minute=0) + timedelta(hours=1)
+                continue
+            if t.minute not in self.minute:
+                t += timedelta(minutes=1)
+                continue
+            return t
+        return None
+
+    def _day_ok(self, dt: datetime) -> bool:
+        dom = dt.day in self.day
+        dow = (dt.isoweekday() % 7) in self.weekday
+        if self._dom_any or self._dow_any:
+            return dom and dow
+        return dom or dow
+
+    def __repr__(self) -> str:
+        return f"Cron({self.expr!r})"
@@ -0,0 +1,120 @@
+# automation/utils/disk_cache.py
+# Малък кеш на диск – по един pickle файл на ключ, с изчистване по размер и възраст.
+from __future__ import annotations
+import hashlib, os, pickle, tempfile, time
+from pathlib import Path
+from typing import Any, Optional, Tuple
+
+def _unlink(p: Path) -> bool:
+    """Трие файла; False, ако го няма или е зает (Windows: отворен от друг четящ)."""
+    try:
+        p.unlink()
+        return True
+    except OSError:
+        return False
+
+class DiskCache:
+    """
+    Всеки запис е файл <sha1(key)>.pkl с два последователни pickle-а:
+    заглавие {"key", "meta", "created"} и самата стойност. Така при различна
+    `meta` (напр. променен mtime на източника) стойността изобщо не се зарежда.
+
+    - get()  обновява mtime на файла → evict() маха най-отдавна ползваните (LRU);
+    - evict() трие записи, неползвани повече от max_age_s, и после най-старите,
+      докато общият размер стане <= max_bytes.
+    """
+
+    def __init__(self, root: Path, max_bytes: int = 256 * 1024 * 1024,
+                 max_age_s: Optional[float] = 14 * 24 * 3600):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.max_age_s = max_age_s
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, key: str) -> Path:
+        return self.root / (hashlib.sha1(key.encode("utf-8")).hexdigest() + ".pkl")
+
+    def get(self, key: str, meta: Any = None, ttl_s: Optional[float] = None) -> Tuple[bool, Any]:
+        """(True, стойност) при валиден запис, иначе (False, None)."""
+        p = self._path(key)
+        try:
+            with open(p, "rb") as f:
+                head = pickle.load(f)
+                fresh = head.get("key") == key and head.get("meta") == meta and (
+                    not ttl_s or time.time() - head.get("created", 0) <= ttl_s)
+                value = pickle.load(f) if fresh else None
+        except FileNotFoundError:
+            self.misses += 1
+            return False, None
+        except Exception:          # повреден/непълен файл – просто го махаме
+            fresh = False
+        if not fresh:
+            _unlink(p)             # зает файл остава – следващият get/evict пак ще опита
+            self.misses += 1
+            return False, None
+        try:
+            os.utime(p)
+        except OSError:
+            pass
+        self.hits += 1
+        return True, value
+
+    def put(self, key: str, value: Any, meta: Any = None) -> None:
+        self.root.mkdir(parents=True, exist_ok=True)
+        p = self._path(key)
+        # уникален временен файл за всеки запис – нишки в един процес (паралелни стъпки,
+        # route кешът на няколко context-а) може да пишат един и същ ключ едновременно
+        fd, tmp = tempfile.mkstemp(prefix=p.stem + ".", suffix=".tmp", dir=self.root)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump({"key": key, "meta": meta, "created": time.time()}, f, protocol=pickle.HIGHEST_PROTOCOL)
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, p)     # атомарно – четящ никога не вижда половин файл
+        except OSError:
+            # Windows: целта е отворена от друг четящ/пишещ – записът е само кеш, пропускаме го
+            Path(tmp).unlink(missing_ok=True)
+            return
+        except BaseException:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+        self.evict()
+
+    def invalidate(self, key: Optional[str] = None) -> int:
+        """Маха един запис (key) или целия кеш (key=None). Връща броя изтрити файлове."""
+        if key is not None:
+            return int(_unlink(self._path(key)))
+        return sum(_unlink(p) for p in self.root.glob("*.pkl"))
+
+    def evict(self) -> int:
+        if not self.root.exists():
+            return 0
+        now = time.time()
+        entries = []
+        for p in self.root.glob("*.pkl"):
+            try:
+                st = p.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, p))
+        entries.sort()             # най-отдавна ползваните първи
+
+        removed = 0
+        total = sum(size for _, size, _ in entries)
+        for mtime, size, p in entries:
+            expired = self.max_age_s is not None and now - mtime > self.max_age_s
+            if not expired and total <= self.max_bytes:
+                continue
+            if _unlink(p):
+                total -= size
+                removed += 1
+        return removed
+
+    def stats(self) -> dict:
+        files = list(self.root.glob("*.pkl")) if self.root.exists() else []
+        return {
+            "entries": len(files),
+            "bytes": sum(p.stat().st_size for p in files),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
@@ -0,0 +1,150 @@
+# automation/utils/fswatch.py
+# Следене на папка за нови/дописани файлове: watchdog (inotify / ReadDirectoryChangesW),
+# ако е инсталиран, иначе евтин polling по индекс (размер, mtime) през os.scandir.
+from __future__ import annotations
+import fnmatch, os, threading, time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+RESCAN_S = 30.0     # пълно пресканиране и при watchdog – за изпуснати събития (мрежови дискове и др.)
+
+def _scan(root: Path, pattern: str) -> Dict[str, Tuple[int, int]]:
+    out = {}
+    try:
+        with os.scandir(root) as it:
+            for e in it:
+                if not fnmatch.fnmatch(e.name.lower(), pattern):
+                    continue
+                try:
+                    if e.is_file():
+                        st = e.stat()         # под Windows идва от самото scandir, без отделен syscall
+                        out[e.name] = (st.st_size, st.st_mtime_ns)
+                except FileNotFoundError:
+                    continue
+    except FileNotFoundError:
+        pass
+    return out
+
+def _readable(p: Path) -> bool:
+    # под Windows браузърът/копирането държи файла заключен, докато пише
+    try:
+        with open(p, "rb") as f:
+            f.read(1)
+        return True
+    except OSError:
+        return False
+
+class DirWatcher:
+    """
+    watcher = DirWatcher(folder, "*.pdf", settle_s=2.0)
+    with watcher:
+        ready = watcher.poll(timeout=1.0)   # файлове, „утихнали“ поне settle_s секунди
+
+    Файл се счита за готов, когато размерът и mtime не са се променили settle_s
+    секунди, не е празен и може да се отвори за четене (debounce на наполовина
+    записани файлове). Всеки файл се връща отново само ако после се промени.
+    include_existing=False → файловете, които вече са в папката при старта, се пропускат.
+    """
+
+    def __init__(self, root: Path, pattern: str = "*", settle_s: float = 2.0, poll_s: float = 1.0,
+                 include_existing: bool = False, use_watchdog: Optional[bool] = None):
+        self.root = Path(root)
+        self.pattern = pattern.lower()
+        self.settle_s = settle_s
+        self.poll_s = poll_s
+        self._index: Dict[str, Tuple[int, int]] = {} if include_existing else _scan(self.root, self.pattern)
+        self._done: Dict[str, Tuple[int, int]] = dict(self._index)
+        self._pending: Dict[str, Tuple[Tuple[int, int], float]] = {}   # име → (подпис, кога се видя)
+        self._wake = threading.Event()
+        self._observer = None
+        self._last_scan = 0.0
+        self.backend = "polling"
+        if use_watchdog is not False:
+            self._start_watchdog(required=bool(use_watchdog))
+
+    def _start_watchdog(self, required: bool) -> None:
+        try:
+            from watchdog.events import FileSystemEventHandler
+            from watchdog.observers import Observer
+        except ImportError:
+            if required:
+                raise
+            return
+        wake = self._wake
+
+        class _Handler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                if not event.is_directory:
+                    wake.set()
+
+        obs = Observer()
+        obs.schedule(_Handler(), str(self.root), recursive=False)
+        obs.daemon = True
+        obs.start()
+        self._observer = obs
+        self.backend = "watchdog"
+        self._wake.set()   # първото poll() сканира веднага
+
+    def close(self) -> None:
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join(timeout=5)
+            self._observer = None
+
+    def __enter__(self) -> "DirWatcher":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _refresh(self) -> None:
+        now = time.monotonic()
+        cur = _scan(self.root, self.pattern)
+        for name, sig in cur.items():
+            if self._index.get(name) != sig:
+                self._pending[name] = (sig, now)       # нов или пак се променя → таймерът почва отначало
+        for name in set(self._index) - set(cur):
+            self._pending.pop(name, None)
+            self._done.pop(name, None)
+        self._index = cur
+        self._last_scan = now
+
+    def poll(self, timeout: Optional[float] = None) -> List[Path]:
+        """
+        Изчаква до `timeout` секунди (None → един poll_s интервал) и връща
+        файловете, които са станали готови. Празен списък, ако няма такива.
+        """
+        deadline = time.monotonic() + (self.poll_s if timeout is None else timeout)
+        while True:
+            if (self._observer is None or self._wake.is_set() or self._pending
+                    or time.monotonic() - self._last_scan >= RESCAN_S):
+                self._wake.clear()
+                self._refresh()
+            ready = self._collect()
+            left = deadline - time.monotonic()
+            if ready or left <= 0:
+                return ready
+            wait_s = min(left, self.poll_s)
+            if self._pending:
+                first = min(t for _, t in self._pending.values())
+                wait_s = min(wait_s, max(0.05, first + self.settle_s - time.monotonic()))
+            if self._observer is not None:
+                self._wake.wait(wait_s)
+            else:
+                time.sleep(wait_s)
+
+    def _collect(self) -> List[Path]:
+        now = time.monotonic()
+        ready = []
+        for name, (sig, seen) in list(self._pending.items()):
+            if now - seen < self.settle_s:
+                continue
+            p = self.root / name
+            if sig[0] == 0 or not _readable(p):
+                self._pending[name] = (sig, now)        # празен/заключен – пак след settle_s
+                continue
+            del self._pending[name]
+            if self._done.get(name) != sig:
+                self._done[name] = sig
+                ready.append(p)
+        return sorted(ready)
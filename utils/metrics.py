@@ -0,0 +1,155 @@
+# automation/utils/metrics.py
+# Измерване на стъпките: wall/CPU време, памет, throughput, по желание cProfile.
+from __future__ import annotations
+import json, os, re, sys, threading, time, tracemalloc
+from collections.abc import Sized
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Iterator, List, Optional
+
+def peak_rss_mb() -> Optional[float]:
+    """Най-високият RSS на процеса досега (MB) или None, ако няма как да се разбере."""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+    except ImportError:
+        pass
+    try:
+        import psutil   # по избор (Windows)
+        info = psutil.Process().memory_info()
+        return getattr(info, "peak_wset", info.rss) / 1024 / 1024
+    except Exception:
+        return None
+
+def _children_cpu_s() -> float:
+    # CPU на дъщерните процеси (напр. process pool в stamp_dir); само POSIX
+    try:
+        import resource
+        ru = resource.getrusage(resource.RUSAGE_CHILDREN)
+        return ru.ru_utime + ru.ru_stime
+    except ImportError:
+        return 0.0
+
+def count_items(out: Any) -> Optional[int]:
+    """Брой обработени елементи в резултата: len() на колекция или stamped_count/lookup_count."""
+    if isinstance(out, dict):
+        for key in ("stamped_count", "lookup_count"):
+            if isinstance(out.get(key), int):
+                return out[key]
+        return None
+    if isinstance(out, Sized) and not isinstance(out, (str, bytes)):
+        return len(out)
+    return None
+
+class RunMetrics:
+    """
+    Събира метриките за един run на pipeline-а.
+      - measure(i, task) – context manager около изпълнението на стъпка;
+      - summary_lines() – таблица за лога;
+      - write_jsonl() – по ред на стъпка в <logs>/metrics.jsonl.
+    trace_memory=True пуска tracemalloc (нетна промяна и пик на Python алокациите);
+    profile_dir → cProfile .prof файл за всяка стъпка.
+
+    Паметта е на ниво процес: proc_peak_rss_mb е пикът на целия процес до края на
+    стъпката (ru_maxrss), а cpu_children_s – на всички дъщерни процеси през това време.
+    tracemalloc също е общ за процеса, затова mem_delta_kb/mem_peak_kb се записват
+    само за стъпка, която е вървяла сама (max_workers: 1 или без паралелни съседи);
+    иначе остават None и mem_shared=True.
+    """
+
+    def __init__(self, pipeline: str, log_dir: Path, trace_memory: bool = False,
+                 profile_dir: Optional[Path] = None):
+        self.pipeline = pipeline
+        self.run_id = datetime.now().strftime("%Y%m%d-%H%M%S") + f"-{os.getpid()}"
+        self.jsonl_path = Path(log_dir) / "metrics.jsonl"
+        self.trace_memory = trace_memory
+        self.profile_dir = Path(profile_dir) if profile_dir else None
+        self.steps: List[dict] = []
+        self._lock = threading.Lock()
+        self._active = 0           # стъпки, които се мерят в момента
+        self._starts = 0           # стартирани досега – нов старт по време на стъпка = припокриване
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    @contextmanager
+    def measure(self, index: int, task: str) -> Iterator[dict]:
+        """
+        Попълва dict-а с wall_s, cpu_s (нишката на стъпката), cpu_children_s,
+        proc_peak_rss_mb и (при trace_memory) mem_delta_kb/mem_peak_kb – виж класа.
+        Стъпката може да сложи m["items"] и m["status"].
+        """
+        m: dict = {"step": index, "task": task, "status": "ok", "items": None}
+        prof = None
+        if self.profile_dir is not None:
+            import cProfile
+            prof = cProfile.Profile()
+        with self._lock:
+            self._active += 1
+            self._starts += 1
+            starts0 = self._starts
+            solo = self._active == 1
+            # reset_peak е общ за процеса – само ако никоя друга стъпка не се мери в момента
+            if self.trace_memory and solo:
+                tracemalloc.reset_peak()
+        mem0 = tracemalloc.get_traced_memory()[0] if self.trace_memory else 0
+        ch0, cpu0, t0 = _children_cpu_s(), time.thread_time(), time.perf_counter()
+        if prof:
+            prof.enable()
+        try:
+            yield m
+        except BaseException:
+            m["status"] = "failed"
+            raise
+        finally:
+            if prof:
+                prof.disable()
+            m["wall_s"] = round(time.perf_counter() - t0, 4)
+            m["cpu_s"] = round(time.thread_time() - cpu0, 4)
+            m["cpu_children_s"] = round(_children_cpu_s() - ch0, 4)
+            m["proc_peak_rss_mb"] = peak_rss_mb()
+            with self._lock:
+                solo = solo and self._starts == starts0
+                self._active -= 1
+            if self.trace_memory:
+                if solo:
+                    cur, peak = tracemalloc.get_traced_memory()
+                    m["mem_delta_kb"] = round((cur - mem0) / 1024, 1)
+                    m["mem_peak_kb"] = round(peak / 1024, 1)
+                else:
+                    m["mem_delta_kb"] = m["mem_peak_kb"] = None
+                    m["mem_shared"] = True
+            if m.get("items") is not None and m["wall_s"] > 0:
+                m["items_per_s"] = round(m["items"] / m["wall_s"], 2)
+            if prof:
+                self.profile_dir.mkdir(parents=True, exist_ok=True)
+                safe = re.sub(r"[^\w.-]+", "_", task)
+                m["profile"] = str(self.profile_dir / f"{self.run_id}-{index:02d}-{safe}.prof")
+                prof.dump_stats(m["profile"])
+            with self._lock:
+                self.steps.append(m)
+
+    def summary_lines(self) -> List[str]:
+        rows = sorted(self.steps, key=lambda m: m["step"])
+        total = sum(m.get("wall_s", 0) for m in rows) or 1.0
+        head = f"{'#':>2} {'task':<52} {'status':<7} {'wall s':>8} {'cpu s':>8} {'%':>5} {'items':>7} {'items/s':>9} {'proc MB':>7}"
+        out = [head, "-" * len(head)]
+        for m in rows:
+            rss = m.get("proc_peak_rss_mb")
+            out.append(
+                f"{m['step']:>2} {m['task'][-52:]:<52} {m['status']:<7} {m.get('wall_s', 0):>8.2f} "
+                f"{m.get('cpu_s', 0) + m.get('cpu_children_s', 0):>8.2f} {100 * m.get('wall_s', 0) / total:>5.1f} "
+                f"{'' if m.get('items') is None else m['items']:>7} {m.get('items_per_s', ''):>9} "
+                f"{'' if rss is None else f'{rss:.0f}':>7}"
+            )
+        return out
+
+    def write_jsonl(self) -> Path:
+        self.jsonl_path.parent.mkdir(parents=True, exist_ok=True)
+        ts = datetime.now().isoformat(timespec="seconds")
+        with open(self.jsonl_path, "a", encoding="utf-8") as f:
+            for m in sorted(self.steps, key=lambda m: m["step"]):
+                f.write(json.dumps({"run_id": self.run_id, "ts": ts, "pipeline": self.pipeline, **m},
+                                   ensure_ascii=False) + "\n")
+        return self.jsonl_path
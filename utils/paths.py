@@ -0,0 +1,15 @@
+# automation/utils/paths.py
+# Локалната папка на пакета (логове, кешове, сесии, ключове).
+from __future__ import annotations
+import os
+from pathlib import Path
+
+def local_dir() -> Path:
+    """
+    <LOCALAPPDATA>/Packages/*MyAutomation*/LocalCache/MyAutomation при MSIX инсталация,
+    иначе ~/AppData/Local/MyAutomation.
+    """
+    base = Path(os.environ.get("LOCALAPPDATA", "")) / "Packages"
+    for p in base.glob("*MyAutomation*"):
+        return p / "LocalCache" / "MyAutomation"
+    return Path.home() / "AppData" / "Local" / "MyAutomation"
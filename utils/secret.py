@@ -0,0 +1,106 @@
+# automation/utils/secret.py
+# Криптиране на малки тайни на диска (сесии, токени):
+#   1) Windows DPAPI (win32crypt) – вързано за потребителя, без ключ във файл;
+#   2) cryptography.Fernet с ключ в <LocalCache>/secret.key – ако няма pywin32;
+#   3) нищо → SecretUnavailable (извикващият не записва в явен вид).
+from __future__ import annotations
+import os, tempfile
+from pathlib import Path
+from typing import Optional
+
+from automation.utils.paths import local_dir
+
+_DPAPI = b"DPAPI1:"
+_FERNET = b"FERNET1:"
+_ENTROPY = b"MyAutomation/session"
+
+class SecretUnavailable(RuntimeError):
+    """Нито DPAPI, нито cryptography са налични."""
+
+def _win32crypt():
+    try:
+        import win32crypt
+        return win32crypt
+    except ImportError:
+        return None
+
+def _key_path() -> Path:
+    return local_dir() / "secret.key"
+
+def _read_key(p: Path) -> bytes:
+    try:
+        return p.read_bytes().strip()
+    except FileNotFoundError:
+        return b""
+
+def _create_key(p: Path, key: bytes) -> bytes:
+    """
+    Публикува ключа наведнъж: временен файл (mkstemp – само за собственика) + os.link,
+    така че друг процес никога не вижда празен/наполовина записан secret.key и не
+    презаписваме ключ, създаден междувременно. Връща ключа, който е на диска.
+    """
+    p.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=p.parent, prefix=".secret.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(key)
+        try:
+            os.link(tmp, p)
+        except FileExistsError:          # друг процес го е създал междувременно …
+            if _read_key(p):
+                return _read_key(p)
+            os.replace(tmp, p)           # … или е празен (прекъснат стар запис) – с него няма нищо криптирано
+        except OSError:                  # файловата система няма твърди връзки
+            os.replace(tmp, p)
+    finally:
+        Path(tmp).unlink(missing_ok=True)
+    return _read_key(p) or key
+
+def _fernet():
+    try:
+        from cryptography.fernet import Fernet
+    except ImportError:
+        return None
+    p = _key_path()
+    key = _read_key(p) or _create_key(p, Fernet.generate_key())
+    return Fernet(key)
+
+def backend() -> Optional[str]:
+    """Кой механизъм ще ползва protect(): "dpapi", "fernet" или None."""
+    if _win32crypt() is not None:
+        return "dpapi"
+    try:
+        import cryptography.fernet  # noqa: F401
+        return "fernet"
+    except ImportError:
+        return None
+
+def protect(data: bytes) -> bytes:
+    wc = _win32crypt()
+    if wc is not None:
+        return _DPAPI + wc.CryptProtectData(data, "automation", _ENTROPY, None, None, 0)
+    f = _fernet()
+    if f is not None:
+        return _FERNET + f.encrypt(data)
+    raise SecretUnavailable("няма DPAPI (pywin32) или cryptography – тайната не се записва")
+
+def unprotect(blob: bytes) -> bytes:
+    """Обратното на protect(); ValueError при чужд/повреден запис."""
+    if blob.startswith(_DPAPI):
+        wc = _win32crypt()
+        if wc is None:
+            raise SecretUnavailable("записът е с DPAPI, а pywin32 липсва")
+        try:
+            return wc.CryptUnprotectData(blob[len(_DPAPI):], _ENTROPY, None, None, 0)[1]
+        except Exception as e:       # друг потребител/машина
+            raise ValueError(f"DPAPI: {e}") from e
+    if blob.startswith(_FERNET):
+        f = _fernet()
+        if f is None:
+            raise SecretUnavailable("записът е с Fernet, а cryptography липсва")
+        from cryptography.fernet import InvalidToken
+        try:
+            return f.decrypt(blob[len(_FERNET):])
+        except InvalidToken as e:    # сменен/изтрит ключ
+            raise ValueError("Fernet: невалиден ключ или повреден запис") from e
+    raise ValueError("непознат формат")
@@ -0,0 +1,322 @@
+# automation/web/async_engine.py
+# Асинхронни справки по дела в портала (playwright.async_api): един браузър, няколко
+# влезли context-а и по една страница на worker, лимит на паралелните заявки,
+# rate limit по хост и повторения с експоненциален backoff.
+from __future__ import annotations
+import asyncio, logging, random, time
+from importlib import import_module
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Mapping, Optional, Sequence, Union
+from urllib.parse import urlencode, urljoin, urlsplit
+
+log = logging.getLogger(__name__)
+
+CONCURRENCY = 4          # страници, които работят едновременно
+RATE_PER_HOST = 5.0      # заявки/s към един хост (0 = без лимит)
+RETRIES = 3
+BACKOFF_S = 0.5          # 0.5, 1, 2 … (+ jitter), най-много BACKOFF_MAX_S
+BACKOFF_MAX_S = 8.0
+JOB_TIMEOUT_S = 30.0
+TIMEOUT_MS = 7000
+KINDS = ("ikar", "dvijemi")     # флаговете do_<kind> в делата
+
+Lookup = Callable[[Any, dict, str], Awaitable[Any]]     # (page, job, base_url) → стойност
+
+class RetryableError(Exception):
+    """Временна грешка от lookup (напр. 503 страница) – задачата се повтаря."""
+
+class SessionExpiredError(RetryableError):
+    """Порталът върна началната страница вместо справката – нов вход и повторение."""
+
+def is_start_page(url: str, base_url: str) -> bool:
+    """url е началната страница на портала (пренасочване при изтекла сесия)."""
+    u, b = urlsplit(url or ""), urlsplit(base_url)
+    return (u.netloc, u.path.rstrip("/")) == (b.netloc, b.path.rstrip("/"))
+
+class HostRateLimiter:
+    """Token bucket за всеки хост: средно `rate` заявки/s, до `burst` наведнъж."""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._buckets: Dict[str, List[float]] = {}       # хост → [токени, кога]
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    async def wait(self, url: str) -> None:
+        if self.rate <= 0:
+            return
+        host = urlsplit(url).netloc
+        lock = self._locks.setdefault(host, asyncio.Lock())
+        async with lock:                                  # чакащите за един хост минават по ред
+            loop = asyncio.get_running_loop()
+            tokens, last = self._buckets.get(host, (self.burst, loop.time()))
+            now = loop.time()
+            tokens = min(self.burst, tokens + (now - last) * self.rate)
+            if tokens < 1:
+                await asyncio.sleep((1 - tokens) / self.rate)
+                now = loop.time()
+                tokens = 1.0
+            self._buckets[host] = [tokens - 1, now]
+
+# ------------------------ Задачи от делата ------------------------
+def jobs_from_cases(cases, kinds: Sequence[str] = KINDS) -> List[dict]:
+    """
+    Една задача за всяко дело и всеки вдигнат флаг do_<kind>:
+    {"case_no", "egn_or_eik", "kind"}. Приема Cases (векторният филтър where) или list[dict].
+    """
+    jobs = []
+    for kind in kinds:
+        flag = f"do_{kind}"
+        rows = cases.where(flag) if hasattr(cases, "where") else (c for c in cases if c.get(flag))
+        for c in rows:
+            jobs.append({"case_no": c.get("case_no"), "egn_or_eik": c.get("egn_or_eik"), "kind": kind})
+    return jobs
+
+async def search_lookup(page, job: dict, base_url: str) -> str:
+    """
+    Справка по ЕГН/ЕИК: страница за търсене и изчакване точно на резултата
+    (без фиксирани паузи). URL схемата е тази на web/standin.py – само за stand-in-а
+    и бенчмарковете; за истинските справки подай собствени функции в lookups={kind: ...}.
+    """
+    url = urljoin(base_url, "search?" + urlencode({"q": job.get("egn_or_eik") or "", "kind": job["kind"]}))
+    resp = await page.goto(url, wait_until="domcontentloaded")
+    if resp is not None and resp.status >= 500:
+        raise RetryableError(f"HTTP {resp.status}")
+    if is_start_page(page.url, base_url):
+        raise SessionExpiredError(f"пренасочване към {page.url}")
+    return await page.locator("#result").inner_text(timeout=TIMEOUT_MS)
+
+def resolve_lookups(lookups: Optional[Mapping[str, Union[str, Lookup]]],
+                    kinds: Iterable[str]) -> Dict[str, Lookup]:
+    """
+    {kind: "pkg.mod:func" | "pkg.mod.func" | callable} → {kind: callable}.
+    Вид без lookup е грешка (ValueError) – няма подразбиране към URL схемата на stand-in-а.
+    """
+    lookups = dict(lookups or {})
+    missing = [k for k in kinds if k not in lookups]
+    if missing:
+        raise ValueError(f"няма lookup за: {', '.join(missing)} (lookups={{kind: 'pkg.mod:func'}})")
+    out: Dict[str, Lookup] = {}
+    for kind, fn in lookups.items():
+        if isinstance(fn, str):
+            mod, sep, attr = fn.partition(":")
+            if not sep:
+                mod, _, attr = fn.rpartition(".")
+            fn = getattr(import_module(mod), attr)
+        if not callable(fn):
+            raise TypeError(f"lookups[{kind!r}] не е callable")
+        out[kind] = fn
+    return out
+
+# ------------------------ Двигател ------------------------
+class AsyncEngine:
+    """
+    async with AsyncEngine(concurrency=4, base_url=site.url) as eng:
+        results = await eng.run(jobs)
+
+    `concurrency` worker-а, всеки със своя страница; страниците се разпределят
+    между `contexts` context-а (по подразбиране до 2). Влиза се веднъж – с
+    запазената сесия, ако е валидна (remember=True, web.session) – и останалите
+    context-и тръгват със същия storage_state. Всяка навигация/XHR минава през
+    rate limiter-а по хост (context.route → route.fallback, така че други
+    route-ове остават в сила). Изтекла сесия (SessionExpiredError или страницата
+    е на началния URL след грешка) → нов вход в същия context и повторение;
+    затворена страница се заменя с нова преди следващия опит.
+    routes – kwargs за web.routing.RoutePolicy (False → без блокиране/кеш).
+    lookups – {kind: функция или "pkg.mod:func"}; run() вдига ValueError за вид без lookup.
+    Резултатите са в реда на jobs: {"case_no", "kind", "ok", "value"|"error", "attempts", "ms"}.
+    """
+
+    def __init__(self, *, base_url: Optional[str] = None, concurrency: int = CONCURRENCY,
+                 contexts: Optional[int] = None, rate_per_host: float = RATE_PER_HOST, burst: int = 1,
+                 retries: int = RETRIES, backoff_s: float = BACKOFF_S, job_timeout_s: float = JOB_TIMEOUT_S,
+                 lookups: Optional[Dict[str, Lookup]] = None, login: bool = True, remember: bool = True,
+                 routes: Any = None, headless: bool = True, launch: Optional[dict] = None):
+        from automation.web.routing import RoutePolicy, StepTimer
+        from automation.web.proparty import BASE_URL
+        self.base_url = base_url or BASE_URL
+        self.concurrency = max(1, int(concurrency))
+        self.n_contexts = max(1, min(contexts or 2, self.concurrency))
+        self.limiter = HostRateLimiter(rate_per_host, burst)
+        self.retries = retries
+        self.backoff_s = backoff_s
+        self.job_timeout_s = job_timeout_s
+        self.lookups = resolve_lookups(lookups, ())
+        self.login = login
+        self.remember = remember
+        self.policy = RoutePolicy.from_config(routes)      # без картинки/шрифтове/анализатори
+        self.timer = StepTimer("portal", self.policy)      # времената на входа
+        self.headless = headless
+        self.launch_kwargs = dict(launch or {})
+        self._pw = None
+        self._browser = None
+        self._contexts: List[Any] = []
+        self._login_locks: Dict[Any, asyncio.Lock] = {}      # context → един нов вход наведнъж
+        self._login_gen: Dict[Any, int] = {}                 # context → брой нови входове
+        self._retry_on: tuple = (RetryableError, asyncio.TimeoutError)
+
+    async def __aenter__(self) -> "AsyncEngine":
+        from playwright.async_api import async_playwright, Error as PlaywrightError
+        self._retry_on = (RetryableError, asyncio.TimeoutError, PlaywrightError)
+        self._pw = await async_playwright().start()
+        try:
+            self._browser = await self._pw.chromium.launch(headless=self.headless, **self.launch_kwargs)
+            first = await self._new_context()
+            self._contexts = [first]
+            state = None
+            if self.login:
+                state = await self._open(first)
+            rest = await asyncio.gather(*(self._new_context(state) for _ in range(self.n_contexts - 1)))
+            self._contexts.extend(rest)
+        except BaseException:
+            await self.__aexit__()
+            raise
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        for c in self._contexts:
+            try:
+                await c.close()
+            except Exception:
+                pass
+        self._contexts = []
+        if self._browser is not None:
+            await self._browser.close()
+            self._browser = None
+        if self._pw is not None:
+            await self._pw.stop()
+            self._pw = None
+
+    async def _new_context(self, state: Optional[dict] = None):
+        ctx = await (self._browser.new_context(storage_state=state) if state else self._browser.new_context())
+
+        async def throttle(route, request):
+            if request.resource_type in ("document", "xhr", "fetch"):
+                await self.limiter.wait(request.url)
+            await route.fallback()
+
+        await ctx.route("**/*", throttle)
+        from automation.web.routing import install_async
+        # закачен последен → решава първи; fetch-ът при липса в кеша минава през лимита сам
+        await install_async(ctx, self.policy, before_fetch=lambda request: self.limiter.wait(request.url))
+        return ctx
+
+    async def _login_into(self, ctx) -> None:
+        from automation.web.proparty import open_portal_async
+        from automation.web.session import SessionStore
+        page = await ctx.new_page()
+        try:
+            store = SessionStore.for_url(self.base_url) if self.remember else None
+            await open_portal_async(page, self.base_url, store, self.timer)
+        finally:
+            await page.close()
+
+    async def _open(self, ctx) -> dict:
+        """Вход в първия context; връща storage_state за останалите."""
+        await self._login_into(ctx)
+        return await ctx.storage_state()
+
+    async def _relogin(self, ctx, seen: int) -> None:
+        """
+        Нов вход след изтекла сесия. seen – броят входове, когато задачата е тръгнала:
+        ако междувременно друг worker в същия context вече е влязъл, не влизаме пак.
+        """
+        async with self._login_locks.setdefault(ctx, asyncio.Lock()):
+            if self._login_gen.get(ctx, 0) != seen:
+                return
+            log.info("async_engine: сесията е изтекла – нов вход")
+            await self._login_into(ctx)
+            self._login_gen[ctx] = seen + 1
+
+    def _expired(self, page, e: BaseException) -> bool:
+        if isinstance(e, SessionExpiredError):
+            return True
+        return not page.is_closed() and is_start_page(page.url, self.base_url)
+
+    def _backoff(self, attempt: int) -> float:
+        return min(BACKOFF_MAX_S, self.backoff_s * (2 ** attempt)) * (0.5 + random.random())
+
+    async def _do_job(self, ctx, page, job: dict) -> tuple:
+        """Една задача с повторенията; връща (страницата – нова, ако старата е затворена, резултат)."""
+        lookup = self.lookups[job["kind"]]
+        t0 = time.perf_counter()
+        res = {"case_no": job.get("case_no"), "kind": job["kind"], "ok": False, "attempts": 0}
+        for attempt in range(self.retries + 1):
+            res["attempts"] = attempt + 1
+            seen = self._login_gen.get(ctx, 0)
+            try:
+                if page.is_closed():                      # паднала страница → нова в същия context
+                    page = await ctx.new_page()
+                res["value"] = await asyncio.wait_for(lookup(page, job, self.base_url), self.job_timeout_s)
+                res["ok"] = True
+                break
+            except self._retry_on as e:
+                res["error"] = f"{type(e).__name__}: {e}"
+                if attempt == self.retries:
+                    break
+                if self.login and self._expired(page, e):
+                    try:
+                        await self._relogin(ctx, seen)
+                    except Exception as le:
+                        res["error"] = f"вход: {type(le).__name__}: {le}"
+                        break
+                    continue                              # новият вход е изчакването
+                await asyncio.sleep(self._backoff(attempt))
+            except Exception as e:                        # грешка в самия lookup – без повторение
+                res["error"] = f"{type(e).__name__}: {e}"
+                break
+        if res["ok"]:
+            res.pop("error", None)
+        res["ms"] = round((time.perf_counter() - t0) * 1000, 1)
+        return page, res
+
+    async def run(self, jobs: Iterable[dict],
+                  on_result: Optional[Callable[[int, dict], None]] = None) -> List[dict]:
+        jobs = list(jobs)
+        resolve_lookups(self.lookups, {j["kind"] for j in jobs})      # вид без lookup → преди първата заявка
+        results: List[Optional[dict]] = [None] * len(jobs)
+        q: "asyncio.Queue" = asyncio.Queue()
+        for i, job in enumerate(jobs):
+            q.put_nowait((i, job))
+
+        async def worker(n: int) -> None:
+            ctx = self._contexts[n % len(self._contexts)]
+            page = await ctx.new_page()
+            try:
+                while True:
+                    try:
+                        i, job = q.get_nowait()
+                    except asyncio.QueueEmpty:
+                        return
+                    page, results[i] = await self._do_job(ctx, page, job)
+                    if on_result:
+                        on_result(i, results[i])
+            finally:
+                if not page.is_closed():
+                    await page.close()
+
+        await asyncio.gather(*(worker(n) for n in range(min(self.concurrency, len(jobs)))))
+        return results   # type: ignore[return-value]
+
+    def summary(self) -> Dict[str, Any]:
+        """Времената на входа по стъпки и броячите на прихванатите заявки."""
+        return self.timer.summary()
+
+def lookup_cases(cases, kinds: Sequence[str] = KINDS, summary: Optional[dict] = None,
+                 **engine_kwargs) -> List[dict]:
+    """
+    Синхронна обвивка: задачите от делата през AsyncEngine (нов event loop).
+    Подаден речник summary се попълва с AsyncEngine.summary().
+    """
+    engine_kwargs["lookups"] = resolve_lookups(engine_kwargs.get("lookups"), kinds)   # преди браузъра
+    jobs = jobs_from_cases(cases, kinds)
+    if not jobs:
+        return []
+
+    async def main():
+        async with AsyncEngine(**engine_kwargs) as eng:
+            res = await eng.run(jobs)
+            if summary is not None:
+                summary.update(eng.summary())
+            return res
+
+    return asyncio.run(main())
@@ -0,0 +1,276 @@
+# automation/web/pool.py
+# Пул от „топли“ Playwright браузъри: стартират се веднъж, а всяка задача получава
+# свой изолиран BrowserContext, който се затваря след нея.
+from __future__ import annotations
+import atexit, logging, queue, threading
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from typing import Any, Callable, Dict, List, Optional
+
+log = logging.getLogger(__name__)
+
+POOL_SIZE = 2
+MAX_CONTEXTS = 200      # браузърът се рестартира след толкова контекста (Chromium трупа памет)
+HEALTH_S = 30.0         # бездействащ браузър се проверява поне толкова често
+
+_STOP = object()
+
+class _Slot(threading.Thread):
+    """
+    Един браузър в собствена нишка. Sync API-то на Playwright е вързано за нишката,
+    която го е стартирала, затова всичко с този браузър се изпълнява тук, а
+    извикващите получават Future.
+    """
+
+    def __init__(self, pool: "BrowserPool", index: int):
+        super().__init__(name=f"browser-{index}", daemon=True)
+        self.pool = pool
+        self.index = index
+        self.private: "queue.Queue" = queue.Queue()     # заявки на текущата сесия (lease)
+        self._pw = None
+        self.browser = None
+        self.launches = 0
+        self.contexts = 0         # контексти от последното стартиране
+        self.busy = False
+
+    # ---- жизнен цикъл на браузъра ----
+    def _launch(self) -> None:
+        if self._pw is None:
+            from playwright.sync_api import sync_playwright
+            self._pw = sync_playwright().start()
+        self._close_browser()
+        bt = getattr(self._pw, self.pool.browser_type)
+        self.browser = bt.launch(headless=self.pool.headless, **self.pool.launch_kwargs)
+        self.launches += 1
+        self.contexts = 0
+        if self.launches > 1:
+            log.info("browser-%d: рестарт №%d", self.index, self.launches - 1)
+
+    def _close_browser(self) -> None:
+        b, self.browser = self.browser, None
+        if b is not None:
+            try:
+                b.close()
+            except Exception:
+                pass      # вече е паднал
+
+    def healthy(self) -> bool:
+        return self.browser is not None and self.browser.is_connected()
+
+    def ensure(self) -> None:
+        """Health check: паднал/изключен браузър или изчерпан лимит на контексти → нов."""
+        if not self.healthy() or self.contexts >= self.pool.max_contexts:
+            self._launch()
+
+    def new_context(self):
+        self.ensure()
+        try:
+            ctx = self.browser.new_context(**self.pool.context_kwargs)
+        except Exception:
+            self._launch()                              # браузърът е умрял между проверката и заявката
+            ctx = self.browser.new_context(**self.pool.context_kwargs)
+        self.contexts += 1
+        return ctx
+
+    # ---- работен цикъл ----
+    def run(self) -> None:
+        if self.pool.warm:
+            try:
+                self._launch()
+            except Exception as e:
+                log.warning("browser-%d: не стартира (%s); нов опит при първата задача", self.index, e)
+        while True:
+            try:
+                job = self.pool._jobs.get(timeout=HEALTH_S)
+            except queue.Empty:
+                if self.browser is not None and not self.healthy():
+                    log.warning("browser-%d: изключен, рестартирам", self.index)
+                    self._safe(self._launch)
+                continue
+            if job is _STOP:
+                break
+            self.busy = True
+            try:
+                kind, payload = job
+                if kind == "call":
+                    self._call(*payload)
+                else:
+                    self._serve_lease(payload)
+            finally:
+                self.busy = False
+        self._close_browser()
+        if self._pw is not None:
+            self._safe(self._pw.stop)
+
+    def _safe(self, fn: Callable) -> None:
+        try:
+            fn()
+        except Exception as e:
+            log.warning("browser-%d: %s", self.index, e)
+
+    def _call(self, fn: Callable, args: tuple, kwargs: dict, fut: Future) -> None:
+        if not fut.set_running_or_notify_cancel():
+            return
+        ctx = None
+        try:
+            ctx = self.new_context()
+            fut.set_result(fn(ctx, *args, **kwargs))
+        except BaseException as e:
+            fut.set_exception(e)
+        finally:
+            if ctx is not None:
+                self._safe(ctx.close)
+
+    def _serve_lease(self, lease: "Lease") -> None:
+        if not lease._ready.set_running_or_notify_cancel():
+            return                                       # чакащият се е отказал (timeout)
+        try:
+            lease._context = self.new_context()
+        except BaseException as e:
+            lease._ready.set_exception(e)
+            return
+        lease._slot = self
+        lease._ready.set_result(None)
+        try:
+            while True:
+                item = self.private.get()
+                if item is _STOP:
+                    break
+                fn, args, kwargs, fut = item
+                if not fut.set_running_or_notify_cancel():
+                    continue
+                try:
+                    fut.set_result(fn(lease._context, *args, **kwargs))
+                except BaseException as e:
+                    fut.set_exception(e)
+        finally:
+            self._safe(lease._context.close)
+            lease._context = None
+
+class Lease:
+    """
+    Изолиран BrowserContext, резервиран за една задача до края на with-блока:
+        with pool.session() as s:
+            s.run(login)                 # login(context)
+            s.run(lookup, case_no)       # същият context (бисквитки, сесия)
+    Функциите се изпълняват в нишката на браузъра; run() връща резултата им.
+    """
+
+    def __init__(self, pool: "BrowserPool", timeout: Optional[float]):
+        self._pool = pool
+        self._timeout = timeout
+        self._ready: Future = Future()
+        self._slot: Optional[_Slot] = None
+        self._context = None
+
+    def __enter__(self) -> "Lease":
+        self._pool._jobs.put(("lease", self))
+        try:
+            self._ready.result(self._timeout)   # чака свободен браузър
+        except FutureTimeout:
+            if not self._ready.cancel():        # браузърът точно я е поел → освобождаваме го
+                self._ready.result()
+                self.__exit__()
+            raise
+        return self
+
+    def submit(self, fn: Callable[..., Any], *args, **kwargs) -> Future:
+        if self._slot is None:
+            raise RuntimeError("сесията не е активна (използвай with pool.session())")
+        fut: Future = Future()
+        self._slot.private.put((fn, args, kwargs, fut))
+        return fut
+
+    def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        return self.submit(fn, *args, **kwargs).result()
+
+    def __exit__(self, *exc) -> None:
+        if self._slot is not None:
+            self._slot.private.put(_STOP)
+            self._slot = None
+
+class BrowserPool:
+    """
+    with BrowserPool(size=2) as pool:
+        url = pool.submit(fn, x).result()      # fn(context, x) в нов контекст, затворен след това
+        urls = pool.map(fn, items)
+        with pool.session() as s: ...          # един контекст за няколко стъпки (Lease)
+
+    size браузъра се стартират веднага (warm=True) във фон; заявките се поемат от
+    първия свободен. Паднал браузър се рестартира при следващата задача или
+    при периодичната проверка (HEALTH_S), а след max_contexts контекста – профилактично.
+    """
+
+    def __init__(self, size: int = POOL_SIZE, *, headless: bool = True, browser_type: str = "chromium",
+                 launch: Optional[dict] = None, context: Optional[dict] = None,
+                 max_contexts: int = MAX_CONTEXTS, warm: bool = True):
+        self.size = max(1, int(size))
+        self.headless = headless
+        self.browser_type = browser_type
+        self.launch_kwargs = dict(launch or {})
+        self.context_kwargs = dict(context or {})
+        self.max_contexts = max_contexts
+        self.warm = warm
+        self._jobs: "queue.Queue" = queue.Queue()
+        self._slots = [_Slot(self, i) for i in range(self.size)]
+        self._closed = False
+        for s in self._slots:
+            s.start()
+
+    def submit(self, fn: Callable[..., Any], *args, **kwargs) -> Future:
+        if self._closed:
+            raise RuntimeError("пулът е затворен")
+        fut: Future = Future()
+        self._jobs.put(("call", (fn, args, kwargs, fut)))
+        return fut
+
+    def map(self, fn: Callable[..., Any], items) -> List[Any]:
+        futs = [self.submit(fn, it) for it in items]
+        return [f.result() for f in futs]
+
+    def session(self, timeout: Optional[float] = None) -> Lease:
+        if self._closed:
+            raise RuntimeError("пулът е затворен")
+        return Lease(self, timeout)
+
+    def stats(self) -> List[Dict[str, Any]]:
+        return [{"slot": s.index, "alive": s.is_alive(), "launches": s.launches,
+                 "contexts": s.contexts, "busy": s.busy} for s in self._slots]
+
+    def close(self, timeout: float = 30.0) -> None:
+        """Изчаква текущите задачи и затваря браузърите."""
+        if self._closed:
+            return
+        self._closed = True
+        for _ in self._slots:
+            self._jobs.put(_STOP)
+        for s in self._slots:
+            s.join(timeout)
+
+    def __enter__(self) -> "BrowserPool":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+# ------------------------ Общ пул за процеса ------------------------
+# Стъпките на pipeline-а (и daemon-ът между изпълненията) ползват един и същ пул,
+# така че стартирането на браузърите се плаща веднъж.
+_shared: Optional[BrowserPool] = None
+_shared_lock = threading.Lock()
+
+def get_pool(size: int = POOL_SIZE, **kwargs) -> BrowserPool:
+    """Общият пул; създава се при първото извикване (параметрите на по-късните се игнорират)."""
+    global _shared
+    with _shared_lock:
+        if _shared is None or _shared._closed:
+            _shared = BrowserPool(size, **kwargs)
+        return _shared
+
+def close_pool() -> None:
+    global _shared
+    with _shared_lock:
+        pool, _shared = _shared, None
+    if pool is not None:
+        pool.close()
+
+atexit.register(close_pool)
@@ -1,43 +1,236 @@
 # proparty.py
-from playwright.sync_api import sync_playwright, expect
+# Вход в портала на Агенцията по вписванията. Браузърите идват от web.pool – стартират се
+# веднъж, а всяка сесия получава собствен изолиран context.
+from __future__ import annotations
+import logging, os
+from typing import Any, Callable, Iterable, List, Optional
 
-BASE_URL = "https://portal.registryagency.bg/"
+from automation.web.pool import BrowserPool, get_pool
+from automation.web.routing import RoutePolicy, StepTimer, install
+from automation.web.session import SessionStore, apply_state, apply_state_async
+
+log = logging.getLogger(__name__)
+
+BASE_URL = os.environ.get("PROPARTY_URL", "https://portal.registryagency.bg/")   # stand-in: web/standin.py
 TIMEOUT_MS = 7000  # можеш да го настроиш според нуждите си
+# Линкът в банера след вход – по него разпознаваме влязла сесия. Проверен е само срещу
+# web/standin.py: ако порталът го изписва другояче, задай PROPARTY_LOGOUT_LINK ("" → без него).
+LOGOUT_LINK = os.environ.get("PROPARTY_LOGOUT_LINK", "Изход")
+LOGOUT_WAIT_MS = 2000   # колко чакаме линка след входа; веднъж липсващ → не го чакаме повече
+_logout_missing = False
 
 def click_when_visible(locator, timeout=TIMEOUT_MS):
     # Изрично изчакване елементът да стане видим, после клик
+    from playwright.sync_api import expect
     expect(locator).to_be_visible(timeout=timeout)
     locator.click()
 
-def run():
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=False)  # смени на True при нужда
-        context = browser.new_context()
-        page = context.new_page()
+def _logout_link(page):
+    return page.get_by_role("banner").get_by_role("link", name=LOGOUT_LINK)
+
+def _wait_logout_pending() -> bool:
+    """Да чакаме ли „Изход“ след входа: не, ако е изключен или вече е липсвал в този процес."""
+    return bool(LOGOUT_LINK) and not _logout_missing
 
-        page.goto(BASE_URL)
-        page.wait_for_load_state("domcontentloaded")
+def _logout_not_found() -> None:
+    global _logout_missing
+    _logout_missing = True
+    log.warning("proparty: няма „%s“ в банера след входа – продължавам и не го чакам повече "
+                "(PROPARTY_LOGOUT_LINK)", LOGOUT_LINK)
 
-        # 1) "Потребител" (бутон)
+def login(page, base_url: Optional[str] = None, timer: Optional[StepTimer] = None):
+    # Всяка стъпка чака точно елемента, който ѝ трябва (без networkidle);
+    # времената отиват в лога и в timer.steps
+    t = timer or StepTimer("proparty")
+    with t.step("Начална страница", page):
+        page.goto(base_url or BASE_URL, wait_until="domcontentloaded")
+
+    # 1) "Потребител" (бутон)
+    with t.step("Потребител", page):
         click_when_visible(page.get_by_role("button", name="Потребител"))
 
-        # 2) "Вход" (линк)
+    # 2) "Вход" (линк)
+    with t.step("Вход", page):
         click_when_visible(page.get_by_role("link", name="Вход"))
 
-        # 3) "Вход със сертификат" (линк)
+    # 3) "Вход със сертификат" (линк)
+    with t.step("Вход със сертификат", page):
         click_when_visible(page.get_by_role("link", name="Вход със сертификат"))
 
-        # 4) Първият линк в банера
+    # 4) Първият линк в банера; готови сме, когато банерът покаже „Изход“
+    with t.step("Профил", page):
         banner_first_link = page.get_by_role("banner").get_by_role("link").first
         click_when_visible(banner_first_link)
+        if _wait_logout_pending():
+            try:
+                _logout_link(page).first.wait_for(timeout=LOGOUT_WAIT_MS)
+            except Exception:
+                _logout_not_found()
+        else:
+            page.wait_for_load_state("domcontentloaded")
+    return page
+
+async def login_async(page, base_url: Optional[str] = None, timeout: int = TIMEOUT_MS,
+                      timer: Optional[StepTimer] = None):
+    # Същите стъпки за web.async_engine; click() сам изчаква елемента да е видим и активен
+    t = timer or StepTimer("proparty")
+    async with t.astep("Начална страница", page):
+        await page.goto(base_url or BASE_URL, wait_until="domcontentloaded")
+    async with t.astep("Потребител", page):
+        await page.get_by_role("button", name="Потребител").click(timeout=timeout)
+    async with t.astep("Вход", page):
+        await page.get_by_role("link", name="Вход").click(timeout=timeout)
+    async with t.astep("Вход със сертификат", page):
+        await page.get_by_role("link", name="Вход със сертификат").click(timeout=timeout)
+    async with t.astep("Профил", page):
+        await page.get_by_role("banner").get_by_role("link").first.click(timeout=timeout)
+        if _wait_logout_pending():
+            try:
+                await _logout_link(page).first.wait_for(timeout=LOGOUT_WAIT_MS)
+            except Exception:
+                _logout_not_found()
+        else:
+            await page.wait_for_load_state("domcontentloaded")
+    return page
+
+# ------------------------ Запазена сесия ------------------------
+# Влязлата сесия (storage_state) се пази криптирана (web.session); при следващото
+# изпълнение една навигация проверява дали още е валидна и веригата за вход се пропуска.
+def _logged_in_markers(page):
+    # влязъл: „Изход“ в банера; невлязъл: бутонът „Потребител“
+    logout = _logout_link(page)
+    return logout, logout.or_(page.get_by_role("button", name="Потребител"))
+
+def is_logged_in(page, timeout: int = TIMEOUT_MS) -> bool:
+    if not LOGOUT_LINK:
+        return False                              # няма по какво да познаем → пълен вход
+    logout, either = _logged_in_markers(page)
+    try:
+        either.first.wait_for(timeout=timeout)    # каквото се появи първо, без фиксирана пауза
+    except Exception:
+        return False                              # непозната страница → пълен вход
+    return logout.count() > 0
+
+async def is_logged_in_async(page, timeout: int = TIMEOUT_MS) -> bool:
+    if not LOGOUT_LINK:
+        return False
+    logout, either = _logged_in_markers(page)
+    try:
+        await either.first.wait_for(timeout=timeout)
+    except Exception:
+        return False
+    return await logout.count() > 0
+
+def _store(base_url: str, remember: bool) -> Optional[SessionStore]:
+    return SessionStore.for_url(base_url) if remember else None
+
+def open_portal(page, base_url: Optional[str] = None, store: Optional[SessionStore] = None,
+                timer: Optional[StepTimer] = None):
+    """Влиза със запазената сесия, ако е валидна; иначе login() и записва новата."""
+    base_url = base_url or BASE_URL
+    timer = timer or StepTimer("proparty")
+    state = store.load(base_url) if store else None
+    if state:
+        apply_state(page.context, state)
+        with timer.step("Запазена сесия", page):
+            page.goto(base_url, wait_until="domcontentloaded")
+            ok = is_logged_in(page)
+        if ok:
+            return page
+        page.context.clear_cookies()               # изтекла в портала
+        store.clear()
+    login(page, base_url, timer)
+    if store:
+        store.save(page.context.storage_state(), base_url)
+    return page
+
+async def open_portal_async(page, base_url: Optional[str] = None, store: Optional[SessionStore] = None,
+                            timer: Optional[StepTimer] = None):
+    base_url = base_url or BASE_URL
+    timer = timer or StepTimer("proparty")
+    state = store.load(base_url) if store else None
+    if state:
+        await apply_state_async(page.context, state)
+        async with timer.astep("Запазена сесия", page):
+            await page.goto(base_url, wait_until="domcontentloaded")
+            ok = await is_logged_in_async(page)
+        if ok:
+            return page
+        await page.context.clear_cookies()
+        store.clear()
+    await login_async(page, base_url, timer=timer)
+    if store:
+        store.save(await page.context.storage_state(), base_url)
+    return page
+
+def _session(context, base_url: Optional[str], steps: Optional[Callable] = None, remember: bool = True,
+             policy: Optional[RoutePolicy] = None, timer: Optional[StepTimer] = None):
+    install(context, policy)
+    page = context.new_page()
+    open_portal(page, base_url, _store(base_url or BASE_URL, remember), timer or StepTimer("proparty", policy))
+    # ... тук добави следващи стъпки
+    return steps(page) if steps else page.url
 
-        # по желание: изчакай да се приключат заявките след навигация
-        page.wait_for_load_state("networkidle")
+def run(headless: bool = False, base_url: Optional[str] = None, steps: Optional[Callable] = None,
+        pool: Optional[BrowserPool] = None, remember: bool = True, routes: Any = None,
+        summary: Optional[dict] = None) -> Any:
+    """
+    Един вход (и steps(page) след него, ако е подаден). Без pool се пуска собствен
+    браузър само за това извикване – за много сесии подай пул (или ползвай run_many).
+    remember=False → без запазена сесия (винаги пълен вход, нищо не се записва).
+    routes – kwargs за web.routing.RoutePolicy (по подразбиране без картинки/шрифтове/
+    анализатори); False → всичко се зарежда.
+    Подаден речник summary се попълва с времената на входа (StepTimer.summary()),
+    и когато входът се провали.
+    """
+    policy = RoutePolicy.from_config(routes)
+    timer = StepTimer("proparty", policy)
+    own = pool is None
+    if own:
+        pool = BrowserPool(size=1, headless=headless, warm=False)
+    try:
+        return pool.submit(_session, base_url, steps, remember, policy, timer).result()
+    finally:
+        if own:
+            pool.close()
+        if summary is not None:
+            summary.update(timer.summary())
 
-        # ... тук добави следващи стъпки
+def _lookup_batch(context, base_url, items, lookup, remember, policy, timer):
+    install(context, policy)
+    page = context.new_page()
+    open_portal(page, base_url, _store(base_url or BASE_URL, remember), timer)
+    return [lookup(page, it) for it in items]
 
-        context.close()
-        browser.close()
+def run_many(items: Iterable[Any], lookup: Callable[[Any, Any], Any], *, base_url: Optional[str] = None,
+             pool: Optional[BrowserPool] = None, sessions: Optional[int] = None,
+             remember: bool = True, routes: Any = None, summary: Optional[dict] = None) -> List[Any]:
+    """
+    lookup(page, item) за всеки item, в реда на items. Елементите се делят на
+    `sessions` партиди (по подразбиране – колкото браузъра има пулът); всяка партида
+    влиза веднъж и минава през своите елементи в един context. Без pool се ползва
+    общият пул на процеса (get_pool), така че браузърите остават топли между стъпките.
+    Подаден речник summary получава {"sessions": [StepTimer.summary() за всяка партида]}.
+    """
+    items = list(items)
+    if not items:                      # без партида – иначе един вход в портала за нищо
+        if summary is not None:
+            summary["sessions"] = []
+        return []
+    pool = pool or get_pool()
+    policy = RoutePolicy.from_config(routes)
+    n = max(1, min(sessions or pool.size, len(items)))
+    batches = [items[i::n] for i in range(n)]
+    timers = [StepTimer(f"proparty-{i}", policy) for i in range(n)]
+    futs = [pool.submit(_lookup_batch, base_url, b, lookup, remember, policy, t) for b, t in zip(batches, timers)]
+    out: List[Any] = [None] * len(items)
+    try:
+        for i, f in enumerate(futs):
+            out[i::n] = f.result()
+    finally:
+        if summary is not None:
+            summary["sessions"] = [t.summary() for t in timers]
+    return out
 
 if __name__ == "__main__":
     run()
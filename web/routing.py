@@ -0,0 +1,210 @@
+# automation/web/routing.py
+# Прихващане на заявките в портала: блокиране по тип ресурс и URL шаблон, локален кеш
+# за статичните файлове и време на всяка стъпка – за headless справки не ни трябват
+# картинки, шрифтове и анализатори, а само HTML-ът и скриптовете на самия портал.
+from __future__ import annotations
+import asyncio, fnmatch, logging, threading, time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+from automation.utils.paths import local_dir
+
+log = logging.getLogger(__name__)
+
+BLOCK_TYPES = ("image", "media", "font")
+DENY = (                                  # анализатори/реклама – никога не трябват
+    "*google-analytics.com/*", "*googletagmanager.com/*", "*doubleclick.net/*",
+    "*facebook.net/*", "*hotjar.com/*", "*clarity.ms/*",
+)
+CACHE_TYPES = ("stylesheet", "script")   # шрифтовете/картинките по подразбиране са блокирани
+CACHE_TTL_S = 24 * 3600
+CACHE_MAX_MB = 64
+
+_NAV_TIMING_JS = """() => {
+  const n = performance.getEntriesByType('navigation')[0];
+  return n ? {url: location.href, dcl_ms: n.domContentLoadedEventEnd, load_ms: n.loadEventEnd,
+              bytes: n.transferSize} : null;
+}"""
+
+class RoutePolicy:
+    """
+    policy = RoutePolicy(block_types=("image", "font"), deny=["*/banner/*"], cache=True)
+    install(context, policy)            # или await install_async(context, policy)
+
+    Ред на решението: allow шаблон → пропуска се винаги; deny шаблон или тип от
+    block_types → route.abort(); иначе от кеша (cache=True, GET статичен ресурс)
+    или route.fallback() – следващите route-ове (напр. rate limit-ът) остават в сила.
+    Шаблоните са fnmatch върху целия URL. Броячите са в policy.stats.
+    Кешират се само типове от cache_types, които не са в block_types.
+    """
+
+    def __init__(self, block_types: Iterable[str] = BLOCK_TYPES, deny: Iterable[str] = DENY,
+                 allow: Iterable[str] = (), cache: bool = False, cache_types: Iterable[str] = CACHE_TYPES,
+                 cache_ttl_s: float = CACHE_TTL_S, cache_max_mb: int = CACHE_MAX_MB):
+        self.block_types = frozenset(block_types)
+        self.deny = tuple(deny)
+        self.allow = tuple(allow)
+        self.cache_types = frozenset(cache_types) - self.block_types   # блокираното не стига до кеша
+        self.cache_ttl_s = cache_ttl_s
+        self._cache = None
+        if cache:
+            from automation.utils.disk_cache import DiskCache
+            self._cache = DiskCache(local_dir() / "cache" / "web",
+                                    max_bytes=cache_max_mb * 1024 * 1024, max_age_s=cache_ttl_s)
+            self._cache.evict()
+        self.stats: Dict[str, int] = {"allowed": 0, "blocked": 0, "cache_hits": 0, "cache_stored": 0}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, cfg: Optional[dict]) -> Optional["RoutePolicy"]:
+        """kwargs от pipelines.yml; False → без прихващане, None/{} → настройките по подразбиране."""
+        if cfg is False:
+            return None
+        return cls(**(cfg or {}))
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self.stats[key] += 1
+
+    def decide(self, url: str, resource_type: str) -> str:
+        if any(fnmatch.fnmatchcase(url, p) for p in self.allow):
+            return "allow"
+        if resource_type in self.block_types or any(fnmatch.fnmatchcase(url, p) for p in self.deny):
+            return "block"
+        return "allow"
+
+    def _cacheable(self, request) -> bool:
+        return self._cache is not None and request.method == "GET" and request.resource_type in self.cache_types
+
+    def _cached(self, url: str) -> Optional[tuple]:
+        found, val = self._cache.get(url, ttl_s=self.cache_ttl_s)
+        return val if found else None
+
+    def _store(self, url: str, status: int, headers: dict, body: bytes) -> None:
+        if status != 200 or "no-store" in headers.get("cache-control", ""):
+            return
+        # тялото идва вече разкомпресирано → без content-encoding/дължината на оригинала
+        headers = {k: v for k, v in headers.items()
+                   if k.lower() not in ("content-encoding", "content-length", "transfer-encoding")}
+        self._cache.put(url, (status, headers, body))
+        self._count("cache_stored")
+
+def install(context, policy: Optional[RoutePolicy]) -> None:
+    """Закача policy върху context (sync API)."""
+    if policy is None:
+        return
+
+    def handler(route, request):
+        if policy.decide(request.url, request.resource_type) == "block":
+            policy._count("blocked")
+            return route.abort()
+        policy._count("allowed")
+        if policy._cacheable(request):
+            hit = policy._cached(request.url)
+            if hit:
+                policy._count("cache_hits")
+                return route.fulfill(status=hit[0], headers=hit[1], body=hit[2])
+            resp = route.fetch()
+            policy._store(request.url, resp.status, resp.headers, resp.body())
+            return route.fulfill(response=resp)
+        route.fallback()
+
+    context.route("**/*", handler)
+
+async def install_async(context, policy: Optional[RoutePolicy],
+                        before_fetch: Optional[Callable[[Any], Awaitable[None]]] = None) -> None:
+    """
+    Като install(); кешът (файлове на диска) се чете/пише в нишка – event loop-ът не чака I/O.
+    route.fetch() при липса в кеша не минава през следващите route-ове, затова
+    before_fetch(request) (напр. rate limit-ът по хост) се изчаква преди него.
+    """
+    if policy is None:
+        return
+
+    async def handler(route, request):
+        if policy.decide(request.url, request.resource_type) == "block":
+            policy._count("blocked")
+            return await route.abort()
+        policy._count("allowed")
+        if policy._cacheable(request):
+            hit = await asyncio.to_thread(policy._cached, request.url)
+            if hit:
+                policy._count("cache_hits")
+                return await route.fulfill(status=hit[0], headers=hit[1], body=hit[2])
+            if before_fetch is not None:
+                await before_fetch(request)
+            resp = await route.fetch()
+            await asyncio.to_thread(policy._store, request.url, resp.status, resp.headers, await resp.body())
+            return await route.fulfill(response=resp)
+        await route.fallback()
+
+    await context.route("**/*", handler)
+
+# ------------------------ Време по стъпки ------------------------
+class StepTimer:
+    """
+    timer = StepTimer("proparty")
+    with timer.step("Вход", page):          # async: async with timer.astep(...)
+        ...
+    timer.steps → [{"step", "ms", "url", "dcl_ms", "load_ms", "bytes"}]
+
+    ms е времето на стъпката; dcl_ms/load_ms/bytes са от Navigation Timing на
+    страницата, ако стъпката е довела до нова навигация. Стъпка, прекъсната от
+    изключение, също се записва – с "error" и без Navigation Timing.
+    """
+
+    def __init__(self, name: str = "web", policy: Optional[RoutePolicy] = None):
+        self.name = name
+        self.policy = policy
+        self.steps: List[Dict[str, Any]] = []
+
+    def _record(self, step: str, t0: float, nav: Optional[dict], before_url: Optional[str],
+                error: Optional[str] = None) -> None:
+        rec: Dict[str, Any] = {"step": step, "ms": round((time.perf_counter() - t0) * 1000, 1)}
+        if error is not None:
+            rec["error"] = error
+            self.steps.append(rec)
+            log.warning("%s: %s – %.0f ms, грешка: %s", self.name, step, rec["ms"], error)
+            return
+        if nav and nav.get("url") != before_url:
+            rec.update(url=nav["url"], dcl_ms=round(nav["dcl_ms"], 1),
+                       load_ms=round(nav["load_ms"], 1) or None, bytes=nav["bytes"])   # 0 → load още не е свършил
+        self.steps.append(rec)
+        extra = f" (DOMContentLoaded {rec['dcl_ms']} ms, {rec['bytes']} B)" if "dcl_ms" in rec else ""
+        log.info("%s: %s – %.0f ms%s", self.name, step, rec["ms"], extra)
+
+    @contextmanager
+    def step(self, step: str, page):
+        before = page.url
+        t0 = time.perf_counter()
+        try:
+            yield
+        except BaseException as e:
+            self._record(step, t0, None, before, f"{type(e).__name__}: {e}")
+            raise
+        try:
+            nav = page.evaluate(_NAV_TIMING_JS)
+        except Exception:
+            nav = None
+        self._record(step, t0, nav, before)
+
+    @asynccontextmanager
+    async def astep(self, step: str, page):
+        before = page.url
+        t0 = time.perf_counter()
+        try:
+            yield
+        except BaseException as e:
+            self._record(step, t0, None, before, f"{type(e).__name__}: {e}")
+            raise
+        try:
+            nav = await page.evaluate(_NAV_TIMING_JS)
+        except Exception:
+            nav = None
+        self._record(step, t0, nav, before)
+
+    def summary(self) -> Dict[str, Any]:
+        out: Dict[str, Any] = {"total_ms": round(sum(s["ms"] for s in self.steps), 1), "steps": list(self.steps)}
+        if self.policy is not None:
+            out["requests"] = dict(self.policy.stats)
+        return out
@@ -0,0 +1,113 @@
+# automation/web/session.py
+# Запазена сесия (Playwright storage_state), криптирана в <LocalCache>/sessions –
+# следващите изпълнения влизат в портала без веригата за вход със сертификат.
+from __future__ import annotations
+import json, logging, os, tempfile, time
+from pathlib import Path
+from typing import Optional
+from urllib.parse import urlsplit
+
+from automation.utils import secret
+from automation.utils.paths import local_dir
+
+log = logging.getLogger(__name__)
+
+MAX_AGE_S = 8 * 3600       # по-стара сесия не се пробва изобщо (порталът я е забравил)
+
+class SessionStore:
+    """
+    store = SessionStore("proparty")
+    state = store.load(base_url)        # None → трябва вход
+    store.save(context.storage_state(), base_url)
+
+    Записът е secret.protect(JSON); без DPAPI/cryptography не се пази нищо
+    (save връща False). Повреден, чужд или изтекъл запис се изтрива при load.
+    """
+
+    def __init__(self, name: str = "proparty", folder: Optional[Path] = None, max_age_s: float = MAX_AGE_S):
+        if folder is None:
+            folder = local_dir() / "sessions"
+        self.path = Path(folder) / f"{name}.bin"
+        self.max_age_s = max_age_s
+
+    @classmethod
+    def for_url(cls, base_url: str, prefix: str = "proparty", **kw) -> "SessionStore":
+        """Отделен запис за всеки хост (истинският портал и stand-in-ът не се застъпват)."""
+        host = urlsplit(base_url).netloc.replace(":", "_") or "default"
+        return cls(f"{prefix}-{host}", **kw)
+
+    def load(self, base_url: Optional[str] = None) -> Optional[dict]:
+        try:
+            blob = self.path.read_bytes()
+        except FileNotFoundError:
+            return None
+        try:
+            rec = json.loads(secret.unprotect(blob))
+        except (ValueError, secret.SecretUnavailable) as e:
+            log.info("session: записът не става (%s) – нов вход", e)
+            self.clear()
+            return None
+        if time.time() - rec.get("saved", 0) > self.max_age_s:
+            self.clear()
+            return None
+        if base_url and rec.get("host") != urlsplit(base_url).netloc:
+            return None
+        state = rec.get("state") or {}
+        return state if cookies_alive(state) else None
+
+    def save(self, state: dict, base_url: Optional[str] = None) -> bool:
+        rec = {"saved": time.time(), "host": urlsplit(base_url).netloc if base_url else None, "state": state}
+        try:
+            blob = secret.protect(json.dumps(rec, ensure_ascii=False).encode("utf-8"))
+        except secret.SecretUnavailable as e:
+            log.warning("session: %s", e)
+            return False
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # уникален временен файл – няколко нишки (context-и на пула/AsyncEngine) може да
+        # записват една и съща сесия едновременно; pid-ът е общ за всички тях
+        fd, tmp = tempfile.mkstemp(prefix=self.path.stem + ".", suffix=".tmp", dir=self.path.parent)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(blob)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            Path(tmp).unlink(missing_ok=True)
+            log.warning("session: не мога да запиша %s: %s", self.path, e)
+            return False
+        except BaseException:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+        return True
+
+    def clear(self) -> None:
+        self.path.unlink(missing_ok=True)
+
+def cookies_alive(state: dict, now: Optional[float] = None) -> bool:
+    """Има ли поне една неизтекла бисквитка (expires == -1 е „до затваряне на браузъра“)."""
+    now = time.time() if now is None else now
+    return any(c.get("expires", -1) == -1 or c["expires"] > now for c in state.get("cookies", ()))
+
+def _storage_script(state: dict) -> Optional[str]:
+    # localStorage по origin; вече зададените от сайта ключове не се презаписват
+    origins = {o["origin"]: {i["name"]: i["value"] for i in o["localStorage"]}
+               for o in state.get("origins", ()) if o.get("localStorage")}
+    if not origins:
+        return None
+    return ("(() => { const items = %s[location.origin]; if (!items) return;"
+            " for (const k in items) if (localStorage.getItem(k) === null) localStorage.setItem(k, items[k]); })()"
+            % json.dumps(origins, ensure_ascii=False))
+
+def apply_state(context, state: dict) -> None:
+    """storage_state върху вече създаден context (бисквитки + localStorage)."""
+    if state.get("cookies"):
+        context.add_cookies(state["cookies"])
+    js = _storage_script(state)
+    if js:
+        context.add_init_script(js)
+
+async def apply_state_async(context, state: dict) -> None:
+    if state.get("cookies"):
+        await context.add_cookies(state["cookies"])
+    js = _storage_script(state)
+    if js:
+        await context.add_init_script(js)
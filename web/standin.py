@@ -0,0 +1,174 @@
+# automation/web/standin.py
+# Локален HTML „двойник“ на портала на Агенцията по вписванията – същите бутони и линкове,
+# по които минава web.proparty, без мрежа и без сертификат. За проби на пула и на стъпките.
+#   python -m automation.web.standin [--port 8765] [--delay 0.2]
+from __future__ import annotations
+import argparse, html, random, secrets, threading, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+from urllib.parse import parse_qs, urlsplit
+
+_HEAD = ('<!doctype html><html lang="bg"><head><meta charset="utf-8"><title>{title}</title>'
+         '<link rel="stylesheet" href="/static/site.css"><script src="/static/app.js"></script></head><body>'
+         '<img src="/static/logo.png" alt="" width="1" height="1">')
+
+# статичните файлове, които истинският портал тегли на всяка страница (за web.routing)
+STATIC: Dict[str, tuple] = {
+    "/static/site.css": ("text/css", b"@font-face{font-family:P;src:url(/static/font.woff2)}body{font-family:P}"
+                                     + b"\n" * 40_000),
+    "/static/app.js": ("application/javascript", b"window.portal = {ready: true};" + b" " * 120_000),
+    "/static/logo.png": ("image/png", b"\x89PNG\r\n\x1a\n" + bytes(250_000)),
+    "/static/font.woff2": ("font/woff2", bytes(90_000)),
+}
+
+PAGES: Dict[str, str] = {
+    # 1) бутон „Потребител“ отваря меню с линк „Вход“
+    "/": """<header role="banner"><a href="/">Начало</a></header>
+<button type="button" onclick="document.getElementById('menu').hidden=false">Потребител</button>
+<nav id="menu" hidden><a href="/login">Вход</a></nav>""",
+    # 2) начини на вход
+    "/login": """<header role="banner"><a href="/">Начало</a></header>
+<main><a href="/cert">Вход със сертификат</a></main>""",
+    # 3) след сертификата: първият линк в банера води към профила
+    "/cert": """<header role="banner"><a href="/home">Моят профил</a><a href="/">Изход</a></header>
+<main><p>Сертификатът е приет.</p></main>""",
+    "/home": """<header role="banner"><a href="/home">Моят профил</a><a href="/">Изход</a></header>
+<main><h1>Добре дошли</h1>
+<form action="/search"><input name="q" aria-label="Търсене"><button>Търси</button></form></main>""",
+}
+
+class _Handler(BaseHTTPRequestHandler):
+    server: "_Server"
+
+    def _sid(self) -> str:
+        for part in (self.headers.get("Cookie") or "").split(";"):
+            k, _, v = part.strip().partition("=")
+            if k == "sid":
+                return v
+        return ""
+
+    def _logged_in(self) -> bool:
+        srv = self.server
+        with srv.lock:
+            return srv.sessions.get(self._sid(), 0) > time.time()
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        srv = self.server
+        with srv.lock:
+            srv.hits[url.path] = srv.hits.get(url.path, 0) + 1
+        if srv.delay_s:
+            time.sleep(srv.delay_s)                 # латентност на истинския портал
+        extra_headers = []
+        if url.path in STATIC:
+            ctype, data = STATIC[url.path]
+            self.send_response(200)
+            self.send_header("Content-Type", ctype)
+            self.send_header("Content-Length", str(len(data)))
+            self.send_header("Cache-Control", "max-age=3600")
+            self.end_headers()
+            self.wfile.write(data)
+            return
+        if url.path in ("/home", "/search") and not self._logged_in():
+            self.send_response(302)                 # изтекла/липсваща сесия → начало
+            self.send_header("Location", "/")
+            self.end_headers()
+            return
+        if url.path == "/cert":                     # „сертификатът“ е приет → нова сесия
+            sid = secrets.token_hex(16)
+            with srv.lock:
+                srv.sessions[sid] = time.time() + srv.session_ttl_s
+            extra_headers.append(("Set-Cookie", f"sid={sid}; Path=/; Max-Age={int(srv.session_ttl_s)}; HttpOnly"))
+        if url.path == "/" and self._logged_in():
+            body = PAGES["/home"]
+        elif url.path == "/search":
+            if srv.fail_rate and random.random() < srv.fail_rate:
+                self.send_error(503)                # временна грешка → повторение в клиента
+                return
+            q = parse_qs(url.query).get("q", [""])[0]
+            body = (f'<header role="banner"><a href="/home">Моят профил</a></header>'
+                    f'<main><div id="result" data-q="{html.escape(q)}">Резултат за {html.escape(q)}</div></main>')
+        elif url.path in PAGES:
+            body = PAGES[url.path]
+        else:
+            self.send_error(404)
+            return
+        data = (_HEAD.format(title="Имотен регистър (stand-in)") + body + "</body></html>").encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        for k, v in extra_headers:
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, addr, delay_s: float, fail_rate: float, session_ttl_s: float):
+        super().__init__(addr, _Handler)
+        self.delay_s = delay_s
+        self.fail_rate = fail_rate
+        self.session_ttl_s = session_ttl_s
+        self.sessions: Dict[str, float] = {}       # sid → изтича в
+        self.hits: Dict[str, int] = {}
+        self.lock = threading.Lock()
+
+class StandIn:
+    """
+    with StandIn(delay_s=0.1, fail_rate=0.05) as site:   # fail_rate: дял 503 на /search
+        proparty.run(base_url=site.url, headless=True)
+        site.hits["/cert"]      # колко пъти е отворена страницата (= пълни входове)
+    /home и /search искат сесия (бисквитка sid от /cert), иначе пренасочват към началото.
+    """
+
+    def __init__(self, port: int = 0, delay_s: float = 0.0, host: str = "127.0.0.1", fail_rate: float = 0.0,
+                 session_ttl_s: float = 3600.0):
+        self._srv = _Server((host, port), delay_s, fail_rate, session_ttl_s)
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._srv.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    @property
+    def hits(self) -> Dict[str, int]:
+        with self._srv.lock:
+            return dict(self._srv.hits)
+
+    def expire_sessions(self) -> None:
+        """Порталът „забравя“ всички сесии (проверка на повторния вход)."""
+        with self._srv.lock:
+            self._srv.sessions.clear()
+
+    def start(self) -> "StandIn":
+        self._thread = threading.Thread(target=self._srv.serve_forever, name="standin", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._srv.shutdown()
+        self._srv.server_close()
+
+    def __enter__(self) -> "StandIn":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Локален stand-in на портала (за проби на web.proparty)")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--delay", type=float, default=0.0, help="Забавяне на всеки отговор (s)")
+    ap.add_argument("--fail-rate", type=float, default=0.0, help="Дял 503 отговори на /search")
+    a = ap.parse_args()
+    site = StandIn(a.port, a.delay, fail_rate=a.fail_rate)
+    print(f"stand-in: {site.url}  (Ctrl+C за край)")
+    try:
+        site._srv.serve_forever()
+    except KeyboardInterrupt:
+        pass
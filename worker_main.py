@@ -1,5 +1,10 @@
 # automation/worker_main.py
+import multiprocessing
+
 from .orchestrator import main as orchestrator_main
 
 if __name__ == "__main__":
+    # Worker.exe е замразен и ProcessPoolExecutor (tasks.stamp) пуска децата със spawn –
+    # без freeze_support всяко дете би изпълнило оркестратора отначало
+    multiprocessing.freeze_support()
     orchestrator_main()